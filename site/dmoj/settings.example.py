@@ -113,6 +113,9 @@ DMOJ_USER_DATA_DOWNLOAD_RATELIMIT = datetime.timedelta(days=1)
 DMOJ_COMMENT_VOTE_HIDE_THRESHOLD = -5
 DMOJ_COMMENT_REPLY_TIMEFRAME = datetime.timedelta(days=365)
 DMOJ_PDF_PROBLEM_CACHE = ''
+# Directory to keep the latest source code archive of every contest in, so that repeated downloads are not rebuilt
+# while no submission changed. Leave empty to build the archive on every download.
+DMOJ_CONTEST_CODE_CACHE = ''
 DMOJ_PDF_PROBLEM_TEMP_DIR = tempfile.gettempdir()
 DMOJ_STATS_SUBMISSION_RESULT_COLORS = {
     'TLE': '#dc2626',
@@ -122,6 +125,8 @@ DMOJ_STATS_SUBMISSION_RESULT_COLORS = {
     'ERR': '#dc2626',
 }
 DMOJ_API_PAGE_SIZE = 1000
+# Seconds to keep a contest's ranking cached for. It is rebuilt sooner whenever a participation changes.
+DMOJ_CONTEST_RANKING_CACHE_TTL = 3600
 
 DMOJ_PASSWORD_RESET_LIMIT_WINDOW = 3600
 DMOJ_PASSWORD_RESET_LIMIT_COUNT = 10
@@ -543,6 +548,24 @@ BRIDGED_JUDGE_ADDRESS = [('localhost', 9999)]
 BRIDGED_JUDGE_PROXIES = None
 BRIDGED_DJANGO_ADDRESS = [('localhost', 9998)]
 BRIDGED_DJANGO_CONNECT = None
+# Number of persistent connections each site process keeps open to the bridge.
+# Set to 0 to open a new connection for every request instead.
+BRIDGED_DJANGO_POOL_SIZE = 2
+# Serve the bridge from a single asyncio event loop instead of a thread per connection.
+# Database work is then run on a thread pool of at most BRIDGED_ASYNC_WORKERS threads.
+BRIDGED_ASYNC = False
+BRIDGED_ASYNC_WORKERS = 16
+# User points, problem statistics and contest results are recalculated by this many worker threads in the bridge,
+# at most once per user, problem or participation every BRIDGED_DEFERRED_UPDATE_DELAY seconds.
+BRIDGED_DEFERRED_UPDATE_WORKERS = 2
+BRIDGED_DEFERRED_UPDATE_DELAY = 1.0
+# Address to serve bridge statistics on over HTTP, at /metrics for Prometheus and /stats as JSON, e.g.
+# ('127.0.0.1', 9996). This is unauthenticated, so keep it local. Set to None to disable.
+BRIDGED_METRICS_ADDRESS = None
+# How the bridge picks judges and queued submissions: 'load' (least loaded judge, oldest submission first),
+# 'shortest-job' (submissions expected to finish first, on the fastest judges) or 'affinity' (problems a judge
+# graded recently). Compare them on your own traffic with `./manage.py replay_dispatch <log>`.
+BRIDGED_DISPATCH_POLICY = 'load'
 
 # Event Server configuration
 EVENT_DAEMON_USE = False
@@ -531,8 +531,9 @@ class ContestAdmin(VersionAdmin):
             with connection.cursor() as cursor:
                 cursor.execute('TRUNCATE TABLE `%s`' % Rating._meta.db_table)
             Profile.objects.update(rating=None)
+            states = {}
             for contest in Contest.objects.filter(is_rated=True, end_time__lte=timezone.now()).order_by('end_time'):
-                rate_contest(contest)
+                rate_contest(contest, states)
         return HttpResponseRedirect(reverse('admin:judge_contest_changelist'))
 
     def rate_view(self, request, id):
@@ -697,9 +698,9 @@ class ContestParticipationAdmin(admin.ModelAdmin):
 
     def recalculate_results(self, request, queryset):
         count = 0
-        for participation in queryset:
-            participation.recompute_results()
-            count += 1
+        # Recompute the participations of each contest together, which takes far fewer queries.
+        for contest in Contest.objects.filter(id__in=queryset.values('contest_id')):
+            count += len(contest.recompute_results(contest.users.filter(id__in=queryset.values('id'))))
         self.message_user(request, ngettext('%d participation recalculated.',
                                             '%d participations recalculated.',
                                             count) % count)
@@ -8,7 +8,7 @@ from django.utils.translation import gettext, gettext_lazy as _, ngettext
 from reversion.admin import VersionAdmin
 
 from django_ace import AceWidget
-from judge.models import Profile, WebAuthnCredential,Department
+from judge.models import Profile, UserProblemPoints, WebAuthnCredential,Department
 from judge.utils.views import NoBatchDeleteMixin
 from judge.widgets import AdminMartorWidget, AdminSelect2Widget
 
@@ -279,6 +279,7 @@ class ProfileAdmin(NoBatchDeleteMixin, VersionAdmin):
     def recalculate_points(self, request, queryset):
         count = 0
         for profile in queryset:
+            UserProblemPoints.rebuild(user=profile)
             profile.calculate_points()
             count += 1
         self.message_user(request, ngettext('%d user had scores recalculated.',
@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from judge.bridge.base_handler import Disconnect, MAX_ALLOWED_PACKET_SIZE, RequestHandlerMeta, ZlibPacketHandler, \
+    size_pack
+
+logger = logging.getLogger('judge.bridge')
+
+# Max line length for PROXY protocol is 107.
+MAX_PROXY_HEADER_SIZE = 107
+
+
+class LoopTimer(object):
+    """
+    A timer on the event loop that can be created and cancelled from any thread, mirroring `threading.Timer`.
+    """
+
+    def __init__(self, loop, delay, callback):
+        self._loop = loop
+        self._handle = None
+        self._cancelled = False
+        loop.call_soon_threadsafe(self._schedule, delay, callback)
+
+    def _schedule(self, delay, callback):
+        if not self._cancelled:
+            self._handle = self._loop.call_later(delay, callback)
+
+    def _cancel(self):
+        self._cancelled = True
+        if self._handle is not None:
+            self._handle.cancel()
+
+    def cancel(self):
+        self._loop.call_soon_threadsafe(self._cancel)
+
+
+class AsyncRequestHandlerMeta(RequestHandlerMeta):
+    # Constructing an asyncio handler must not block on the connection, AsyncServer drives it through serve().
+    def __call__(cls, *args, **kwargs):
+        return type.__call__(cls, *args, **kwargs)
+
+
+class AsyncZlibPacketHandler(ZlibPacketHandler, metaclass=AsyncRequestHandlerMeta):
+    """
+    ZlibPacketHandler running on an asyncio event loop.
+
+    Packets are read by a coroutine on the loop and every handler callback (on_connect, on_packet, on_disconnect,
+    ...) runs on the server's bounded executor, one at a time per connection, so the existing blocking handler code
+    keeps its ordering guarantees. send() and close() may be called from any thread.
+    """
+
+    def __init__(self, request, client_address, server):
+        self.reader, self.writer = request
+        self.server = server
+        self.loop = server.loop
+        self.client_address = client_address
+        self.server_address = self.writer.get_extra_info('sockname')
+        self._initial_tag = None
+        self._got_packet = False
+        self._timeout = None
+
+    @property
+    def timeout(self):
+        return self._timeout
+
+    @timeout.setter
+    def timeout(self, timeout):
+        self._timeout = timeout or None
+
+    def call_later(self, delay, callback):
+        return LoopTimer(self.loop, delay, callback)
+
+    async def _call(self, func, *args):
+        return await self.loop.run_in_executor(self.server.executor, partial(func, *args))
+
+    async def _read(self, size):
+        try:
+            return await asyncio.wait_for(self.reader.readexactly(size), self._timeout)
+        except asyncio.IncompleteReadError:
+            raise Disconnect()
+
+    async def _read_size(self):
+        return size_pack.unpack(await self._read(size_pack.size))[0]
+
+    async def _read_sized_packet(self, size):
+        if size > MAX_ALLOWED_PACKET_SIZE:
+            logger.log(logging.WARNING if self._got_packet else logging.INFO,
+                       'Disconnecting client due to too-large message size (%d bytes): %s', size, self.client_address)
+            raise Disconnect()
+        await self._call(self._on_packet, await self._read(size))
+
+    async def _read_proxy_header(self):
+        try:
+            line = await asyncio.wait_for(self.reader.readuntil(b'\r\n'), self._timeout)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            raise Disconnect()
+        if len(line) > MAX_PROXY_HEADER_SIZE:
+            raise Disconnect()
+        return self._initial_tag + line[:-2]
+
+    async def _handle(self):
+        try:
+            tag = await self._read_size()
+            self._initial_tag = size_pack.pack(tag)
+            if self.client_address[0] in self.proxies and self._initial_tag == b'PROX':
+                self.parse_proxy_protocol(await self._read_proxy_header())
+            else:
+                await self._read_sized_packet(tag)
+
+            while True:
+                await self._read_sized_packet(await self._read_size())
+        except Disconnect:
+            return
+        except zlib.error:
+            if self._got_packet:
+                logger.warning('Encountered zlib error during packet handling, disconnecting client: %s',
+                               self.client_address, exc_info=True)
+            else:
+                logger.info('Potentially wrong protocol (zlib error): %s: %r', self.client_address, self._initial_tag,
+                            exc_info=True)
+        except asyncio.TimeoutError:
+            if self._got_packet:
+                logger.info('Socket timed out: %s', self.client_address)
+                await self._call(self.on_timeout)
+            else:
+                logger.info('Potentially wrong protocol: %s: %r', self.client_address, self._initial_tag)
+        finally:
+            await self._call(self.on_cleanup)
+
+    async def serve(self):
+        await self._call(self.on_connect)
+        try:
+            await self._handle()
+        except Exception:
+            logger.exception('Error in base packet handling')
+        finally:
+            try:
+                await self._call(self.on_disconnect)
+            finally:
+                self._close()
+
+    def _write(self, data):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+    def _close(self):
+        if not self.writer.is_closing():
+            self.writer.close()
+
+    def send(self, data):
+        compressed = zlib.compress(data.encode('utf-8'))
+        self.loop.call_soon_threadsafe(self._write, size_pack.pack(len(compressed)) + compressed)
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self._close)
+
+
+class AsyncServer:
+    """
+    Serves every (addresses, handler) listener on a single asyncio event loop, with handler callbacks offloaded to a
+    thread pool of at most `max_workers` threads. Has the same interface as `judge.bridge.server.Server`.
+    """
+
+    def __init__(self, listeners, max_workers=None):
+        self.listeners = listeners
+        self.loop = asyncio.new_event_loop()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='bridge-worker')
+        self._servers = []
+        self._connections = set()
+        self._shutdown = threading.Event()
+
+    async def _accept(self, handler, reader, writer):
+        connection = handler((reader, writer), writer.get_extra_info('peername'), self)
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            await connection.serve()
+        except asyncio.CancelledError:
+            # The server is shutting down, serve() has already cleaned up after the connection.
+            pass
+        finally:
+            self._connections.discard(task)
+
+    async def _start(self):
+        for addresses, handler in self.listeners:
+            for host, port in addresses:
+                self._servers.append(await asyncio.start_server(
+                    partial(self._accept, handler), host, port, reuse_address=True,
+                ))
+
+    async def _stop(self):
+        for server in self._servers:
+            server.close()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        for server in self._servers:
+            await server.wait_closed()
+
+    def serve_forever(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._start())
+            self.loop.run_until_complete(self.loop.run_in_executor(None, self._shutdown.wait))
+        finally:
+            self.loop.run_until_complete(self._stop())
+            self.loop.close()
+            self.executor.shutdown(wait=False)
+
+    def shutdown(self):
+        self._shutdown.set()
@@ -5,9 +5,13 @@ from functools import partial
 
 from django.conf import settings
 
-from judge.bridge.django_handler import DjangoHandler
-from judge.bridge.judge_handler import JudgeHandler
+from judge.bridge.async_server import AsyncServer
+from judge.bridge.deferred_updates import deferred_updates
+from judge.bridge.dispatch_policy import DISPATCH_POLICIES
+from judge.bridge.django_handler import AsyncDjangoHandler, DjangoHandler
+from judge.bridge.judge_handler import AsyncJudgeHandler, JudgeHandler
 from judge.bridge.judge_list import JudgeList
+from judge.bridge.metrics import MetricsServer
 from judge.bridge.server import Server
 from judge.models import Judge, Submission
 
@@ -22,13 +26,27 @@ def judge_daemon():
     reset_judges()
     Submission.objects.filter(status__in=Submission.IN_PROGRESS_GRADING_STATUS) \
         .update(status='IE', result='IE', error=None)
-    judges = JudgeList()
+    judges = JudgeList(DISPATCH_POLICIES[getattr(settings, 'BRIDGED_DISPATCH_POLICY', 'load')]())
+    deferred_updates.start(workers=getattr(settings, 'BRIDGED_DEFERRED_UPDATE_WORKERS', 2),
+                           delay=getattr(settings, 'BRIDGED_DEFERRED_UPDATE_DELAY', 1.0))
 
-    judge_server = Server(settings.BRIDGED_JUDGE_ADDRESS, partial(JudgeHandler, judges=judges))
-    django_server = Server(settings.BRIDGED_DJANGO_ADDRESS, partial(DjangoHandler, judges=judges))
+    if getattr(settings, 'BRIDGED_ASYNC', False):
+        servers = [AsyncServer([
+            (settings.BRIDGED_DJANGO_ADDRESS, partial(AsyncDjangoHandler, judges=judges)),
+            (settings.BRIDGED_JUDGE_ADDRESS, partial(AsyncJudgeHandler, judges=judges)),
+        ], max_workers=getattr(settings, 'BRIDGED_ASYNC_WORKERS', 16))]
+    else:
+        servers = [
+            Server(settings.BRIDGED_DJANGO_ADDRESS, partial(DjangoHandler, judges=judges)),
+            Server(settings.BRIDGED_JUDGE_ADDRESS, partial(JudgeHandler, judges=judges)),
+        ]
 
-    threading.Thread(target=django_server.serve_forever).start()
-    threading.Thread(target=judge_server.serve_forever).start()
+    metrics_address = getattr(settings, 'BRIDGED_METRICS_ADDRESS', None)
+    if metrics_address:
+        servers.append(MetricsServer(metrics_address, judges))
+
+    for server in servers:
+        threading.Thread(target=server.serve_forever).start()
 
     stop = threading.Event()
 
@@ -43,5 +61,6 @@ def judge_daemon():
     try:
         stop.wait()
     finally:
-        django_server.shutdown()
-        judge_server.shutdown()
+        for server in servers:
+            server.shutdown()
+        deferred_updates.shutdown()
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django import db
+
+from judge import event_poster as event
+from judge.models import ContestParticipation, Profile, UserProblemPoints
+
+logger = logging.getLogger('judge.bridge')
+
+
+class DeferredUpdateQueue(object):
+    """
+    Runs expensive recalculations after grading on a pool of worker threads, off the judge connection threads.
+
+    Work is identified by a key. Deferring a key that is already waiting to run is a no-op, so many submissions
+    graded for the same problem within `delay` seconds only cause one recalculation. A key deferred while it is
+    running is run again afterwards, so the final recalculation always sees the latest submission.
+
+    Until start() is called, deferred work runs immediately in the calling thread.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()  # key: (due, callback)
+        self._running = set()
+        self._rerun = {}
+        self._threads = []
+        self._stopping = False
+        self.delay = 0
+        self.deferred = 0
+        self.coalesced = 0
+        self.executed = 0
+
+    def start(self, workers, delay):
+        self.delay = delay
+        self._stopping = False
+        self._threads = [threading.Thread(target=self._work, name='deferred-update-%d' % i, daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def shutdown(self):
+        # Run everything that is still pending before exiting, so that no statistics are left stale.
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+    def defer(self, key, callback):
+        if not self._threads:
+            self._run(key, callback)
+            self.executed += 1
+            return
+
+        with self._cond:
+            self.deferred += 1
+            if key in self._running:
+                self._rerun[key] = callback
+            elif key in self._pending:
+                self.coalesced += 1
+            else:
+                self._pending[key] = (time.monotonic() + self.delay, callback)
+                self._cond.notify()
+
+    def _run(self, key, callback):
+        try:
+            db.connection.close_if_unusable_or_obsolete()
+            callback()
+        except Exception:
+            logger.exception('Deferred update failed: %s', key)
+
+    def _next(self):
+        with self._cond:
+            while True:
+                if self._pending:
+                    key, (due, callback) = next(iter(self._pending.items()))
+                    wait = due - time.monotonic()
+                    if wait <= 0 or self._stopping:
+                        del self._pending[key]
+                        self._running.add(key)
+                        return key, callback
+                    self._cond.wait(wait)
+                elif self._stopping:
+                    return None, None
+                else:
+                    self._cond.wait()
+
+    def _work(self):
+        try:
+            while True:
+                key, callback = self._next()
+                if key is None:
+                    return
+                self._run(key, callback)
+                with self._cond:
+                    self.executed += 1
+                    self._running.discard(key)
+                    if key in self._rerun:
+                        self._pending[key] = (time.monotonic() + self.delay, self._rerun.pop(key))
+                        self._cond.notify()
+        finally:
+            db.connection.close()
+
+
+deferred_updates = DeferredUpdateQueue()
+
+
+# Problems whose best points changed per user since their points were last calculated.
+_user_problems = {}
+_user_lock = threading.Lock()
+
+
+def _update_user_points(profile_id):
+    with _user_lock:
+        problem_ids = _user_problems.pop(profile_id, set())
+    for problem_id in sorted(problem_ids):
+        UserProblemPoints.update(profile_id, problem_id)
+    profile = Profile.objects.get(id=profile_id)
+    profile._updating_stats_only = True
+    profile.calculate_points()
+
+
+# Contest problems graded per participation since its last update. None means the results must be recomputed in full.
+_participation_problems = {}
+_participation_lock = threading.Lock()
+
+
+def _update_participation(participation_id):
+    with _participation_lock:
+        problem_ids = _participation_problems.pop(participation_id, None)
+    participation = ContestParticipation.objects.select_related('contest').get(id=participation_id)
+    if problem_ids is None or None in problem_ids:
+        participation.recompute_results()
+    else:
+        participation.update_problem_results(sorted(problem_ids))
+    event.post('contest_%d' % participation.contest_id, {'type': 'update'})
+
+
+def defer_user_points(profile_id, problem_id=None):
+    # With a problem, the user's best points on it are recalculated first.
+    if problem_id is not None:
+        with _user_lock:
+            _user_problems.setdefault(profile_id, set()).add(problem_id)
+    deferred_updates.defer(('user', profile_id), lambda: _update_user_points(profile_id))
+
+
+def defer_participation(participation_id, problem_id=None):
+    # Without a problem, the participation's results are recomputed in full.
+    with _participation_lock:
+        _participation_problems.setdefault(participation_id, set()).add(problem_id)
+    deferred_updates.defer(('participation', participation_id), lambda: _update_participation(participation_id))
@@ -0,0 +1,133 @@
+import time
+from collections import OrderedDict
+from random import random
+
+
+class DispatchPolicy(object):
+    """
+    Decides which judge grades a new submission, and which queued submission a judge that becomes free grades next.
+
+    This policy dispatches new submissions to the available judge reporting the least load, and hands a free judge
+    the earliest queued submission it can grade.
+
+    Policies that reorder the queue only look at the first `lookahead` submissions a judge can grade, and fall back
+    to arrival order once the earliest of them has waited `max_wait` seconds, so that nothing waits forever.
+    """
+
+    name = 'load'
+    lookahead = 16
+    max_wait = 60
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+
+    def choose_judge(self, judges, problem, language, data):
+        return min(judges, key=lambda judge: (judge.load, random()))
+
+    def choose_submission(self, queue, priority, judge):
+        return queue.first_eligible(priority, judge.can_judge)
+
+    def on_dispatch(self, judge, id, problem, language, data):
+        pass
+
+    def on_finish(self, judge, id, graded):
+        pass
+
+    def _candidates(self, queue, priority, judge):
+        candidates = queue.eligible(priority, judge.can_judge, self.lookahead)
+        if candidates and self.clock() - candidates[0].time >= self.max_wait:
+            return candidates[:1]
+        return candidates
+
+
+class ShortestJobPolicy(DispatchPolicy):
+    """
+    Dispatches the submission expected to finish first, on the judge expected to grade it the fastest.
+
+    The expected grading time of a problem, and the speed of every judge relative to the others, are learned from
+    the time between dispatching a submission and the judge becoming free again. Problems that have not been graded
+    yet are expected to take their time limit.
+    """
+
+    name = 'shortest-job'
+    smoothing = 0.2
+    default_duration = 1.0
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__(clock)
+        self._durations = {}  # problem: grading time on a judge of speed 1
+        self._speeds = {}  # judge name: grading time relative to other judges
+        self._running = {}  # submission id: (problem, whether its duration was known, start)
+
+    def _smooth(self, old, new):
+        return new if old is None else old + self.smoothing * (new - old)
+
+    def expected(self, problem, data=None):
+        duration = self._durations.get(problem)
+        if duration is None:
+            duration = data.time if data is not None else self.default_duration
+        return duration
+
+    def speed(self, judge):
+        return self._speeds.get(judge.name, 1.0)
+
+    def choose_judge(self, judges, problem, language, data):
+        return min(judges, key=lambda judge: (self.speed(judge), judge.load, random()))
+
+    def choose_submission(self, queue, priority, judge):
+        candidates = self._candidates(queue, priority, judge)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda entry: (self.expected(entry.problem, entry.data), entry.sequence))
+
+    def on_dispatch(self, judge, id, problem, language, data):
+        self._running[id] = (problem, problem in self._durations, self.clock())
+
+    def on_finish(self, judge, id, graded):
+        try:
+            problem, known, start = self._running.pop(id)
+        except KeyError:
+            return
+        if not graded:
+            return
+        duration = max(self.clock() - start, 1e-3)
+        speed = self.speed(judge)
+        if known:
+            self._speeds[judge.name] = self._smooth(speed, duration / self._durations[problem])
+        self._durations[problem] = self._smooth(self._durations.get(problem), duration / speed)
+
+
+class AffinityPolicy(DispatchPolicy):
+    """
+    Prefers giving judges problems they graded recently, since their test data is then likely to still be cached.
+    """
+
+    name = 'affinity'
+    recent_problems = 8
+
+    def __init__(self, clock=time.monotonic):
+        super().__init__(clock)
+        self._recent = {}  # judge name: OrderedDict of recently graded problems
+
+    def _is_recent(self, judge, problem):
+        return problem in self._recent.get(judge.name, ())
+
+    def choose_judge(self, judges, problem, language, data):
+        return min(judges, key=lambda judge: (not self._is_recent(judge, problem), judge.load, random()))
+
+    def choose_submission(self, queue, priority, judge):
+        candidates = self._candidates(queue, priority, judge)
+        for entry in candidates:
+            if self._is_recent(judge, entry.problem):
+                return entry
+        return candidates[0] if candidates else None
+
+    def on_dispatch(self, judge, id, problem, language, data):
+        recent = self._recent.setdefault(judge.name, OrderedDict())
+        recent[problem] = True
+        recent.move_to_end(problem)
+        while len(recent) > self.recent_problems:
+            recent.popitem(last=False)
+
+
+DISPATCH_POLICIES = {policy.name: policy for policy in (DispatchPolicy, ShortestJobPolicy, AffinityPolicy)}
@@ -0,0 +1,118 @@
+import heapq
+import json
+from collections import defaultdict, namedtuple
+
+from judge.bridge.judge_list import JudgeList
+from judge.bridge.simulation import FakeJudge
+
+RecordedSubmission = namedtuple('RecordedSubmission', 'id arrival problem language pinned priority judge duration')
+
+
+class Anything(object):
+    def __contains__(self, item):
+        return True
+
+
+def read_log(lines):
+    """
+    Collect the submissions graded in a `judge.json.bridge` log, from the queue, dispatch and free records written
+    by JudgeList. Lines may carry a prefix added by the log formatter. Submissions that were never dispatched, or
+    whose judge disconnected while grading, are left out.
+    """
+    current = {}
+    submissions = []
+    for line in lines:
+        start = line.find('{')
+        if start < 0:
+            continue
+        try:
+            record = json.loads(line[start:])
+        except ValueError:
+            continue
+        action, id = record.get('action'), record.get('submission')
+        if action == 'queue':
+            current[id] = dict(record, dispatched=None, judge=None)
+        elif action == 'dispatch' and id in current:
+            current[id].update(dispatched=record['when'], judge=record['judge'])
+        elif action == 'free' and id in current:
+            queued = current.pop(id)
+            if queued['dispatched'] is None:
+                continue
+            submissions.append(RecordedSubmission(
+                id=len(submissions), arrival=queued['when'], problem=queued['problem'],
+                language=queued['language'], pinned=queued['pinned'], priority=queued['priority'],
+                judge=queued['judge'], duration=record['when'] - queued['dispatched'],
+            ))
+    submissions.sort(key=lambda submission: submission.arrival)
+    return submissions
+
+
+def judge_speeds(submissions):
+    """Estimate how long every judge takes to grade a submission, relative to the average over all judges."""
+    durations = defaultdict(list)
+    for submission in submissions:
+        durations[submission.problem].append(submission.duration)
+    means = {problem: sum(values) / len(values) for problem, values in durations.items()}
+
+    ratios = defaultdict(list)
+    for submission in submissions:
+        if means[submission.problem] > 0:
+            ratios[submission.judge].append(submission.duration / means[submission.problem])
+    return {judge: sum(values) / len(values) for judge, values in ratios.items()}
+
+
+class ReplayJudge(FakeJudge):
+    def __init__(self, name, speed, replay):
+        super().__init__(name, Anything(), Anything())
+        self.load = 0
+        self.speed = speed
+        self.replay = replay
+
+    def submit(self, id, problem, language, source, data=None):
+        super().submit(id, problem, language, source, data)
+        self.replay.start(self, id)
+
+
+class Replay(object):
+    """
+    Replays recorded submissions through a JudgeList using the given policy, in simulated time.
+
+    A submission takes as long as it did when recorded, scaled by the relative speed of the judge it is replayed on.
+    """
+
+    def __init__(self, submissions, speeds, policy_class):
+        self.submissions = submissions
+        self.speeds = speeds
+        self.now = 0
+        self.judges = JudgeList(policy_class(clock=lambda: self.now))
+        self.fleet = [ReplayJudge(name, speed, self) for name, speed in sorted(speeds.items())]
+        self.waits = []
+        self._events = []
+
+    def _schedule(self, when, kind, payload):
+        # Judges are freed before submissions arriving at the same time are queued.
+        heapq.heappush(self._events, (when, kind, len(self._events), payload))
+
+    def start(self, judge, id):
+        submission = self.submissions[id]
+        self.waits.append(self.now - submission.arrival)
+        speed = self.speeds.get(submission.judge) or 1.0
+        self._schedule(self.now + submission.duration / speed * judge.speed, 0, (judge, id))
+
+    def run(self):
+        for submission in self.submissions:
+            self._schedule(submission.arrival, 1, submission)
+        if self.submissions:
+            self.now = self.submissions[0].arrival
+        for judge in self.fleet:
+            self.judges.register(judge)
+
+        while self._events:
+            self.now, kind, _, payload = heapq.heappop(self._events)
+            if kind:
+                self.judges.judge(payload.id, payload.problem, payload.language, '', payload.pinned,
+                                  payload.priority)
+            else:
+                judge, id = payload
+                self.judges.on_judge_free(judge, id)
+        return self.waits
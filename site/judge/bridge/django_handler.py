@@ -1,10 +1,14 @@
 import json
 import logging
 import struct
+import time
 
 from django import db
 
+from judge.bridge.async_server import AsyncZlibPacketHandler
 from judge.bridge.base_handler import Disconnect, ZlibPacketHandler
+from judge.bridge.metrics import collect_stats, metrics
+from judge.bridge.submission_queue import SubmissionData
 
 logger = logging.getLogger('judge.bridge')
 size_pack = struct.Struct('!I')
@@ -16,9 +20,12 @@ class DjangoHandler(ZlibPacketHandler):
 
         self.handlers = {
             'submission-request': self.on_submission,
+            'submission-request-many': self.on_submission_many,
             'terminate-submission': self.on_termination,
             'disconnect-judge': self.on_disconnect_request,
             'disable-judge': self.on_disable_judge,
+            'queue-stats': self.on_queue_stats,
+            'bridge-stats': self.on_bridge_stats,
         }
         self.judges = judges
 
@@ -27,26 +34,60 @@ class DjangoHandler(ZlibPacketHandler):
 
     def on_packet(self, packet):
         packet = json.loads(packet)
+        request_id = packet.get('request-id', None)
+        name = packet.get('name', None)
+        start = time.perf_counter()
         try:
-            result = self.handlers.get(packet.get('name', None), self.on_malformed)(packet)
+            result = self.handlers.get(name, self.on_malformed)(packet)
         except Exception:
             logger.exception('Error in packet handling (Django-facing)')
             result = {'name': 'bad-request'}
-        self.send(result)
-        raise Disconnect()
+        metrics.observe_packet('django', name if name in self.handlers else 'malformed', time.perf_counter() - start)
 
-    def on_submission(self, data):
+        if request_id is None:
+            self.send(result)
+            raise Disconnect()
+
+        # Requests tagged with an ID come from a persistent connection, which stays open for further requests.
+        self.send(dict(result or {}, **{'request-id': request_id}))
+
+    def on_submission(self, data, sources=None):
         id = data['submission-id']
         problem = data['problem-id']
         language = data['language']
-        source = data['source']
+        source = data['source'] if 'source' in data else sources[data['source-hash']]
         judge_id = data['judge-id']
         priority = data['priority']
         if not self.judges.check_priority(priority):
             return {'name': 'bad-request'}
-        self.judges.judge(id, problem, language, source, judge_id, priority)
+        self.judges.judge(id, problem, language, source, judge_id, priority, self._submission_data(data))
         return {'name': 'submission-received', 'submission-id': id}
 
+    def _submission_data(self, data):
+        # Requests from older sites do not carry the submission data, in which case it is fetched on dispatch.
+        if 'meta' not in data:
+            return None
+        meta = data['meta']
+        return SubmissionData(
+            time=data['time-limit'],
+            memory=data['memory-limit'],
+            short_circuit=data['short-circuit'],
+            pretests_only=meta['pretests-only'],
+            contest_no=meta['in-contest'],
+            attempt_no=meta['attempt-no'],
+            user_id=meta['user'],
+        )
+
+    def on_submission_many(self, data):
+        # Sources may be sent once per batch, keyed by hash, and referred to by the requests that share them.
+        sources = data.get('sources')
+        received = []
+        for request in data['submissions']:
+            result = self.on_submission(request, sources)
+            if result['name'] == 'submission-received':
+                received.append(result['submission-id'])
+        return {'name': 'submissions-received', 'submission-ids': received}
+
     def on_termination(self, data):
         return {'name': 'submission-received', 'judge-aborted': self.judges.abort(data['submission-id'])}
 
@@ -60,8 +101,18 @@ class DjangoHandler(ZlibPacketHandler):
         is_disabled = data['is-disabled']
         self.judges.update_disable_judge(judge_id, is_disabled)
 
+    def on_queue_stats(self, data):
+        return dict(self.judges.queue_stats(), name='queue-stats')
+
+    def on_bridge_stats(self, data):
+        return dict(collect_stats(self.judges), name='bridge-stats')
+
     def on_malformed(self, packet):
         logger.error('Malformed packet: %s', packet)
 
     def on_cleanup(self):
         db.connection.close()
+
+
+class AsyncDjangoHandler(DjangoHandler, AsyncZlibPacketHandler):
+    pass
@@ -1,3 +1,4 @@
+from judge.bridge.async_server import AsyncZlibPacketHandler
 from judge.bridge.base_handler import ZlibPacketHandler
 
 
@@ -18,20 +19,27 @@ class EchoPacketHandler(ZlibPacketHandler):
         print('Closed client:', self.client_address)
 
 
+class AsyncEchoPacketHandler(EchoPacketHandler, AsyncZlibPacketHandler):
+    pass
+
+
 def main():
     import argparse
+    from judge.bridge.async_server import AsyncServer
     from judge.bridge.server import Server
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-l', '--host', action='append')
     parser.add_argument('-p', '--port', type=int, action='append')
     parser.add_argument('-P', '--proxy', action='append')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='serve from an asyncio event loop')
     args = parser.parse_args()
 
-    class Handler(EchoPacketHandler):
+    class Handler(AsyncEchoPacketHandler if args.use_async else EchoPacketHandler):
         proxies = args.proxy or []
 
-    server = Server(list(zip(args.host, args.port)), Handler)
+    addresses = list(zip(args.host, args.port))
+    server = AsyncServer([(addresses, Handler)]) if args.use_async else Server(addresses, Handler)
     server.serve_forever()
 
 
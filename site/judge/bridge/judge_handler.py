@@ -4,16 +4,21 @@ import logging
 import threading
 import time
 import pickle
-from collections import deque, namedtuple
+from collections import deque
 from operator import itemgetter
 
 from django import db
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
 from judge import event_poster as event
+from judge.bridge.async_server import AsyncZlibPacketHandler
 from judge.bridge.base_handler import ZlibPacketHandler, proxy_list
-from judge.caching import finished_submission
+from judge.bridge.deferred_updates import defer_participation, defer_user_points
+from judge.bridge.metrics import metrics
+from judge.bridge.submission_queue import SubmissionData
+from judge.caching import finished_submission, release_submission
 from judge.models import Judge, Language, LanguageLimit, Problem, RuntimeVersion, Submission, SubmissionTestCase
 
 logger = logging.getLogger('judge.bridge')
@@ -21,7 +26,53 @@ json_log = logging.getLogger('judge.json.bridge')
 
 UPDATE_RATE_LIMIT = 5
 UPDATE_RATE_TIME = 0.5
-SubmissionData = namedtuple('SubmissionData', 'time memory short_circuit pretests_only contest_no attempt_no user_id')
+# Test case results are buffered and written to the database once this many rows have been buffered, once the oldest
+# buffered row is this many seconds old, or whenever grading of the submission finishes.
+TEST_CASE_BUFFER_SIZE = 50
+TEST_CASE_BUFFER_TIME = 1.0
+STATUS_CODES = ['SC', 'AC', 'WA', 'MLE', 'TLE', 'IR', 'RTE', 'OLE']
+
+
+class CaseAggregate(object):
+    """
+    Running totals over the test cases of a submission, used to compute the final result at grading end.
+    """
+
+    def __init__(self):
+        self.time = 0
+        self.memory = 0
+        self.points = 0.0
+        self.total = 0
+        self.status = 0
+        self.batches = {}  # batch number: [points, total]
+
+    def add(self, case):
+        self.time += case.time
+        if not case.batch:
+            self.points += case.points
+            self.total += case.total
+        else:
+            if case.batch in self.batches:
+                self.batches[case.batch][0] = min(self.batches[case.batch][0], case.points)
+                self.batches[case.batch][1] = max(self.batches[case.batch][1], case.total)
+            else:
+                self.batches[case.batch] = [case.points, case.total]
+        self.memory = max(self.memory, case.memory)
+        i = STATUS_CODES.index(case.status)
+        if i > self.status:
+            self.status = i
+
+    @property
+    def case_points(self):
+        return round(self.points + sum(points for points, _ in self.batches.values()), 1)
+
+    @property
+    def case_total(self):
+        return round(self.total + sum(total for _, total in self.batches.values()), 1)
+
+    @property
+    def result(self):
+        return STATUS_CODES[self.status]
 
 
 def _ensure_connection():
@@ -65,6 +116,8 @@ class JudgeHandler(ZlibPacketHandler):
         self._stop_ping = threading.Event()
         self._ping_average = deque(maxlen=6)  # 1 minute average, just like load
         self._time_delta = deque(maxlen=6)
+        self.graded = 0
+        self._graded_times = deque()
 
         # each value is (updates, last reset)
         self.update_counter = {}
@@ -74,6 +127,14 @@ class JudgeHandler(ZlibPacketHandler):
         self._submission_cache_id = None
         self._submission_cache = {}
 
+        # The buffer is flushed both by packets and by the timer that bounds how long a row stays in it.
+        self._test_case_lock = threading.RLock()
+        self._test_case_flush_job = None
+        self._reset_test_case_buffer()
+        self._reset_aggregate()
+        self.test_case_transactions = 0
+        self.test_case_rows_flushed = 0
+
     def on_connect(self):
         self.timeout = 15
         logger.info('Judge connected from: %s', self.client_address)
@@ -81,6 +142,10 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_disconnect(self):
         self._stop_ping.set()
+        try:
+            self._flush_test_cases()
+        except Exception:
+            logger.exception('Failed to save buffered test cases of %s: %s', self._test_case_buffer_id, self.name)
         if self._working:
             logger.error('Judge %s disconnected while handling submission %s', self.name, self._working)
         self.judges.remove(self)
@@ -91,6 +156,7 @@ class JudgeHandler(ZlibPacketHandler):
         json_log.info(self._make_json_log(action='disconnect', info='judge disconnected'))
         if self._working:
             Submission.objects.filter(id=self._working).update(status='IE', result='IE', error='')
+            self._release_submission(self._working)
             json_log.error(self._make_json_log(sub=self._working, action='close', info='IE due to shutdown on grading'))
 
     def _authenticate(self, id, key):
@@ -169,7 +235,7 @@ class JudgeHandler(ZlibPacketHandler):
         self.send({'name': 'handshake-success'})
         logger.info('Judge authenticated: %s (%s)', self.client_address, packet['id'])
         self.judges.register(self)
-        threading.Thread(target=self._ping_thread).start()
+        self._start_ping()
         self._connected()
 
     def can_judge(self, problem, executor, judge_id=None):
@@ -223,10 +289,13 @@ class JudgeHandler(ZlibPacketHandler):
         else:
             self.send({'name': 'disconnect'})
 
-    def submit(self, id, problem, language, source):
-        data = self.get_related_submission_data(id)
+    def submit(self, id, problem, language, source, data=None):
+        # The site normally sends the submission data along with the request. Only fall back to querying for it
+        # if it did not, since this runs while the judge list is locked.
+        if data is None:
+            data = self.get_related_submission_data(id)
         self._working = id
-        self._no_response_job = threading.Timer(20, self._kill_if_no_response)
+        self._no_response_job = self._create_no_response_job()
         self.send({
             'name': 'submission-request',
             'submission-id': id,
@@ -244,6 +313,27 @@ class JudgeHandler(ZlibPacketHandler):
             },
         })
 
+    def _create_no_response_job(self):
+        return threading.Timer(20, self._kill_if_no_response)
+
+    def _create_test_case_flush_job(self):
+        job = threading.Timer(TEST_CASE_BUFFER_TIME, self._flush_test_cases_in_thread)
+        job.daemon = True
+        job.start()
+        return job
+
+    def _flush_test_cases_in_thread(self):
+        try:
+            self._flush_test_cases_on_time()
+        finally:
+            db.connection.close()
+
+    def _flush_test_cases_on_time(self):
+        try:
+            self._flush_test_cases()
+        except Exception:
+            logger.exception('Failed to save buffered test cases of %s: %s', self._test_case_buffer_id, self.name)
+
     def _kill_if_no_response(self):
         logger.error('Judge failed to acknowledge submission: %s: %s', self.name, self._working)
         self.close()
@@ -266,8 +356,10 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_submission_wrong_acknowledge(self, packet, expected, got):
         json_log.error(self._make_json_log(packet, action='processing', info='wrong-acknowledge', expected=expected))
-        Submission.objects.filter(id=expected).update(status='IE', result='IE', error=None)
-        Submission.objects.filter(id=got, status='QU').update(status='IE', result='IE', error=None)
+        if Submission.objects.filter(id=expected).update(status='IE', result='IE', error=None):
+            self._release_submission(expected)
+        if Submission.objects.filter(id=got, status='QU').update(status='IE', result='IE', error=None):
+            self._release_submission(got)
 
     def on_submission_acknowledged(self, packet):
         if not packet.get('submission-id', None) == self._working:
@@ -299,8 +391,12 @@ class JudgeHandler(ZlibPacketHandler):
             except ValueError:
                 self.on_malformed(data)
             else:
-                handler = self.handlers.get(data['name'], self.on_malformed)
-                handler(data)
+                name = data['name'] if data['name'] in self.handlers else 'malformed'
+                start = time.perf_counter()
+                try:
+                    self.handlers.get(data['name'], self.on_malformed)(data)
+                finally:
+                    metrics.observe_packet('judge', name, time.perf_counter() - start)
         except Exception:
             logger.exception('Error in packet handling (Judge-side): %s', self.name)
             self._packet_exception()
@@ -327,6 +423,11 @@ class JudgeHandler(ZlibPacketHandler):
     def on_grading_begin(self, packet):
         logger.info('%s: Grading has begun on: %s', self.name, packet['submission-id'])
         self.batch_id = None
+        with self._test_case_lock:
+            if self._test_case_buffer_id != packet['submission-id']:
+                self._flush_test_cases()
+            self._reset_test_case_buffer()
+        self._reset_aggregate(packet['submission-id'])
 
         if Submission.objects.filter(id=packet['submission-id']).update(
                 status='G', is_pretested=packet['pretested'], current_testcase=1,
@@ -341,6 +442,8 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_grading_end(self, packet):
         logger.info('%s: Grading has ended on: %s', self.name, packet['submission-id'])
+        # Every buffered test case must be in the database before the results are aggregated below.
+        self._flush_test_cases()
         self._free_self(packet)
         self.batch_id = None
 
@@ -351,36 +454,20 @@ class JudgeHandler(ZlibPacketHandler):
             json_log.error(self._make_json_log(packet, action='grading-end', info='unknown submission'))
             return
 
-        time = 0
-        memory = 0
-        points = 0.0
-        total = 0
-        status = 0
-        status_codes = ['SC', 'AC', 'WA', 'MLE', 'TLE', 'IR', 'RTE', 'OLE']
-        batches = {}  # batch number: (points, total)
-
-        for case in SubmissionTestCase.objects.filter(submission=submission):
-            time += case.time
-            if not case.batch:
-                points += case.points
-                total += case.total
-            else:
-                if case.batch in batches:
-                    batches[case.batch][0] = min(batches[case.batch][0], case.points)
-                    batches[case.batch][1] = max(batches[case.batch][1], case.total)
-                else:
-                    batches[case.batch] = [case.points, case.total]
-            memory = max(memory, case.memory)
-            i = status_codes.index(case.status)
-            if i > status:
-                status = i
-
-        for i in batches:
-            points += batches[i][0]
-            total += batches[i][1]
-
-        points = round(points, 1)
-        total = round(total, 1)
+        if self._aggregate_id == submission.id:
+            aggregate = self._aggregate
+        else:
+            # We did not see this submission being graded from the start, e.g. because the bridge restarted while it
+            # was being graded, so the totals have to come from the database.
+            aggregate = CaseAggregate()
+            for case in SubmissionTestCase.objects.filter(submission=submission):
+                aggregate.add(case)
+        self._reset_aggregate()
+
+        time = aggregate.time
+        memory = aggregate.memory
+        points = aggregate.case_points
+        total = aggregate.case_total
         submission.case_points = points
         submission.case_total = total
 
@@ -393,7 +480,7 @@ class JudgeHandler(ZlibPacketHandler):
         submission.time = time
         submission.memory = memory
         submission.points = sub_points
-        submission.result = status_codes[status]
+        submission.result = aggregate.result
         submission.save()
 
         json_log.info(self._make_json_log(
@@ -403,16 +490,21 @@ class JudgeHandler(ZlibPacketHandler):
             problem=problem.code, finish=True,
         ))
 
-        # if problem.is_public and not problem.is_organization_private:
-        if problem.is_public:
-            submission.user._updating_stats_only = True
-            submission.user.calculate_points()
-
-        problem._updating_stats_only = True
-        problem.update_stats()
-        submission.update_contest()
+        # Aggregate statistics are recalculated later by the deferred update workers, so that they do not delay this
+        # judge from getting its next submission. Many verdicts for the same user, problem or participation in quick
+        # succession only cause one recalculation each.
+        # The best points are kept for private problems too, since they only count once the problem is public.
+        # Updating them also adjusts the problem's statistics by the change in the user's counts.
+        defer_user_points(submission.user_id, problem.id)
+        submission.update_contest(recompute=False)
+        if hasattr(submission, 'contest'):
+            # Rejudges are recomputed in full, see Submission.update_contest.
+            defer_participation(submission.contest.participation_id,
+                                submission.contest.problem_id if submission.rejudged_date is None else None)
 
         finished_submission(submission)
+        if submission.rejudged_date is None:
+            release_submission(submission.user_id)
 
         event.post('sub_%s' % submission.id_secret, {
             'type': 'grading-end',
@@ -422,13 +514,11 @@ class JudgeHandler(ZlibPacketHandler):
             'total': float(problem.points),
             'result': submission.result,
         })
-        if hasattr(submission, 'contest'):
-            participation = submission.contest.participation
-            event.post('contest_%d' % participation.contest_id, {'type': 'update'})
         self._post_update_submission(submission.id, 'grading-end', done=True)
 
     def on_compile_error(self, packet):
         logger.info('%s: Submission failed to compile: %s', self.name, packet['submission-id'])
+        self._flush_test_cases()
         self._free_self(packet)
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='CE', result='CE', error=packet['log']):
@@ -437,6 +527,7 @@ class JudgeHandler(ZlibPacketHandler):
                 'log': packet['log'],
             })
             self._post_update_submission(packet['submission-id'], 'compile-error', done=True)
+            self._release_submission(packet['submission-id'])
             json_log.info(self._make_json_log(packet, action='compile-error', log=packet['log'],
                                               finish=True, result='CE'))
         else:
@@ -460,12 +551,14 @@ class JudgeHandler(ZlibPacketHandler):
             raise ValueError('\n\n' + packet['message'])
         except ValueError:
             logger.exception('Judge %s failed while handling submission %s', self.name, packet['submission-id'])
+        self._flush_test_cases()
         self._free_self(packet)
 
         id = packet['submission-id']
         if Submission.objects.filter(id=id).update(status='IE', result='IE', error=packet['message']):
             event.post('sub_%s' % Submission.get_id_secret(id), {'type': 'internal-error'})
             self._post_update_submission(id, 'internal-error', done=True)
+            self._release_submission(id)
             json_log.info(self._make_json_log(packet, action='internal-error', message=packet['message'],
                                               finish=True, result='IE'))
         else:
@@ -475,6 +568,7 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_submission_terminated(self, packet):
         logger.info('%s: Submission aborted: %s', self.name, packet['submission-id'])
+        self._flush_test_cases()
         self._free_self(packet)
 
         self.test_ksl([
@@ -483,6 +577,12 @@ class JudgeHandler(ZlibPacketHandler):
 
         if Submission.objects.filter(id=packet['submission-id']).update(status='AB', result='AB', points=0):
             event.post('sub_%s' % Submission.get_id_secret(packet['submission-id']), {'type': 'aborted-submission'})
+            # An aborted rejudge loses the points the submission had before.
+            submission = Submission.objects.values('user_id', 'problem_id', 'rejudged_date') \
+                                           .get(id=packet['submission-id'])
+            defer_user_points(submission['user_id'], submission['problem_id'])
+            if submission['rejudged_date'] is None:
+                release_submission(submission['user_id'])
             self._post_update_submission(packet['submission-id'], 'terminated', done=True)
             json_log.info(self._make_json_log(packet, action='aborted', finish=True, result='AB'))
         else:
@@ -538,50 +638,95 @@ class JudgeHandler(ZlibPacketHandler):
         updates = packet['cases']
         max_position = max(map(itemgetter('position'), updates))
 
-        if not Submission.objects.filter(id=id).update(current_testcase=max_position + 1):
-            logger.warning('Unknown submission: %s', id)
-            json_log.error(self._make_json_log(packet, action='test-case', info='unknown submission'))
+        with self._test_case_lock:
+            if self._test_case_buffer_id != id:
+                self._flush_test_cases()
+                self._test_case_buffer_id = id
+            if not self._test_case_buffer:
+                self._test_case_buffer_time = time.monotonic()
+                self._test_case_flush_job = self._create_test_case_flush_job()
+
+            for result in updates:
+                test_case = SubmissionTestCase(submission_id=id, case=result['position'])
+                status = result['status']
+                if status & 4:
+                    test_case.status = 'TLE'
+                elif status & 8:
+                    test_case.status = 'MLE'
+                elif status & 64:
+                    test_case.status = 'OLE'
+                elif status & 2:
+                    test_case.status = 'RTE'
+                elif status & 16:
+                    test_case.status = 'IR'
+                elif status & 1:
+                    test_case.status = 'WA'
+                elif status & 32:
+                    test_case.status = 'SC'
+                else:
+                    test_case.status = 'AC'
+                test_case.time = result['time']
+                test_case.memory = result['memory']
+                test_case.points = result['points']
+                test_case.total = result['total-points']
+                test_case.batch = self.batch_id if self.in_batch else None
+                test_case.feedback = (result.get('feedback') or '')[:max_feedback]
+                test_case.extended_feedback = result.get('extended-feedback') or ''
+                test_case.output = result['output']
+                self._test_case_buffer.append(test_case)
+                if self._aggregate_id == id:
+                    self._aggregate.add(test_case)
+
+                json_log.info(self._make_json_log(
+                    packet, action='test-case', case=test_case.case, batch=test_case.batch,
+                    time=test_case.time, memory=test_case.memory, feedback=test_case.feedback,
+                    extended_feedback=test_case.extended_feedback, output=test_case.output,
+                    points=test_case.points, total=test_case.total, status=test_case.status,
+                    voluntary_context_switches=result.get('voluntary-context-switches', 0),
+                    involuntary_context_switches=result.get('involuntary-context-switches', 0),
+                    runtime_version=result.get('runtime-version', ''),
+                ))
+
+            self._test_case_position = max(self._test_case_position, max_position)
+            if len(self._test_case_buffer) >= TEST_CASE_BUFFER_SIZE or \
+                    time.monotonic() - self._test_case_buffer_time >= TEST_CASE_BUFFER_TIME:
+                self._flush_test_cases()
+
+    def _reset_aggregate(self, id=None):
+        self._aggregate_id = id
+        self._aggregate = CaseAggregate()
+
+    def _reset_test_case_buffer(self, id=None):
+        self._test_case_buffer_id = id
+        self._test_case_buffer = []
+        self._test_case_buffer_time = 0
+        self._test_case_position = 0
+        if self._test_case_flush_job is not None:
+            self._test_case_flush_job.cancel()
+            self._test_case_flush_job = None
+
+    def _flush_test_cases(self):
+        with self._test_case_lock:
+            self._flush_test_cases_locked()
+
+    def _flush_test_cases_locked(self):
+        id = self._test_case_buffer_id
+        cases = self._test_case_buffer
+        position = self._test_case_position
+        self._reset_test_case_buffer(id)
+        if id is None or not cases:
             return
 
-        bulk_test_case_updates = []
-        for result in updates:
-            test_case = SubmissionTestCase(submission_id=id, case=result['position'])
-            status = result['status']
-            if status & 4:
-                test_case.status = 'TLE'
-            elif status & 8:
-                test_case.status = 'MLE'
-            elif status & 64:
-                test_case.status = 'OLE'
-            elif status & 2:
-                test_case.status = 'RTE'
-            elif status & 16:
-                test_case.status = 'IR'
-            elif status & 1:
-                test_case.status = 'WA'
-            elif status & 32:
-                test_case.status = 'SC'
-            else:
-                test_case.status = 'AC'
-            test_case.time = result['time']
-            test_case.memory = result['memory']
-            test_case.points = result['points']
-            test_case.total = result['total-points']
-            test_case.batch = self.batch_id if self.in_batch else None
-            test_case.feedback = (result.get('feedback') or '')[:max_feedback]
-            test_case.extended_feedback = result.get('extended-feedback') or ''
-            test_case.output = result['output']
-            bulk_test_case_updates.append(test_case)
-
-            json_log.info(self._make_json_log(
-                packet, action='test-case', case=test_case.case, batch=test_case.batch,
-                time=test_case.time, memory=test_case.memory, feedback=test_case.feedback,
-                extended_feedback=test_case.extended_feedback, output=test_case.output,
-                points=test_case.points, total=test_case.total, status=test_case.status,
-                voluntary_context_switches=result.get('voluntary-context-switches', 0),
-                involuntary_context_switches=result.get('involuntary-context-switches', 0),
-                runtime_version=result.get('runtime-version', ''),
-            ))
+        with transaction.atomic():
+            if not Submission.objects.filter(id=id).update(current_testcase=position + 1):
+                logger.warning('Unknown submission: %s', id)
+                json_log.error(self._make_json_log(sub=id, action='test-case', info='unknown submission'))
+                return
+            SubmissionTestCase.objects.bulk_create(cases)
+
+        self.test_case_transactions += 1
+        self.test_case_rows_flushed += len(cases)
+        logger.debug('%s: Flushed %d test case(s) of %s in one transaction', self.name, len(cases), id)
 
         do_post = True
 
@@ -600,12 +745,10 @@ class JudgeHandler(ZlibPacketHandler):
         if do_post:
             event.post('sub_%s' % Submission.get_id_secret(id), {
                 'type': 'test-case',
-                'id': max_position,
+                'id': position,
             })
             self._post_update_submission(id, state='test-case')
 
-        SubmissionTestCase.objects.bulk_create(bulk_test_case_updates)
-
     def on_malformed(self, packet):
         logger.error('%s: Malformed packet: %s', self.name, packet)
         json_log.exception(self._make_json_log(sub=self._working, info='malformed json packet'))
@@ -620,8 +763,32 @@ class JudgeHandler(ZlibPacketHandler):
         self._update_ping()
 
     def _free_self(self, packet):
+        self.graded += 1
+        self._graded_times.append(time.monotonic())
         self.judges.on_judge_free(self, packet['submission-id'])
 
+    def throughput(self, window=60):
+        # Submissions finished per second over the last `window` seconds.
+        cutoff = time.monotonic() - window
+        while self._graded_times and self._graded_times[0] < cutoff:
+            self._graded_times.popleft()
+        return len(self._graded_times) / window
+
+    def stats(self):
+        return {
+            'name': self.name,
+            'working': self.working,
+            'disabled': self.is_disabled,
+            'load': self.load if self.load < 1e100 else None,
+            'ping': self.latency,
+            'time-delta': self.time_delta,
+            'graded': self.graded,
+            'throughput': self.throughput(),
+        }
+
+    def _start_ping(self):
+        threading.Thread(target=self._ping_thread).start()
+
     def _ping_thread(self):
         try:
             while True:
@@ -645,6 +812,12 @@ class JudgeHandler(ZlibPacketHandler):
         data.update(kwargs)
         return json.dumps(data)
 
+    def _release_submission(self, id):
+        # Rejudges were never counted as submissions in flight, see ProblemSubmit.form_valid.
+        for user_id, rejudged_date in Submission.objects.filter(id=id).values_list('user_id', 'rejudged_date'):
+            if rejudged_date is None:
+                release_submission(user_id)
+
     def _post_update_submission(self, id, state, done=False):
         if self._submission_cache_id == id:
             data = self._submission_cache
@@ -666,3 +839,27 @@ class JudgeHandler(ZlibPacketHandler):
 
     def on_cleanup(self):
         db.connection.close()
+
+
+class AsyncJudgeHandler(JudgeHandler, AsyncZlibPacketHandler):
+    def _create_no_response_job(self):
+        return self.call_later(20, self._kill_if_no_response)
+
+    def _create_test_case_flush_job(self):
+        # Saving the test cases blocks, so it runs on the executor like the packet handlers.
+        return self.call_later(TEST_CASE_BUFFER_TIME, lambda: self.loop.run_in_executor(
+            self.server.executor, self._flush_test_cases_on_time))
+
+    def _start_ping(self):
+        self.call_later(0, self._ping_tick)
+
+    def _ping_tick(self):
+        if self._stop_ping.is_set():
+            return
+        try:
+            self.ping()
+        except Exception:
+            logger.exception('Ping error in %s', self.name)
+            self.close()
+        else:
+            self.call_later(10, self._ping_tick)
@@ -1,56 +1,64 @@
+import json
 import logging
-from collections import namedtuple
-from random import random
-from threading import RLock
+import time
 
+from judge.bridge.dispatch_policy import DispatchPolicy
+from judge.bridge.metrics import TimedRLock, metrics
+from judge.bridge.submission_queue import SubmissionQueue
 from judge.judge_priority import REJUDGE_PRIORITY
 
-try:
-    from llist import dllist
-except ImportError:
-    from pyllist import dllist
-
 logger = logging.getLogger('judge.bridge')
-
-PriorityMarker = namedtuple('PriorityMarker', 'priority')
+json_log = logging.getLogger('judge.json.bridge')
 
 
 class JudgeList(object):
     priorities = 4
 
-    def __init__(self):
-        self.queue = dllist()
-        self.priority = [self.queue.append(PriorityMarker(i)) for i in range(self.priorities)]
+    def __init__(self, policy=None):
+        self.policy = policy or DispatchPolicy()
+        self.queue = SubmissionQueue(self.priorities, clock=self.policy.clock)
         self.judges = set()
-        self.node_map = {}
         self.submission_map = {}
-        self.lock = RLock()
+        self.lock = TimedRLock(metrics.lock_hold, metrics.lock_wait)
 
     def _handle_free_judge(self, judge):
         with self.lock:
-            node = self.queue.first
-            priority = 0
-            while node:
-                if isinstance(node.value, PriorityMarker):
-                    priority = node.value.priority + 1
-                elif priority >= REJUDGE_PRIORITY and self.count_not_disabled() > 1 and sum(
+            for priority in range(self.priorities):
+                if not self.queue.count(priority):
+                    continue
+                if priority >= REJUDGE_PRIORITY and self.count_not_disabled() > 1 and sum(
                         not judge.working and not judge.is_disabled for judge in self.judges) <= 1:
                     return
-                else:
-                    id, problem, language, source, judge_id = node.value
-                    if judge.can_judge(problem, language, judge_id):
-                        self.submission_map[id] = judge
-                        try:
-                            judge.submit(id, problem, language, source)
-                        except Exception:
-                            logger.exception('Failed to dispatch %d (%s, %s) to %s', id, problem, language, judge.name)
-                            self.judges.remove(judge)
-                            return
-                        logger.info('Dispatched queued submission %d: %s', id, judge.name)
-                        self.queue.remove(node)
-                        del self.node_map[id]
-                        break
-                node = node.next
+
+                entry = self.policy.choose_submission(self.queue, priority, judge)
+                if entry is None:
+                    continue
+
+                id, problem, language = entry.id, entry.problem, entry.language
+                self.submission_map[id] = judge
+                try:
+                    judge.submit(id, problem, language, self.queue.source(entry), entry.data)
+                except Exception:
+                    logger.exception('Failed to dispatch %d (%s, %s) to %s', id, problem, language, judge.name)
+                    self.judges.remove(judge)
+                    return
+                logger.info('Dispatched queued submission %d: %s', id, judge.name)
+                self.queue.remove(id)
+                self._dispatched(judge, id, problem, language, entry.data)
+                return
+
+    def _dispatched(self, judge, id, problem, language, data):
+        self.policy.on_dispatch(judge, id, problem, language, data)
+        self._json_log(judge, id, 'dispatch')
+
+    def _json_log(self, judge, id, action, **kwargs):
+        # These records are what ./manage.py replay_dispatch replays.
+        json_log.info(json.dumps(dict({
+            'judge': judge and judge.name,
+            'submission': id,
+            'action': action,
+            'when': time.time(),
+        }, **kwargs)))
 
     def count_not_disabled(self):
         return sum(not judge.is_disabled for judge in self.judges)
@@ -86,6 +94,8 @@ class JudgeList(object):
                     del self.submission_map[sub]
                 except KeyError:
                     pass
+                else:
+                    self.policy.on_finish(judge, sub, False)
             self.judges.discard(judge)
 
             # Since we reserve a judge for high priority submissions when there are more than one,
@@ -103,6 +113,8 @@ class JudgeList(object):
         with self.lock:
             del self.submission_map[submission]
             judge._working = False
+            self.policy.on_finish(judge, submission, True)
+            self._json_log(judge, submission, 'free')
             self._handle_free_judge(judge)
 
     def abort(self, submission):
@@ -112,24 +124,41 @@ class JudgeList(object):
                 self.submission_map[submission].abort()
                 return True
             except KeyError:
-                try:
-                    node = self.node_map[submission]
-                except KeyError:
-                    pass
-                else:
-                    self.queue.remove(node)
-                    del self.node_map[submission]
+                self.queue.remove(submission)
                 return False
 
+    def queue_stats(self):
+        with self.lock:
+            return self.queue.stats()
+
+    def stats(self):
+        with self.lock:
+            now = self.queue.clock()
+            queue = []
+            for priority in range(self.priorities):
+                oldest = self.queue.oldest(priority)
+                queue.append({
+                    'priority': priority,
+                    'length': self.queue.count(priority),
+                    'oldest-age': None if oldest is None else now - oldest.time,
+                })
+            return {
+                'queue': queue,
+                'sources': self.queue.sources.stats(),
+                'judges': [judge.stats() for judge in sorted(self.judges, key=lambda judge: judge.name)],
+            }
+
     def check_priority(self, priority):
         return 0 <= priority < self.priorities
 
-    def judge(self, id, problem, language, source, judge_id, priority):
+    def judge(self, id, problem, language, source, judge_id, priority, data=None):
         with self.lock:
-            if id in self.submission_map or id in self.node_map:
+            if id in self.submission_map or id in self.queue:
                 # Already judging, don't queue again. This can happen during batch rejudges, rejudges should be
                 # idempotent.
                 return
+            self._json_log(None, id, 'queue', problem=problem, language=language, pinned=judge_id,
+                           priority=priority)
 
             candidates = [judge for judge in self.judges if judge.can_judge(problem, language, judge_id)]
             available = [judge for judge in candidates if not judge.working and not judge.is_disabled]
@@ -142,19 +171,16 @@ class JudgeList(object):
                 available = []
 
             if available:
-                # Schedule the submission on the judge reporting least load.
-                judge = min(available, key=lambda judge: (judge.load, random()))
+                judge = self.policy.choose_judge(available, problem, language, data)
                 logger.info('Dispatched submission %d to: %s', id, judge.name)
                 self.submission_map[id] = judge
                 try:
-                    judge.submit(id, problem, language, source)
+                    judge.submit(id, problem, language, source, data)
                 except Exception:
                     logger.exception('Failed to dispatch %d (%s, %s) to %s', id, problem, language, judge.name)
                     self.judges.discard(judge)
-                    return self.judge(id, problem, language, source, judge_id, priority)
+                    return self.judge(id, problem, language, source, judge_id, priority, data)
+                self._dispatched(judge, id, problem, language, data)
             else:
-                self.node_map[id] = self.queue.insert(
-                    (id, problem, language, source, judge_id),
-                    self.priority[priority],
-                )
+                self.queue.push(id, problem, language, source, judge_id, priority, data)
                 logger.info('Queued submission: %d', id)
@@ -0,0 +1,199 @@
+import json
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class Histogram(object):
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets.append([bound, cumulative])
+        return {'buckets': buckets, 'sum': total, 'count': cumulative}
+
+
+class TimedRLock(object):
+    """
+    Reentrant lock that records how long threads wait for it, and how long it is held from the outermost acquire
+    to the matching release.
+    """
+
+    def __init__(self, hold, wait):
+        self.hold = hold
+        self.wait = wait
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        start = time.perf_counter()
+        if not self._lock.acquire(blocking, timeout):
+            return False
+        # Only the owner touches these while it holds the lock.
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired = time.perf_counter()
+            self.wait.observe(self._acquired - start)
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if not self._depth:
+            self.hold.observe(time.perf_counter() - self._acquired)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class BridgeMetrics(object):
+    def __init__(self):
+        self.lock_hold = Histogram()
+        self.lock_wait = Histogram()
+        self._packets = {}
+        self._lock = threading.Lock()
+
+    def observe_packet(self, side, name, duration):
+        key = (side, name)
+        histogram = self._packets.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._packets.setdefault(key, Histogram())
+        histogram.observe(duration)
+
+    def stats(self):
+        with self._lock:
+            packets = list(self._packets.items())
+        return {
+            'packets': [{'side': side, 'name': name, 'duration': histogram.snapshot()}
+                        for (side, name), histogram in sorted(packets)],
+            'lock': {'hold': self.lock_hold.snapshot(), 'wait': self.lock_wait.snapshot()},
+        }
+
+
+metrics = BridgeMetrics()
+
+
+def collect_stats(judges):
+    return dict(judges.stats(), **metrics.stats())
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(lines, name, value, **labels):
+    if value is None:
+        return
+    if labels:
+        name += '{%s}' % ','.join('%s="%s"' % (key, _label(label)) for key, label in labels.items())
+    lines.append('%s %s' % (name, float(value)))
+
+
+def _histogram(lines, name, snapshot, **labels):
+    for bound, count in snapshot['buckets']:
+        _sample(lines, name + '_bucket', count, le=bound, **labels)
+    _sample(lines, name + '_sum', snapshot['sum'], **labels)
+    _sample(lines, name + '_count', snapshot['count'], **labels)
+
+
+def render_prometheus(stats):
+    """Render the output of collect_stats in the Prometheus text exposition format."""
+    lines = []
+
+    def metric(name, kind, description):
+        lines.append('# HELP %s %s' % (name, description))
+        lines.append('# TYPE %s %s' % (name, kind))
+
+    metric('bridge_queue_length', 'gauge', 'Submissions waiting for a judge.')
+    for queue in stats['queue']:
+        _sample(lines, 'bridge_queue_length', queue['length'], priority=queue['priority'])
+    metric('bridge_queue_oldest_age_seconds', 'gauge', 'Time the oldest queued submission has been waiting.')
+    for queue in stats['queue']:
+        _sample(lines, 'bridge_queue_oldest_age_seconds', queue['oldest-age'], priority=queue['priority'])
+    metric('bridge_queue_source_bytes', 'gauge', 'Size of queued sources, before and after deduplication.')
+    _sample(lines, 'bridge_queue_source_bytes', stats['sources']['source-bytes'], kind='logical')
+    _sample(lines, 'bridge_queue_source_bytes', stats['sources']['stored-bytes'], kind='stored')
+
+    judge_metrics = [
+        ('working', 'bridge_judge_working', 'Whether the judge is grading a submission.'),
+        ('load', 'bridge_judge_load', 'Load reported by the judge.'),
+        ('ping', 'bridge_judge_ping_seconds', 'Average ping round trip to the judge.'),
+        ('time-delta', 'bridge_judge_time_delta_seconds', 'Average clock difference between judge and bridge.'),
+        ('graded', 'bridge_judge_graded_total', 'Submissions graded since the judge connected.'),
+        ('throughput', 'bridge_judge_throughput', 'Submissions graded per second over the last minute.'),
+    ]
+    for key, name, description in judge_metrics:
+        metric(name, 'counter' if name.endswith('_total') else 'gauge', description)
+        for judge in stats['judges']:
+            _sample(lines, name, judge[key], judge=judge['name'])
+
+    metric('bridge_packet_duration_seconds', 'histogram', 'Time spent handling packets, by packet name.')
+    for packet in stats['packets']:
+        _histogram(lines, 'bridge_packet_duration_seconds', packet['duration'], side=packet['side'],
+                   packet=packet['name'])
+    metric('bridge_judge_list_lock_hold_seconds', 'histogram', 'Time the judge list lock is held for.')
+    _histogram(lines, 'bridge_judge_list_lock_hold_seconds', stats['lock']['hold'])
+    metric('bridge_judge_list_lock_wait_seconds', 'histogram', 'Time spent waiting for the judge list lock.')
+    _histogram(lines, 'bridge_judge_list_lock_wait_seconds', stats['lock']['wait'])
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stats = collect_stats(self.server.judges)
+        if self.path == '/metrics':
+            body, content_type = render_prometheus(stats), 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/stats':
+            body, content_type = json.dumps(stats), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(object):
+    """Serves bridge statistics over HTTP, at /metrics for Prometheus and at /stats as JSON."""
+
+    def __init__(self, address, judges):
+        self.server = ThreadingHTTPServer(address, MetricsRequestHandler)
+        self.server.daemon_threads = True
+        self.server.judges = judges
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
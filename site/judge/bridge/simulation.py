@@ -0,0 +1,51 @@
+import random
+import time
+
+
+class FakeJudge(object):
+    """
+    A judge that accepts submissions without grading them, to run the judge list in benchmarks, replays and tests.
+    """
+
+    def __init__(self, name, problems, executors, query_latency=0):
+        self.name = name
+        self.query_latency = query_latency
+        self.problems = problems
+        self.executors = executors
+        self.is_disabled = False
+        self.load = random.random()
+        self._working = False
+        self.submission_data = None
+
+    def can_judge(self, problem, executor, judge_id=None):
+        return problem in self.problems and executor in self.executors and \
+            ((not judge_id and not self.is_disabled) or self.name == judge_id)
+
+    @property
+    def working(self):
+        return bool(self._working)
+
+    def submit(self, id, problem, language, source, data=None):
+        if data is None and self.query_latency:
+            # Stands in for JudgeHandler.get_related_submission_data querying the database.
+            time.sleep(self.query_latency)
+        self._working = id
+        self.submission_data = data
+
+    def stats(self):
+        return {'name': self.name, 'working': self.working, 'disabled': self.is_disabled, 'load': self.load,
+                'ping': None, 'time-delta': None, 'graded': 0, 'throughput': 0}
+
+    def get_current_submission(self):
+        return self._working or None
+
+    def disconnect(self, force=False):
+        pass
+
+    def abort(self):
+        pass
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
@@ -0,0 +1,179 @@
+import hashlib
+import heapq
+import time
+import zlib
+from collections import OrderedDict, namedtuple
+from itertools import count
+
+SubmissionData = namedtuple('SubmissionData', 'time memory short_circuit pretests_only contest_no attempt_no user_id')
+QueuedSubmission = namedtuple('QueuedSubmission', 'id problem language source_key judge_id priority data sequence time')
+
+
+def source_key(source):
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()
+
+
+class SourceStore(object):
+    """
+    Reference counted store of submission sources, keyed by their SHA-1 digest.
+
+    Mass rejudges queue many submissions with the same source, which are only stored once. Sources of at least
+    `compress_threshold` bytes are kept zlib-compressed, as they are only needed again when dispatched.
+    """
+
+    def __init__(self, compress_threshold=512):
+        self.compress_threshold = compress_threshold
+        self._sources = {}  # key: [stored, compressed, length, references]
+        self.source_bytes = 0
+        self.stored_bytes = 0
+
+    def __len__(self):
+        return len(self._sources)
+
+    def add(self, source):
+        key = source_key(source)
+        item = self._sources.get(key)
+        if item is None:
+            stored = source.encode('utf-8')
+            length = len(stored)
+            compressed = length >= self.compress_threshold
+            if compressed:
+                stored = zlib.compress(stored)
+            item = self._sources[key] = [stored, compressed, length, 0]
+            self.stored_bytes += len(stored)
+        item[3] += 1
+        self.source_bytes += item[2]
+        return key
+
+    def get(self, key):
+        stored, compressed, _, _ = self._sources[key]
+        return (zlib.decompress(stored) if compressed else stored).decode('utf-8')
+
+    def release(self, key):
+        item = self._sources[key]
+        item[3] -= 1
+        self.source_bytes -= item[2]
+        if not item[3]:
+            del self._sources[key]
+            self.stored_bytes -= len(item[0])
+
+    def stats(self):
+        return {
+            'sources': len(self._sources),
+            'source-bytes': self.source_bytes,
+            'stored-bytes': self.stored_bytes,
+        }
+
+
+class SubmissionQueue(object):
+    """
+    Queue of submissions waiting for a judge.
+
+    Submissions are bucketed per priority by (problem, language, pinned judge), with each bucket kept in arrival
+    order. The bucket heads of every priority are kept in a heap ordered by arrival, so finding the next submission
+    a judge can grade only looks at bucket heads until one is eligible, instead of walking every queued submission.
+    """
+
+    def __init__(self, priorities, clock=time.monotonic):
+        self.priorities = priorities
+        self.clock = clock
+        self.sources = SourceStore()
+        self._sequence = count()
+        self._entries = {}
+        self._buckets = [{} for _ in range(priorities)]
+        # Heap of (sequence, bucket key) for the head of every bucket. Entries are invalidated lazily: an entry is
+        # stale once the bucket's head no longer has that sequence number.
+        self._heads = [[] for _ in range(priorities)]
+        self._counts = [0] * priorities
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, id):
+        return id in self._entries
+
+    def __iter__(self):
+        # Iterate in dispatch order, i.e. by priority and then by arrival.
+        for priority in range(self.priorities):
+            entries = [entry for bucket in self._buckets[priority].values() for entry in bucket.values()]
+            yield from sorted(entries, key=lambda entry: entry.sequence)
+
+    def count(self, priority):
+        return self._counts[priority]
+
+    def oldest(self, priority):
+        heads = [next(iter(bucket.values())) for bucket in self._buckets[priority].values()]
+        return min(heads, key=lambda entry: entry.sequence) if heads else None
+
+    def push(self, id, problem, language, source, judge_id, priority, data=None):
+        entry = QueuedSubmission(id, problem, language, self.sources.add(source), judge_id, priority, data,
+                                 next(self._sequence), self.clock())
+        key = (problem, language, judge_id)
+        bucket = self._buckets[priority].get(key)
+        if bucket is None:
+            bucket = self._buckets[priority][key] = OrderedDict()
+            heapq.heappush(self._heads[entry.priority], (entry.sequence, key))
+        bucket[id] = entry
+        self._entries[id] = entry
+        self._counts[priority] += 1
+        return entry
+
+    def remove(self, id):
+        entry = self._entries.pop(id, None)
+        if entry is None:
+            return None
+        self.sources.release(entry.source_key)
+        buckets = self._buckets[entry.priority]
+        key = (entry.problem, entry.language, entry.judge_id)
+        bucket = buckets[key]
+        was_head = next(iter(bucket)) == id
+        del bucket[id]
+        if not bucket:
+            del buckets[key]
+        elif was_head:
+            heapq.heappush(self._heads[entry.priority], (next(iter(bucket.values())).sequence, key))
+        self._counts[entry.priority] -= 1
+        return entry
+
+    def source(self, entry):
+        return self.sources.get(entry.source_key)
+
+    def stats(self):
+        stats = self.sources.stats()
+        stats['queued'] = len(self._entries)
+        return stats
+
+    def first_eligible(self, priority, can_judge):
+        """
+        Return the earliest submission of the given priority for which `can_judge(problem, language, judge_id)`
+        holds, or None if there is no such submission.
+        """
+        found = self.eligible(priority, can_judge, 1)
+        return found[0] if found else None
+
+    def eligible(self, priority, can_judge, limit):
+        """
+        Return, in arrival order, up to `limit` submissions of the given priority for which
+        `can_judge(problem, language, judge_id)` holds. Only the earliest submission of each
+        (problem, language, pinned judge) is considered.
+        """
+        buckets = self._buckets[priority]
+        heads = self._heads[priority]
+        skipped = []
+        found = []
+        try:
+            while heads and len(found) < limit:
+                sequence, key = heapq.heappop(heads)
+                bucket = buckets.get(key)
+                if bucket is None:
+                    continue
+                head = next(iter(bucket.values()))
+                if head.sequence != sequence:
+                    continue
+                skipped.append((sequence, key))
+                if can_judge(*key):
+                    found.append(head)
+        finally:
+            for item in skipped:
+                heapq.heappush(heads, item)
+        return found
@@ -0,0 +1,96 @@
+import socket
+import threading
+import time
+import unittest
+import zlib
+
+from judge.bridge.async_server import AsyncServer, AsyncZlibPacketHandler
+from judge.bridge.base_handler import Disconnect, size_pack
+
+
+class RecordingHandler(AsyncZlibPacketHandler):
+    events = []
+
+    def on_connect(self):
+        self.events.append(('connect', threading.current_thread().name))
+        self.timeout = 5
+
+    def on_packet(self, data):
+        if data == 'bye':
+            self.send('bye')
+            raise Disconnect()
+        if data == 'later':
+            self.call_later(0.05, lambda: self.send('timer'))
+        self.send(data.upper())
+
+    def on_disconnect(self):
+        self.events.append(('disconnect', threading.current_thread().name))
+
+
+def send_packet(sock, data):
+    data = zlib.compress(data.encode('utf-8'))
+    sock.sendall(size_pack.pack(len(data)) + data)
+
+
+def read_packet(sock):
+    def read_exactly(size):
+        buffer = b''
+        while len(buffer) < size:
+            data = sock.recv(size - len(buffer))
+            if not data:
+                raise EOFError()
+            buffer += data
+        return buffer
+
+    return zlib.decompress(read_exactly(size_pack.unpack(read_exactly(size_pack.size))[0])).decode('utf-8')
+
+
+class AsyncServerTestCase(unittest.TestCase):
+    def setUp(self):
+        RecordingHandler.events = []
+        self.server = AsyncServer([([('127.0.0.1', 0)], RecordingHandler)], max_workers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        for _ in range(100):
+            if self.server._servers:
+                break
+            time.sleep(0.01)
+        self.address = self.server._servers[0].sockets[0].getsockname()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join(5)
+        self.assertFalse(self.thread.is_alive())
+
+    def test_round_trip(self):
+        with socket.create_connection(self.address, timeout=5) as sock:
+            for message in ('hello', 'world'):
+                send_packet(sock, message)
+                self.assertEqual(read_packet(sock), message.upper())
+
+            send_packet(sock, 'later')
+            self.assertEqual(read_packet(sock), 'LATER')
+            self.assertEqual(read_packet(sock), 'timer')
+
+            send_packet(sock, 'bye')
+            self.assertEqual(read_packet(sock), 'bye')
+            self.assertRaises(EOFError, read_packet, sock)
+
+        for _ in range(100):
+            if len(RecordingHandler.events) == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual([event for event, _ in RecordingHandler.events], ['connect', 'disconnect'])
+        for _, thread in RecordingHandler.events:
+            self.assertTrue(thread.startswith('bridge-worker'))
+
+    def test_many_clients(self):
+        sockets = [socket.create_connection(self.address, timeout=5) for _ in range(20)]
+        try:
+            for index, sock in enumerate(sockets):
+                send_packet(sock, 'client %d' % index)
+            for index, sock in enumerate(sockets):
+                self.assertEqual(read_packet(sock), 'CLIENT %d' % index)
+        finally:
+            for sock in sockets:
+                sock.close()
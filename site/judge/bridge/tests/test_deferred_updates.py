@@ -0,0 +1,56 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from judge.bridge.deferred_updates import DeferredUpdateQueue
+
+
+class DeferredUpdateQueueTestCase(SimpleTestCase):
+    def test_runs_immediately_when_not_started(self):
+        queue = DeferredUpdateQueue()
+        calls = []
+        queue.defer('key', lambda: calls.append(1))
+        queue.defer('key', lambda: calls.append(2))
+        self.assertEqual(calls, [1, 2])
+
+    def test_coalesces_pending_work(self):
+        queue = DeferredUpdateQueue()
+        queue.start(workers=2, delay=0.2)
+        calls = []
+        try:
+            for _ in range(200):
+                queue.defer(('problem', 1), lambda: calls.append('problem'))
+            queue.defer(('user', 1), lambda: calls.append('user'))
+        finally:
+            queue.shutdown()
+
+        self.assertEqual(sorted(calls), ['problem', 'user'])
+        self.assertEqual(queue.coalesced, 199)
+        self.assertEqual(queue.executed, 2)
+
+    def test_reruns_work_deferred_while_running(self):
+        queue = DeferredUpdateQueue()
+        queue.start(workers=1, delay=0)
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def slow():
+            calls.append('first')
+            started.set()
+            release.wait(5)
+
+        try:
+            queue.defer('key', slow)
+            self.assertTrue(started.wait(5))
+            queue.defer('key', lambda: calls.append('second'))
+            release.set()
+            for _ in range(100):
+                if len(calls) == 2:
+                    break
+                time.sleep(0.01)
+        finally:
+            queue.shutdown()
+
+        self.assertEqual(calls, ['first', 'second'])
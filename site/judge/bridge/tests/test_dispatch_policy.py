@@ -0,0 +1,127 @@
+import json
+import unittest
+
+from judge.bridge.dispatch_policy import AffinityPolicy, DispatchPolicy, ShortestJobPolicy
+from judge.bridge.dispatch_replay import Replay, judge_speeds, read_log
+from judge.bridge.judge_list import JudgeList
+from judge.bridge.simulation import FakeJudge
+from judge.judge_priority import DEFAULT_PRIORITY
+
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def make_judge(name, problems=('a', 'b', 'c')):
+    return FakeJudge(name, dict.fromkeys(problems), dict.fromkeys(['PY3']))
+
+
+class DispatchPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+
+    def occupy(self, judges, *fleet):
+        for index, judge in enumerate(fleet):
+            judges.judges.add(judge)
+            judge._working = -index - 1
+            judges.submission_map[judge._working] = judge
+
+    def grade(self, judges, judge, duration):
+        self.clock.now += duration
+        judges.on_judge_free(judge, judge._working)
+
+    def test_default_policy_is_arrival_order(self):
+        judges = JudgeList(DispatchPolicy(self.clock))
+        judge = make_judge('j1')
+        self.occupy(judges, judge)
+        for id, problem in enumerate('abc', 1):
+            judges.judge(id, problem, 'PY3', '', None, DEFAULT_PRIORITY)
+        order = []
+        for _ in range(3):
+            self.grade(judges, judge, 1)
+            order.append(judge._working)
+        self.assertEqual(order, [1, 2, 3])
+
+    def test_shortest_job_learns_durations(self):
+        policy = ShortestJobPolicy(self.clock)
+        judges = JudgeList(policy)
+        judge = make_judge('j1')
+        judges.register(judge)
+
+        judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        judges.judge(2, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.grade(judges, judge, 10)
+        self.assertEqual(judge._working, 2)
+        self.grade(judges, judge, 1)
+        self.assertEqual(policy.expected('a'), 10)
+        self.assertEqual(policy.expected('b'), 1)
+
+        self.occupy(judges, judge)
+        judges.judge(3, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        judges.judge(4, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.grade(judges, judge, 1)
+        self.assertEqual(judge._working, 4)
+
+    def test_shortest_job_ages(self):
+        judges = JudgeList(ShortestJobPolicy(self.clock))
+        judges.policy._durations.update(a=10, b=1)
+        judge = make_judge('j1')
+        self.occupy(judges, judge)
+        judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.clock.now += ShortestJobPolicy.max_wait
+        judges.judge(2, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.grade(judges, judge, 0)
+        self.assertEqual(judge._working, 1)
+
+    def test_shortest_job_learns_judge_speed(self):
+        policy = ShortestJobPolicy(self.clock)
+        slow, fast = make_judge('slow'), make_judge('fast')
+        policy._durations['a'] = 1
+        for judge, duration in ((slow, 2), (fast, 0.5)):
+            policy.on_dispatch(judge, 1, 'a', 'PY3', None)
+            self.clock.now += duration
+            policy.on_finish(judge, 1, True)
+        self.assertGreater(policy.speed(slow), 1)
+        self.assertLess(policy.speed(fast), 1)
+        self.assertIs(policy.choose_judge([slow, fast], 'b', 'PY3', None), fast)
+
+    def test_affinity(self):
+        judges = JudgeList(AffinityPolicy(self.clock))
+        first, second = make_judge('j1'), make_judge('j2')
+        judges.register(first)
+        judges.register(second)
+        judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        warm = judges.submission_map[1]
+        self.grade(judges, warm, 1)
+
+        self.occupy(judges, first, second)
+        judges.judge(2, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        judges.judge(3, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.grade(judges, warm, 1)
+        self.assertEqual(warm._working, 3)
+
+
+class DispatchReplayTestCase(unittest.TestCase):
+    def test_replay(self):
+        records = []
+        for id, (arrival, problem, judge, start, duration) in enumerate([
+            (0, 'a', 'j1', 0, 4), (1, 'b', 'j2', 1, 1), (2, 'b', 'j2', 2, 1), (3, 'a', 'j1', 4, 4),
+        ]):
+            records.append({'submission': id, 'judge': None, 'action': 'queue', 'when': arrival, 'problem': problem,
+                            'language': 'PY3', 'pinned': None, 'priority': DEFAULT_PRIORITY})
+            records.append({'submission': id, 'judge': judge, 'action': 'dispatch', 'when': start})
+            records.append({'submission': id, 'judge': judge, 'action': 'free', 'when': start + duration})
+        lines = ['INFO judge.json.bridge %s\n' % json.dumps(record)
+                 for record in sorted(records, key=lambda record: record['when'])]
+
+        submissions = read_log(lines + ['not a record\n'])
+        self.assertEqual([submission.duration for submission in submissions], [4, 1, 1, 4])
+        self.assertEqual(judge_speeds(submissions), {'j1': 1, 'j2': 1})
+
+        waits = Replay(submissions, judge_speeds(submissions), DispatchPolicy).run()
+        self.assertEqual(len(waits), 4)
+        self.assertEqual(sum(waits), 0)
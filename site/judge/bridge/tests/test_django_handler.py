@@ -0,0 +1,83 @@
+import threading
+import time
+from functools import partial
+
+from django.test import SimpleTestCase, override_settings
+
+from judge import judgeapi
+from judge.bridge.async_server import AsyncServer
+from judge.bridge.django_handler import AsyncDjangoHandler
+from judge.bridge.judge_list import JudgeList
+from judge.judge_priority import BATCH_REJUDGE_PRIORITY, DEFAULT_PRIORITY
+
+
+def submission_request(id, priority=DEFAULT_PRIORITY):
+    return {'submission-id': id, 'problem-id': 'aplusb', 'language': 'PY3', 'source': 'print(1)', 'judge-id': None,
+            'priority': priority}
+
+
+class PersistentBridgeConnectionTestCase(SimpleTestCase):
+    def setUp(self):
+        self.judges = JudgeList()
+        self.server = AsyncServer([([('127.0.0.1', 0)], partial(AsyncDjangoHandler, judges=self.judges))])
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        for _ in range(100):
+            if self.server._servers:
+                break
+            time.sleep(0.01)
+
+        judgeapi._pool = None
+        self.settings = override_settings(
+            BRIDGED_DJANGO_CONNECT=self.server._servers[0].sockets[0].getsockname(),
+            BRIDGED_DJANGO_POOL_SIZE=1,
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        judgeapi._pool = None
+        self.server.shutdown()
+        self.thread.join(5)
+
+    def test_pipelined_requests(self):
+        results = {}
+
+        def request(id):
+            results[id] = judgeapi.judge_request(dict(submission_request(id), name='submission-request'))
+
+        threads = [threading.Thread(target=request, args=(id,)) for id in range(1, 21)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(judgeapi._pool._connections), 1)
+        for id in range(1, 21):
+            self.assertEqual(results[id], {'name': 'submission-received', 'submission-id': id})
+        self.assertEqual(len(self.judges.queue), 20)
+
+    def test_submission_request_many(self):
+        response = judgeapi.judge_request({
+            'name': 'submission-request-many',
+            'submissions': [submission_request(1), submission_request(2, BATCH_REJUDGE_PRIORITY),
+                            submission_request(3, priority=100)],
+        })
+        self.assertEqual(response, {'name': 'submissions-received', 'submission-ids': [1, 2]})
+        self.assertEqual(judgeapi.judge_request({'name': 'terminate-submission', 'submission-id': 2}),
+                         {'name': 'submission-received', 'judge-aborted': False})
+        self.assertEqual([entry.id for entry in self.judges.queue], [1])
+
+    def test_submission_request_many_shared_sources(self):
+        requests = [submission_request(id, BATCH_REJUDGE_PRIORITY) for id in range(1, 4)]
+        for request in requests:
+            request['source-hash'] = 'hash'
+            del request['source']
+        response = judgeapi.judge_request({
+            'name': 'submission-request-many',
+            'submissions': requests,
+            'sources': {'hash': 'print(1)'},
+        })
+        self.assertEqual(response, {'name': 'submissions-received', 'submission-ids': [1, 2, 3]})
+        self.assertEqual(judgeapi.get_queue_stats(), {'name': 'queue-stats', 'queued': 3, 'sources': 1,
+                                                      'source-bytes': 24, 'stored-bytes': 8})
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, TransactionTestCase
+
+from judge.bridge.judge_handler import CaseAggregate, JudgeHandler
+from judge.models import Language, Submission, SubmissionTestCase
+from judge.models.tests.util import create_problem, create_user
+
+
+def make_case(status='AC', time=0.1, memory=1024, points=1, total=1, batch=None):
+    return SubmissionTestCase(status=status, time=time, memory=memory, points=points, total=total, batch=batch)
+
+
+class CaseAggregateTestCase(SimpleTestCase):
+    def test_empty(self):
+        aggregate = CaseAggregate()
+        self.assertEqual(aggregate.case_points, 0)
+        self.assertEqual(aggregate.case_total, 0)
+        self.assertEqual(aggregate.result, 'SC')
+
+    def test_cases(self):
+        aggregate = CaseAggregate()
+        aggregate.add(make_case(time=0.25, memory=100))
+        aggregate.add(make_case(status='WA', points=0, time=0.5, memory=300))
+        aggregate.add(make_case(status='TLE', points=0, total=2, time=1, memory=200))
+
+        self.assertAlmostEqual(aggregate.time, 1.75)
+        self.assertEqual(aggregate.memory, 300)
+        self.assertEqual(aggregate.case_points, 1)
+        self.assertEqual(aggregate.case_total, 4)
+        self.assertEqual(aggregate.result, 'TLE')
+
+    def test_batches(self):
+        aggregate = CaseAggregate()
+        aggregate.add(make_case(points=5, total=5, batch=1))
+        aggregate.add(make_case(points=0, total=5, batch=1, status='WA'))
+        aggregate.add(make_case(points=3, total=3, batch=2))
+        aggregate.add(make_case(points=3, total=3, batch=2))
+        aggregate.add(make_case(points=0.5, total=1))
+
+        self.assertEqual(aggregate.case_points, 3.5)
+        self.assertEqual(aggregate.case_total, 9)
+        self.assertEqual(aggregate.result, 'WA')
+
+
+class TestCaseBufferTestCase(TransactionTestCase):
+    def setUp(self):
+        self.submission = Submission.objects.create(user=create_user(username='buffer').profile,
+                                                    problem=create_problem(code='buffer'),
+                                                    language=Language.get_python3(), status='G')
+        # Build the handler without the metaclass, which would serve the connection.
+        self.handler = JudgeHandler.__new__(JudgeHandler)
+        JudgeHandler.__init__(self.handler, None, ('127.0.0.1', 0), SimpleNamespace(server_address=None), None)
+        self.handler.name = 'buffer'
+
+    def make_result(self, position):
+        return {'position': position, 'status': 0, 'time': 0.1, 'memory': 1024, 'points': 1, 'total-points': 1,
+                'output': ''}
+
+    @mock.patch('judge.bridge.judge_handler.TEST_CASE_BUFFER_TIME', 0.05)
+    def test_flushed_without_further_packets(self):
+        self.handler.on_test_case({'submission-id': self.submission.id, 'cases': [self.make_result(1)]})
+        job = self.handler._test_case_flush_job
+        self.assertFalse(SubmissionTestCase.objects.filter(submission=self.submission).exists())
+
+        job.join(5)
+        self.assertEqual(list(SubmissionTestCase.objects.filter(submission=self.submission)
+                              .values_list('case', flat=True)), [1])
+        self.assertEqual(Submission.objects.get(id=self.submission.id).current_testcase, 2)
+        self.assertIsNone(self.handler._test_case_flush_job)
+
+    def test_flush_cancels_deadline(self):
+        self.handler.on_test_case({'submission-id': self.submission.id, 'cases': [self.make_result(1)]})
+        job = self.handler._test_case_flush_job
+        self.handler._flush_test_cases()
+        job.join(5)
+        self.assertTrue(job.finished.is_set())
+        self.assertEqual(self.handler.test_case_transactions, 1)
@@ -0,0 +1,147 @@
+import unittest
+
+from judge.bridge.judge_list import JudgeList
+from judge.bridge.simulation import FakeJudge
+from judge.bridge.submission_queue import SourceStore, SubmissionData, SubmissionQueue
+from judge.judge_priority import BATCH_REJUDGE_PRIORITY, CONTEST_SUBMISSION_PRIORITY, DEFAULT_PRIORITY, \
+    REJUDGE_PRIORITY
+
+
+def make_judge(name, problems=('a', 'b'), languages=('PY3', 'CPP17')):
+    return FakeJudge(name, dict.fromkeys(problems), dict.fromkeys(languages))
+
+
+class SubmissionQueueTestCase(unittest.TestCase):
+    def test_first_eligible_respects_arrival_order(self):
+        queue = SubmissionQueue(4)
+        queue.push(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        queue.push(2, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+        queue.push(3, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+
+        self.assertEqual(queue.first_eligible(DEFAULT_PRIORITY, lambda *key: True).id, 1)
+        self.assertEqual(queue.first_eligible(DEFAULT_PRIORITY, lambda problem, *rest: problem == 'b').id, 2)
+        self.assertIsNone(queue.first_eligible(DEFAULT_PRIORITY, lambda *key: False))
+
+        queue.remove(1)
+        self.assertEqual(queue.first_eligible(DEFAULT_PRIORITY, lambda *key: True).id, 2)
+        queue.remove(2)
+        self.assertEqual(queue.first_eligible(DEFAULT_PRIORITY, lambda *key: True).id, 3)
+        queue.remove(3)
+        self.assertIsNone(queue.first_eligible(DEFAULT_PRIORITY, lambda *key: True))
+        self.assertEqual(len(queue), 0)
+
+    def test_remove_from_middle(self):
+        queue = SubmissionQueue(4)
+        for id in range(5):
+            queue.push(id, 'a', 'PY3', '', None, REJUDGE_PRIORITY)
+        queue.remove(2)
+        self.assertNotIn(2, queue)
+        self.assertEqual(queue.count(REJUDGE_PRIORITY), 4)
+        self.assertEqual([entry.id for entry in queue], [0, 1, 3, 4])
+        self.assertIsNone(queue.remove(2))
+
+    def test_shared_sources(self):
+        queue = SubmissionQueue(4)
+        template = 'x = 1\n' * 200
+        for id in range(10):
+            queue.push(id, 'a', 'PY3', template, None, BATCH_REJUDGE_PRIORITY)
+        queue.push(10, 'a', 'PY3', 'print(1)', None, BATCH_REJUDGE_PRIORITY)
+
+        stats = queue.stats()
+        self.assertEqual(stats['queued'], 11)
+        self.assertEqual(stats['sources'], 2)
+        self.assertEqual(stats['source-bytes'], len(template) * 10 + len('print(1)'))
+        self.assertLess(stats['stored-bytes'], len(template))
+
+        entry = queue.first_eligible(BATCH_REJUDGE_PRIORITY, lambda *key: True)
+        self.assertEqual(queue.source(entry), template)
+        for id in range(10):
+            queue.remove(id)
+        self.assertEqual(queue.stats(), {'queued': 1, 'sources': 1, 'source-bytes': 8, 'stored-bytes': 8})
+
+
+class SourceStoreTestCase(unittest.TestCase):
+    def test_reference_counting(self):
+        store = SourceStore(compress_threshold=4)
+        key = store.add('int main() {}')
+        self.assertEqual(store.add('int main() {}'), key)
+        self.assertEqual(store.add('\u00e9'), store.add('\u00e9'))
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.get(key), 'int main() {}')
+
+        store.release(key)
+        self.assertEqual(store.get(key), 'int main() {}')
+        store.release(key)
+        self.assertEqual(len(store), 1)
+        self.assertRaises(KeyError, store.get, key)
+
+
+class JudgeListTestCase(unittest.TestCase):
+    def setUp(self):
+        self.judges = JudgeList()
+
+    def occupy(self, *judges):
+        for index, judge in enumerate(judges):
+            self.judges.judges.add(judge)
+            judge._working = -index - 1
+            self.judges.submission_map[judge._working] = judge
+
+    def test_dispatch_by_priority(self):
+        judge = make_judge('j1')
+        self.occupy(judge)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(2, 'a', 'PY3', '', None, CONTEST_SUBMISSION_PRIORITY)
+        self.judges.judge(3, 'b', 'PY3', '', None, DEFAULT_PRIORITY)
+
+        order = []
+        for _ in range(3):
+            self.judges.on_judge_free(judge, judge._working)
+            order.append(judge._working)
+        self.assertEqual(order, [2, 1, 3])
+
+    def test_skip_unsupported(self):
+        judge = make_judge('j1', problems=('b',))
+        self.occupy(judge)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(2, 'b', 'CPP17', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(3, 'b', 'PY3', '', 'j2', DEFAULT_PRIORITY)
+
+        self.judges.on_judge_free(judge, judge._working)
+        self.assertEqual(judge._working, 2)
+        self.judges.on_judge_free(judge, judge._working)
+        self.assertFalse(judge.working)
+        self.assertEqual(len(self.judges.queue), 2)
+
+    def test_rejudge_reservation(self):
+        first, second = make_judge('j1'), make_judge('j2')
+        self.occupy(first, second)
+        self.judges.judge(1, 'a', 'PY3', '', None, BATCH_REJUDGE_PRIORITY)
+
+        # Only one judge is free, so it is reserved for higher priority work.
+        self.judges.on_judge_free(first, first._working)
+        self.assertFalse(first.working)
+        self.judges.on_judge_free(second, second._working)
+        self.assertEqual(second._working, 1)
+
+    def test_abort_and_duplicate(self):
+        judge = make_judge('j1')
+        self.occupy(judge)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        self.assertEqual(len(self.judges.queue), 1)
+        self.assertFalse(self.judges.abort(1))
+        self.assertNotIn(1, self.judges.queue)
+
+    def test_queued_submission_data(self):
+        judge = make_judge('j1')
+        self.occupy(judge)
+        data = SubmissionData(time=2, memory=65536, short_circuit=False, pretests_only=True, contest_no=None,
+                              attempt_no=3, user_id=7)
+        self.judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY, data)
+        self.judges.judge(2, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+
+        self.judges.on_judge_free(judge, judge._working)
+        self.assertEqual(judge.submission_data, data)
+        self.judges.on_judge_free(judge, judge._working)
+        self.assertEqual(judge._working, 2)
+        self.assertIsNone(judge.submission_data)
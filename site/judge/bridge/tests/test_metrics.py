@@ -0,0 +1,73 @@
+import threading
+import unittest
+
+from judge.bridge.judge_list import JudgeList
+from judge.bridge.metrics import BridgeMetrics, Histogram, TimedRLock, collect_stats, render_prometheus
+from judge.bridge.simulation import FakeJudge
+from judge.judge_priority import DEFAULT_PRIORITY, REJUDGE_PRIORITY
+
+
+class HistogramTestCase(unittest.TestCase):
+    def test_cumulative_buckets(self):
+        histogram = Histogram(buckets=(1, 2))
+        for value in (0.5, 1, 1.5, 3):
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['buckets'], [[1, 2], [2, 3], ['+Inf', 4]])
+        self.assertEqual(snapshot['count'], 4)
+        self.assertEqual(snapshot['sum'], 6)
+
+
+class TimedRLockTestCase(unittest.TestCase):
+    def test_reentrant_hold_counted_once(self):
+        hold, wait = Histogram(), Histogram()
+        lock = TimedRLock(hold, wait)
+        with lock:
+            with lock:
+                pass
+            self.assertEqual(hold.snapshot()['count'], 0)
+        self.assertEqual(hold.snapshot()['count'], 1)
+        self.assertEqual(wait.snapshot()['count'], 1)
+
+    def test_contended(self):
+        hold, wait = Histogram(), Histogram()
+        lock = TimedRLock(hold, wait)
+        results = []
+        with lock:
+            thread = threading.Thread(target=lambda: results.append(lock.acquire(timeout=0.01)))
+            thread.start()
+            thread.join()
+        self.assertEqual(results, [False])
+        self.assertEqual(hold.snapshot()['count'], 1)
+        self.assertEqual(wait.snapshot()['count'], 1)
+
+
+class BridgeStatsTestCase(unittest.TestCase):
+    def test_collect_and_render(self):
+        judges = JudgeList()
+        judge = FakeJudge('j"1', {'a': 0}, {'PY3': []})
+        judges.register(judge)
+        judges.judge(1, 'a', 'PY3', '', None, DEFAULT_PRIORITY)
+        judges.judge(2, 'a', 'PY3', '', None, REJUDGE_PRIORITY)
+
+        stats = collect_stats(judges)
+        self.assertEqual([queue['length'] for queue in stats['queue']], [0, 0, 1, 0])
+        self.assertIsNone(stats['queue'][0]['oldest-age'])
+        self.assertGreaterEqual(stats['queue'][REJUDGE_PRIORITY]['oldest-age'], 0)
+        self.assertEqual(stats['judges'][0]['name'], 'j"1')
+        self.assertTrue(stats['judges'][0]['working'])
+        self.assertGreater(stats['lock']['hold']['count'], 0)
+
+        text = render_prometheus(stats)
+        self.assertIn('bridge_queue_length{priority="2"} 1.0\n', text)
+        self.assertIn('bridge_judge_working{judge="j\\"1"} 1.0\n', text)
+        self.assertIn('bridge_judge_list_lock_hold_seconds_bucket{le="+Inf"}', text)
+
+    def test_packet_histograms(self):
+        metrics = BridgeMetrics()
+        metrics.observe_packet('judge', 'test-case-status', 0.002)
+        metrics.observe_packet('judge', 'test-case-status', 0.003)
+        metrics.observe_packet('django', 'submission-request', 0.001)
+        packets = metrics.stats()['packets']
+        self.assertEqual([(packet['side'], packet['name'], packet['duration']['count']) for packet in packets],
+                         [('django', 'submission-request', 1), ('judge', 'test-case-status', 2)])
@@ -1,10 +1,170 @@
+import time
+
 from django.core.cache import cache
 
+# The sets of problems solved and attempted by users and contest participations, see judge.utils.problems.
+PROBLEM_STATUS_CACHE_TIMEOUT = 86400
 
-def finished_submission(sub):
-    keys = ['user_complete:%d' % sub.user_id, 'user_attempted:%s' % sub.user_id]
+
+def _problem_status_keys(sub):
+    keys = ['user_complete:%d' % sub.user_id, 'user_attempted:%d' % sub.user_id]
     if hasattr(sub, 'contest'):
-        participation = sub.contest.participation
-        keys += ['contest_complete:%d' % participation.id]
-        keys += ['contest_attempted:%d' % participation.id]
-    cache.delete_many(keys)
+        participation = sub.contest.participation_id
+        keys += ['contest_complete:%d' % participation, 'contest_attempted:%d' % participation]
+    return keys
+
+
+def _problem_status_revision_key(key):
+    return '%s:revision' % key
+
+
+def problem_status_key(key):
+    """The cache key of the current revision of a set of problems solved or attempted, e.g. of 'user_complete:1'."""
+    return '%s:%d' % (key, _get_version(_problem_status_revision_key(key)))
+
+
+def _add_id(key, problem_id):
+    # A set is only written under a revision taken with cache.incr, which no other process can take, so an update
+    # never overwrites a concurrent update or invalidation. If another process took a revision in between, the set is
+    # left to be computed in full from the database instead, rather than lose either change.
+    revision_key = _problem_status_revision_key(key)
+    revision = cache.get(revision_key)
+    ids = None if revision is None else cache.get('%s:%d' % (key, revision))
+    if ids is not None and problem_id in ids:
+        return
+    try:
+        new_revision = cache.incr(revision_key)
+    except ValueError:
+        _bump_version(revision_key)
+        return
+    if ids is not None and new_revision == revision + 1:
+        cache.set('%s:%d' % (key, new_revision), ids | {problem_id}, PROBLEM_STATUS_CACHE_TIMEOUT)
+
+
+def invalidate_problem_status(keys):
+    """Recompute the given sets of problems solved or attempted when next needed."""
+    for key in keys:
+        _bump_version(_problem_status_revision_key(key))
+
+
+def submitted(sub):
+    """Add the problem of a new submission to the cached problems attempted by its user."""
+    _add_id('user_attempted:%d' % sub.user_id, sub.problem_id)
+
+
+def submitted_to_contest(contest_submission):
+    """Add the problem of a new contest submission to the cached problems attempted in its participation."""
+    _add_id('contest_attempted:%d' % contest_submission.participation_id, contest_submission.problem.problem_id)
+
+
+def finished_submission(sub):
+    """
+    Add the problem of a graded submission to the cached problems solved by its user and participation, if it solved
+    it. A rejudged submission may no longer solve its problem, so the sets are recomputed instead.
+    """
+    if sub.rejudged_date is not None:
+        invalidate_submission(sub)
+        return
+
+    if sub.result != 'AC':
+        return
+    if sub.points == sub.problem.points:
+        _add_id('user_complete:%d' % sub.user_id, sub.problem_id)
+    if hasattr(sub, 'contest') and sub.contest.points == sub.contest.problem.points:
+        _add_id('contest_complete:%d' % sub.contest.participation_id, sub.problem_id)
+
+
+def invalidate_submission(sub):
+    """Recompute the problems attempted and solved by the user and participation of a submission when next needed."""
+    invalidate_problem_status(_problem_status_keys(sub))
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the current time, so that a version evicted from the cache is never reused.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def _contest_ranking_version_key(contest_id):
+    return 'contest_ranking_version:%d' % contest_id
+
+
+def contest_ranking_version(contest_id):
+    return _get_version(_contest_ranking_version_key(contest_id))
+
+
+def bump_contest_ranking(contest_id):
+    _bump_version(_contest_ranking_version_key(contest_id))
+
+
+# The contests in which each user can see all submissions, see Contest.get_submission_visibility. Any change to the
+# contests makes every user's set stale through the version, while participations only change the user's own set.
+SUBMISSION_VISIBILITY_CACHE_TIMEOUT = 3600
+
+
+def submission_visibility_key(profile_id):
+    return 'submission_visibility:%d:%d' % (profile_id, _get_version('submission_visibility_version'))
+
+
+def invalidate_submission_visibility(profile_id):
+    cache.delete(submission_visibility_key(profile_id))
+
+
+def bump_submission_visibility():
+    _bump_version('submission_visibility_version')
+
+
+# The number of submissions of each user that are queued or being graded, to limit them without counting them on
+# every submission. It expires so that it is counted again, in case it drifted, e.g. because a submission being
+# graded was rejudged.
+SUBMISSIONS_IN_FLIGHT_TIMEOUT = 300
+
+
+def _submissions_in_flight_key(profile_id):
+    return 'submissions_in_flight:%d' % profile_id
+
+
+def reserve_submission(profile_id, limit, count):
+    """
+    Count a new submission of a user towards the submissions they have in flight, unless they already have `limit`.
+
+    :param limit: The number of submissions the user may have in flight, or None for no limit.
+    :param count: A function that counts the user's submissions in flight in the database, without the new one.
+    :return: Whether the submission was counted.
+    """
+    key = _submissions_in_flight_key(profile_id)
+    try:
+        in_flight = cache.incr(key)
+    except ValueError:
+        cache.add(key, count(), SUBMISSIONS_IN_FLIGHT_TIMEOUT)
+        try:
+            in_flight = cache.incr(key)
+        except ValueError:
+            return True
+    if limit is None or in_flight <= limit:
+        return True
+
+    # The cached count may be too high, so check the database before turning the submission away.
+    in_flight = count()
+    cache.set(key, in_flight + (in_flight < limit), SUBMISSIONS_IN_FLIGHT_TIMEOUT)
+    return in_flight < limit
+
+
+def release_submission(profile_id):
+    """Stop counting a submission that was counted by reserve_submission, once it has finished or failed."""
+    key = _submissions_in_flight_key(profile_id)
+    try:
+        if cache.decr(key) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
@@ -1,16 +1,16 @@
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db import connection
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _, gettext_lazy, ngettext
 
+from judge.contest_format.base import ProblemResult
 from judge.contest_format.default import DefaultContestFormat
+from judge.contest_format.penalty import get_best_submissions
 from judge.contest_format.registry import register_contest_format
-from judge.timezone import from_database_time
 from judge.utils.timedelta import nice_repr
 
 
@@ -44,56 +44,53 @@ class AtCoderContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
+    def compute_participations(self, participations):
+        from judge.models import ContestSubmission
+
+        by_id = {participation.id: participation for participation in participations}
+        best = get_best_submissions(ContestSubmission.objects.filter(participation_id__in=list(by_id)))
+        format_data = {participation.id: {} for participation in participations}
+        for (participation_id, prob), (score, time, penalty) in sorted(best.items()):
+            format_data[participation_id][str(prob)] = self.get_problem_format_data(by_id[participation_id], score,
+                                                                                    time, penalty)
+
+        for participation in participations:
+            self.update_totals(participation, format_data[participation.id])
+        return True
+
+    def update_participation_problems(self, participation, problem_ids):
+        format_data = dict(participation.format_data)
+        best = get_best_submissions(participation.submissions.filter(problem_id__in=problem_ids))
+        for prob in problem_ids:
+            if (participation.id, prob) not in best:
+                format_data.pop(str(prob), None)
+                continue
+            score, time, penalty = best[participation.id, prob]
+            format_data[str(prob)] = self.get_problem_format_data(participation, score, time, penalty)
+
+        self.update_totals(participation, format_data)
+        participation.save()
+        return True
+
+    def get_problem_format_data(self, participation, score, time, penalty):
+        dt = (time - participation.start).total_seconds()
+        return {'time': dt, 'points': score, 'penalty': penalty if self.config['penalty'] else 0}
+
+    def update_totals(self, participation, format_data):
         cumtime = 0
         penalty = 0
         points = 0
-        format_data = {}
-
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT MAX(cs.points) as `score`, (
-                    SELECT MIN(csub.date)
-                        FROM judge_contestsubmission ccs LEFT OUTER JOIN
-                             judge_submission csub ON (csub.id = ccs.submission_id)
-                        WHERE ccs.problem_id = cp.id AND ccs.participation_id = %s AND ccs.points = MAX(cs.points)
-                ) AS `time`, cp.id AS `prob`
-                FROM judge_contestproblem cp INNER JOIN
-                     judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s) LEFT OUTER JOIN
-                     judge_submission sub ON (sub.id = cs.submission_id)
-                GROUP BY cp.id
-            """, (participation.id, participation.id))
-
-            for score, time, prob in cursor.fetchall():
-                time = from_database_time(time)
-                dt = (time - participation.start).total_seconds()
-
-                # Compute penalty
-                if self.config['penalty']:
-                    # An IE can have a submission result of `None`
-                    subs = participation.submissions.exclude(submission__result__isnull=True) \
-                                                    .exclude(submission__result__in=['IE', 'CE']) \
-                                                    .filter(problem_id=prob)
-                    if score:
-                        prev = subs.filter(submission__date__lte=time).count() - 1
-                        penalty += prev * self.config['penalty'] * 60
-                    else:
-                        # We should always display the penalty, even if the user has a score of 0
-                        prev = subs.count()
-                else:
-                    prev = 0
-
-                if score:
-                    cumtime = max(cumtime, dt)
-
-                format_data[str(prob)] = {'time': dt, 'points': score, 'penalty': prev}
-                points += score
+
+        for _prob, data in sorted(format_data.items(), key=lambda item: int(item[0])):
+            if data['points']:
+                cumtime = max(cumtime, data['time'])
+                penalty += data['penalty'] * self.config['penalty'] * 60
+            points += data['points']
 
         participation.cumtime = cumtime + penalty
         participation.score = round(points, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
-        participation.save()
 
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
@@ -113,6 +110,14 @@ class AtCoderContestFormat(DefaultContestFormat):
         else:
             return mark_safe('<td></td>')
 
+    def get_problem_result(self, data):
+        # The penalty counts the rejected submissions before the scoring one, unless penalties are disabled.
+        if not self.config['penalty']:
+            attempts = None
+        else:
+            attempts = data['penalty'] + 1 if data['points'] else data['penalty']
+        return ProblemResult(points=data['points'], time=data['time'], attempts=attempts)
+
     def get_short_form_display(self):
         yield _('The maximum score submission for each problem will be used.')
 
@@ -1,4 +1,13 @@
 from abc import ABCMeta, abstractmethod
+from collections import namedtuple
+
+from django.db import transaction
+
+ProblemResult = namedtuple('ProblemResult', 'points time attempts')
+
+# The ContestParticipation fields computed by contest formats.
+PARTICIPATION_RESULT_FIELDS = ['score', 'cumtime', 'tiebreaker', 'format_data', 'problem_first_solved']
+BULK_UPDATE_BATCH_SIZE = 500
 
 
 class abstractclassmethod(classmethod):
@@ -47,6 +56,53 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    def update_participations(self, participations):
+        """
+        Updates the results of many ContestParticipation objects of this contest, exactly like update_participation
+        does for each of them. If the contest format can compute them in memory with compute_participations, they are
+        saved with a single bulk update, otherwise update_participation is called for each of them.
+
+        :param participations: A list of ContestParticipation objects of this contest.
+        :return: None
+        """
+        from judge.caching import bump_contest_ranking
+        from judge.models import ContestParticipation
+
+        if not self.compute_participations(participations):
+            for participation in participations:
+                self.update_participation(participation)
+            return
+
+        ContestParticipation.objects.bulk_update(participations, PARTICIPATION_RESULT_FIELDS,
+                                                 batch_size=BULK_UPDATE_BATCH_SIZE)
+        # bulk_update does not send post_save, which would otherwise invalidate the cached rankings once committed.
+        contest_id = self.contest.id
+        transaction.on_commit(lambda: bump_contest_ranking(contest_id))
+
+    def compute_participations(self, participations):
+        """
+        Computes the results of many ContestParticipation objects of this contest in memory, from a few queries
+        covering all of them, without saving them. The result must be identical to that of update_participation.
+
+        :param participations: A list of ContestParticipation objects of this contest.
+        :return: True if the results were computed, False if this contest format does not support it, in which case
+                 update_participation should be used instead.
+        """
+        return False
+
+    def update_participation_problems(self, participation, problem_ids):
+        """
+        Updates a ContestParticipation object's results after submissions to some contest problems were graded,
+        recomputing only those problems and reusing the existing format_data for every other problem. The result
+        must be identical to that of update_participation. Implementations should call ContestParticipation.save().
+
+        :param participation: A ContestParticipation object whose format_data is up to date for all other problems.
+        :param problem_ids: The IDs of the ContestProblem objects whose submissions changed.
+        :return: True if the participation was updated, False if this contest format does not support incremental
+                 updates, in which case update_participation should be used instead.
+        """
+        return False
+
     @abstractmethod
     def display_user_problem(self, participation, contest_problem):
         """
@@ -81,6 +137,36 @@ class BaseContestFormat(metaclass=ABCMeta):
         """
         raise NotImplementedError()
 
+    def get_problem_results(self, participation, contest_problems):
+        """
+        Returns a numeric breakdown for the user's performance on every problem, in the same form for every contest
+        format, for exporting scoreboards.
+
+        :param participation: The ContestParticipation object.
+        :param contest_problems: The list of ContestProblem objects to return performance for.
+        :return: A list with, for every problem, None if the user has no result on it or it can't be read, or a
+                 ProblemResult.
+        """
+        return [self._get_problem_result(data) if data else None
+                for data in self.get_problem_breakdown(participation, contest_problems)]
+
+    def _get_problem_result(self, data):
+        # When the contest format is changed, `format_data` might be invalid, which leaves the result unknown.
+        try:
+            return self.get_problem_result(data)
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def get_problem_result(self, data):
+        """
+        Converts the format_data of a single problem into a ProblemResult.
+
+        :param data: The format_data entry for the problem.
+        :return: A ProblemResult with the points counted towards the score, the time in seconds from the start of
+                 the participation, and the number of submissions counted, or None if they are not tracked.
+        """
+        return ProblemResult(points=data['points'], time=data['time'], attempts=data.get('attempts'))
+
     @abstractmethod
     def get_label_for_problem(self, index):
         """
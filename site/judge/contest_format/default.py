@@ -1,7 +1,8 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db.models import Max
+from django.db.models import Count, Max, Min, Q
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -26,153 +27,83 @@ class DefaultContestFormat(BaseContestFormat):
         super(DefaultContestFormat, self).__init__(contest, config)
 
     def update_participation(self, participation):
+        self.compute_participations([participation])
+        participation.save()
+
+    def compute_participations(self, participations):
+        from judge.models import ContestSubmission
+
+        problem_ids = sorted(self.contest.contest_problems.values_list('id', flat=True))
+        attempts = defaultdict(int)
+        best = {}
+        for participation_id, problem_id, points, date in ContestSubmission.objects.filter(
+            participation_id__in=[participation.id for participation in participations],
+        ).values_list('participation_id', 'problem_id', 'points', 'submission__date').iterator():
+            key = participation_id, problem_id
+            attempts[key] += 1
+            if points > 0:
+                best_points, first_time = best.get(key, (points, date))
+                best[key] = max(best_points, points), min(first_time, date)
+
+        for participation in participations:
+            if participation.problem_first_solved is None:
+                participation.problem_first_solved = {}
+
+            cumtime = 0
+            points = 0
+            format_data = {}
+            for problem_id in problem_ids:
+                key = participation.id, problem_id
+                if key not in best:
+                    format_data[str(problem_id)] = {'time': 0, 'points': 0, 'attempts': attempts[key]}
+                    continue
+                best_points, first_time = best[key]
+                dt = (first_time - participation.start).total_seconds()
+                format_data[str(problem_id)] = {'time': dt, 'points': best_points, 'attempts': attempts[key]}
+                participation.problem_first_solved[str(problem_id)] = dt
+                cumtime += dt
+                points += best_points
+
+            participation.cumtime = max(cumtime, 0)
+            participation.score = round(points, self.contest.points_precision)
+            participation.tiebreaker = 0
+            participation.format_data = format_data
+        return True
+
+    def update_participation_problems(self, participation, problem_ids):
+        format_data = dict(participation.format_data)
+        if any(str(problem_id) not in format_data for problem_id in problem_ids):
+            # The contest's problems changed since the last full update.
+            return False
+
+        for problem_id in problem_ids:
+            result = participation.submissions.filter(problem_id=problem_id).aggregate(
+                attempts=Count('id'),
+                best_points=Max('points', filter=Q(points__gt=0)),
+                first_time=Min('submission__date', filter=Q(points__gt=0)),
+            )
+            if result['best_points'] is None:
+                format_data[str(problem_id)] = {'time': 0, 'points': 0, 'attempts': result['attempts']}
+            else:
+                dt = (result['first_time'] - participation.start).total_seconds()
+                format_data[str(problem_id)] = {'time': dt, 'points': result['best_points'],
+                                                'attempts': result['attempts']}
+                participation.problem_first_solved[str(problem_id)] = dt
+
+        # Sum in the same order as update_participation does, so that the floating point results are identical.
         cumtime = 0
         points = 0
-        format_data = {}
+        for _problem_id, data in sorted(format_data.items(), key=lambda item: int(item[0])):
+            if data['points'] > 0:
+                cumtime += data['time']
+                points += data['points']
 
-        # SQL과 연결하여 각 문제별 제출 정보를 가져옴
-        from django.db import connection
-        from judge.timezone import from_database_time
-        import logging
-        
-        # debug 로그 설정 - 파일 쓰기 오류를 방지하기 위해 안전하게 처리
-        logger = logging.getLogger('contest_time_debug')
-        logger.setLevel(logging.DEBUG)
-        
-        try:
-            # 로그 핸들러 추가
-            import os
-            handler = logging.FileHandler('/tmp/contest_debug.log')
-            handler.setLevel(logging.DEBUG)
-            logger.addHandler(handler)
-        except Exception as e:
-            # 로그 파일 생성 실패 시 무시 (권한 문제 등)
-            pass
-            
-        try:
-            with connection.cursor() as cursor:
-                # 모든 문제 가져오기 (contest_problem 테이블에서)
-                cursor.execute("""
-                    SELECT cp.id 
-                    FROM judge_contestproblem cp
-                    WHERE cp.contest_id = %s
-                    ORDER BY cp.id
-                """, [participation.contest_id])
-                
-                all_problems = cursor.fetchall()
-                logger.debug(f'All problems: {all_problems}')
-                
-                # 각 문제에 대한 점수와 시도 횟수 초기화
-                for prob_id, in all_problems:
-                    format_data[str(prob_id)] = {'time': 0, 'points': 0, 'attempts': 0}
-                
-                # 각 문제별 시도 횟수 가져오기
-                cursor.execute("""
-                    SELECT cs.problem_id, COUNT(cs.id) as attempts
-                    FROM judge_contestsubmission cs
-                    WHERE cs.participation_id = %s
-                    GROUP BY cs.problem_id
-                """, [participation.id])
-                
-                attempts = cursor.fetchall()
-                for prob_id, attempt_count in attempts:
-                    if str(prob_id) in format_data:
-                        format_data[str(prob_id)]['attempts'] = attempt_count
-                
-                # 각 문제별 최대 점수 가져오기 (동일 문제에 대해 최고 점수만 사용)
-                cursor.execute("""
-                    SELECT cp.id, MAX(cs.points) as max_points, MIN(sub.date) as first_ac_time
-                    FROM judge_contestproblem cp
-                    LEFT JOIN judge_contestsubmission cs ON (cs.problem_id = cp.id AND cs.participation_id = %s AND cs.points > 0)
-                    LEFT JOIN judge_submission sub ON (sub.id = cs.submission_id)
-                    WHERE cp.contest_id = %s
-                    GROUP BY cp.id
-                """, [participation.id, participation.contest_id])
-        
-                max_scores = cursor.fetchall()
-                logger.debug(f'Max scores by problem: {max_scores}')
-        
-                # 총점 초기화 - 이 부분이 중요합니다!
-                points = 0
-        
-                # 문제별 최대 점수에 대한 정보 업데이트
-                for prob_id, max_points, first_time in max_scores:
-                    if str(prob_id) in format_data:
-                        # 점수가 없는 경우 처리
-                        if max_points is None:
-                            format_data[str(prob_id)]['points'] = 0
-                            format_data[str(prob_id)]['time'] = 0
-                            continue
-                    
-                        first_time = from_database_time(first_time)
-                        dt = (first_time - participation.start).total_seconds()
-                
-                        format_data[str(prob_id)]['points'] = max_points
-                        format_data[str(prob_id)]['time'] = dt
-                
-                        # 총점에 추가 (최대 점수만 더함)
-                        points += max_points
-                        logger.debug(f'Problem ID: {prob_id}, Points: {max_points}, Time: {dt}, Total points so far: {points}')
-                
-                logger.debug(f'Final format_data: {format_data}')
-                logger.debug(f'Final total points: {points}')
-                
-                # 로그 핸들러 제거
-                try:
-                    logger.removeHandler(handler)
-                    handler.close()
-                except Exception as e:
-                    pass
-        except Exception as e:
-            # DB 연결 오류 또는 기타 예외 발생 시 로그에 기록
-            logger.error(f'Error updating participation: {e}')
-            
-            # 로그 핸들러 제거
-            try:
-                logger.removeHandler(handler)
-                handler.close()
-            except Exception as e:
-                pass
-        
-        # problem_first_solved가 초기화되지 않았으면 초기화
-        if not hasattr(participation, 'problem_first_solved') or participation.problem_first_solved is None:
-            participation.problem_first_solved = {}
-        
-        try:
-            # 각 문제별 첫 정답 제출 시간 가져오기
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT cs.problem_id, MIN(sub.date) as first_ac_time
-                    FROM judge_contestsubmission cs
-                    JOIN judge_submission sub ON (sub.id = cs.submission_id)
-                    WHERE cs.participation_id = %s AND cs.points > 0
-                    GROUP BY cs.problem_id
-                """, [participation.id])
-                
-                first_submissions = cursor.fetchall()
-                
-                # 각 문제별 첫 정답 제출 시간 기록
-                for prob_id, first_time in first_submissions:
-                    dt = (from_database_time(first_time) - participation.start).total_seconds()
-                    participation.problem_first_solved[str(prob_id)] = dt
-        except Exception as e:
-            logger.error(f'Error getting first submission times: {e}')
-        
-        # 점수가 있는 문제들의 시간만 합산
-        for prob_id_str, prob_data in format_data.items():
-            if prob_data['points'] > 0 and prob_id_str in participation.problem_first_solved:
-                cumtime += participation.problem_first_solved[prob_id_str]
-        
-                    
-        logger.debug(f'Final Score: {points}, Cumtime: {cumtime}')
-        logger.debug(f'Format data: {format_data}')
-        logger.debug(f'problem_first_solved: {participation.problem_first_solved if hasattr(participation, "problem_first_solved") else "not exists"}')
-        
         participation.cumtime = max(cumtime, 0)
         participation.score = round(points, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
         participation.save()
+        return True
 
     def display_user_problem(self, participation, contest_problem):
         import logging
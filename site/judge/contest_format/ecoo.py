@@ -1,13 +1,13 @@
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db.models import Count, Max, OuterRef, Subquery
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _, gettext_lazy, ngettext
 
+from judge.contest_format.base import BaseContestFormat, ProblemResult
 from judge.contest_format.default import DefaultContestFormat
 from judge.contest_format.registry import register_contest_format
 from judge.utils.timedelta import nice_repr
@@ -46,34 +46,33 @@ class ECOOContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
-        cumtime = 0
-        score = 0
-        format_data = {}
-
-        submissions = participation.submissions.exclude(submission__result__in=('IE', 'CE'))
-
-        submission_counts = {
-            data['problem_id']: data['count'] for data in submissions.values('problem_id').annotate(count=Count('id'))
-        }
-        queryset = (
-            submissions
-            .values('problem_id')
-            .filter(
-                submission__date=Subquery(
-                    submissions
-                    .filter(problem_id=OuterRef('problem_id'))
-                    .order_by('-submission__date')
-                    .values('submission__date')[:1],
-                ),
-            )
-            .annotate(points=Max('points'))
-            .values_list('problem_id', 'problem__points', 'points', 'submission__date')
-        )
-
-        for problem_id, problem_points, points, date in queryset:
-            sub_cnt = submission_counts.get(problem_id, 0)
-
+    # Incremental updates are not implemented for this format, so results are always recomputed in full.
+    update_participation_problems = BaseContestFormat.update_participation_problems
+
+    def compute_participations(self, participations):
+        from judge.models import ContestSubmission
+
+        # For every problem, the number of submissions and the best points among the last ones.
+        last = {}
+        for participation_id, problem_id, problem_points, points, date in ContestSubmission.objects.filter(
+            participation_id__in=[participation.id for participation in participations],
+        ).exclude(submission__result__in=('IE', 'CE')).values_list(
+            'participation_id', 'problem_id', 'problem__points', 'points', 'submission__date',
+        ).iterator():
+            key = participation_id, problem_id
+            if key not in last:
+                last[key] = [0, problem_points, points, date]
+            result = last[key]
+            result[0] += 1
+            if date > result[3]:
+                result[2:] = points, date
+            elif date == result[3]:
+                result[2] = max(result[2], points)
+
+        format_data = {participation.id: {} for participation in participations}
+        by_id = {participation.id: participation for participation in participations}
+        for (participation_id, problem_id), (sub_cnt, problem_points, points, date) in sorted(last.items()):
+            participation = by_id[participation_id]
             dt = (date - participation.start).total_seconds()
 
             bonus = 0
@@ -85,18 +84,21 @@ class ECOOContestFormat(DefaultContestFormat):
                 if self.config['time_bonus']:
                     bonus += (participation.end_time - date).total_seconds() // 60 // self.config['time_bonus']
 
-            format_data[str(problem_id)] = {'time': dt, 'points': points, 'bonus': bonus}
+            format_data[participation_id][str(problem_id)] = {'time': dt, 'points': points, 'bonus': bonus}
 
-        for data in format_data.values():
-            if self.config['cumtime']:
-                cumtime += data['time']
-            score += data['points'] + data['bonus']
+        for participation in participations:
+            cumtime = 0
+            score = 0
+            for data in format_data[participation.id].values():
+                if self.config['cumtime']:
+                    cumtime += data['time']
+                score += data['points'] + data['bonus']
 
-        participation.cumtime = cumtime
-        participation.score = round(score, self.contest.points_precision)
-        participation.tiebreaker = 0
-        participation.format_data = format_data
-        participation.save()
+            participation.cumtime = cumtime
+            participation.score = round(score, self.contest.points_precision)
+            participation.tiebreaker = 0
+            participation.format_data = format_data[participation.id]
+        return True
 
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
@@ -126,6 +128,9 @@ class ECOOContestFormat(DefaultContestFormat):
             cumtime=nice_repr(timedelta(seconds=participation.cumtime), 'noday') if self.config['cumtime'] else '',
         )
 
+    def get_problem_result(self, data):
+        return ProblemResult(points=data['points'] + data['bonus'], time=data['time'], attempts=None)
+
     def get_short_form_display(self):
         yield _('The score on your **last** non-CE submission for each problem will be used.')
 
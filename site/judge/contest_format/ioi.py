@@ -1,9 +1,8 @@
-from django.db import connection
 from django.utils.translation import gettext as _, gettext_lazy
 
+from judge.contest_format.base import BaseContestFormat
 from judge.contest_format.legacy_ioi import LegacyIOIContestFormat
 from judge.contest_format.registry import register_contest_format
-from judge.timezone import from_database_time
 
 
 @register_contest_format('ioi16')
@@ -14,83 +13,72 @@ class IOIContestFormat(LegacyIOIContestFormat):
         cumtime: Specify True if time penalties are to be computed. Defaults to False.
     """
 
-    def update_participation(self, participation):
-        cumtime = 0
-        score = 0
-        format_data = {}
+    # Incremental updates are not implemented for this format, so results are always recomputed in full.
+    update_participation_problems = BaseContestFormat.update_participation_problems
 
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                SELECT q.prob,
-                       MIN(q.date) as `date`,
-                       q.batch_points
-                FROM (
-                         SELECT cp.id          as `prob`,
-                                sub.id         as `subid`,
-                                sub.date       as `date`,
-                                tc.points      as `points`,
-                                tc.batch       as `batch`,
-                                MIN(tc.points) as `batch_points`
-                         FROM judge_contestproblem cp
-                                  INNER JOIN
-                              judge_contestsubmission cs
-                              ON (cs.problem_id = cp.id AND cs.participation_id = %s)
-                                  LEFT OUTER JOIN
-                              judge_submission sub
-                              ON (sub.id = cs.submission_id AND sub.status = 'D')
-                                  INNER JOIN judge_submissiontestcase tc
-                              ON sub.id = tc.submission_id
-                         GROUP BY cp.id, tc.batch, sub.id
-                     ) q
-                         INNER JOIN (
-                    SELECT prob, batch, MAX(r.batch_points) as max_batch_points
-                    FROM (
-                             SELECT cp.id          as `prob`,
-                                    tc.batch       as `batch`,
-                                    MIN(tc.points) as `batch_points`
-                             FROM judge_contestproblem cp
-                                      INNER JOIN
-                                  judge_contestsubmission cs
-                                  ON (cs.problem_id = cp.id AND cs.participation_id = %s)
-                                      LEFT OUTER JOIN
-                                  judge_submission sub
-                                  ON (sub.id = cs.submission_id AND sub.status = 'D')
-                                      INNER JOIN judge_submissiontestcase tc
-                                  ON sub.id = tc.submission_id
-                             GROUP BY cp.id, tc.batch, sub.id
-                         ) r
-                    GROUP BY prob, batch
-                ) p
-                ON p.prob = q.prob AND (p.batch = q.batch OR p.batch is NULL AND q.batch is NULL)
-                WHERE p.max_batch_points = q.batch_points
-                GROUP BY q.prob, q.batch
-            """, (participation.id, participation.id))
+    def compute_participations(self, participations):
+        from judge.models import SubmissionTestCase
 
-            for problem_id, time, subtask_points in cursor.fetchall():
-                problem_id = str(problem_id)
-                time = from_database_time(time)
-                if self.config['cumtime']:
-                    dt = (time - participation.start).total_seconds()
-                else:
-                    dt = 0
+        # The points of every batch of every graded submission are the lowest points of its test cases.
+        batch_points = {}
+        for participation_id, problem_id, submission_id, date, batch, points in SubmissionTestCase.objects.filter(
+            submission__contest__participation_id__in=[participation.id for participation in participations],
+            submission__status='D',
+        ).values_list(
+            'submission__contest__participation_id', 'submission__contest__problem_id', 'submission_id',
+            'submission__date', 'batch', 'points',
+        ).iterator():
+            key = participation_id, problem_id, batch, submission_id
+            if key not in batch_points:
+                batch_points[key] = (date, points)
+            elif points is not None:
+                lowest = batch_points[key][1]
+                batch_points[key] = (date, points if lowest is None else min(lowest, points))
 
-                if format_data.get(problem_id) is None:
-                    format_data[problem_id] = {'points': 0, 'time': 0}
-                format_data[problem_id]['points'] += subtask_points
-                format_data[problem_id]['time'] = max(dt, format_data[problem_id]['time'])
+        # The best points of every batch, and when a submission first reached them.
+        best = {}
+        for (participation_id, problem_id, batch, _submission_id), (date, points) in batch_points.items():
+            if points is None:
+                continue
+            key = participation_id, problem_id, batch
+            best_points, time = best.get(key, (points, date))
+            if points > best_points:
+                best[key] = (points, date)
+            else:
+                best[key] = (best_points, min(time, date) if points == best_points else time)
 
-            for problem_data in format_data.values():
+        format_data = {participation.id: {} for participation in participations}
+        by_id = {participation.id: participation for participation in participations}
+        # Unbatched test cases, with a batch of None, come first.
+        for (participation_id, problem_id, _batch), (subtask_points, time) in sorted(
+            best.items(), key=lambda item: (item[0][0], item[0][1], item[0][2] is not None, item[0][2] or 0),
+        ):
+            participation = by_id[participation_id]
+            problem_id = str(problem_id)
+            if self.config['cumtime']:
+                dt = (time - participation.start).total_seconds()
+            else:
+                dt = 0
+
+            problem_data = format_data[participation_id].setdefault(problem_id, {'points': 0, 'time': 0})
+            problem_data['points'] += subtask_points
+            problem_data['time'] = max(dt, problem_data['time'])
+
+        for participation in participations:
+            cumtime = 0
+            score = 0
+            for problem_data in format_data[participation.id].values():
                 penalty = problem_data['time']
                 points = problem_data['points']
                 if self.config['cumtime'] and points:
                     cumtime += penalty
                 score += points
 
-        participation.cumtime = max(cumtime, 0)
-        participation.score = round(score, self.contest.points_precision)
-        participation.tiebreaker = 0
-        participation.format_data = format_data
-        participation.save()
+            participation.cumtime = max(cumtime, 0)
+            participation.score = round(score, self.contest.points_precision)
+            participation.tiebreaker = 0
+            participation.format_data = format_data[participation.id]
+        return True
 
     def get_short_form_display(self):
         yield _('The maximum score for each problem batch will be used.')
@@ -1,7 +1,7 @@
 from datetime import timedelta
 
 from django.core.exceptions import ValidationError
-from django.db.models import Min, OuterRef, Subquery
+from django.db.models import Max, Min
 from django.template.defaultfilters import floatformat
 from django.urls import reverse
 from django.utils.html import format_html
@@ -9,6 +9,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import gettext as _, gettext_lazy
 
 from judge.contest_format.default import DefaultContestFormat
+from judge.contest_format.penalty import get_best_submissions
 from judge.contest_format.registry import register_contest_format
 from judge.utils.timedelta import nice_repr
 
@@ -40,34 +41,52 @@ class LegacyIOIContestFormat(DefaultContestFormat):
         self.config.update(config or {})
         self.contest = contest
 
-    def update_participation(self, participation):
+    def compute_participations(self, participations):
+        from judge.models import ContestSubmission
+
+        by_id = {participation.id: participation for participation in participations}
+        best = get_best_submissions(ContestSubmission.objects.filter(participation_id__in=list(by_id)))
+        format_data = {participation.id: {} for participation in participations}
+        for (participation_id, problem_id), (points, time, _penalty) in sorted(best.items()):
+            format_data[participation_id][str(problem_id)] = self.get_problem_format_data(by_id[participation_id],
+                                                                                          points, time)
+
+        for participation in participations:
+            self.update_totals(participation, format_data[participation.id])
+        return True
+
+    def update_participation_problems(self, participation, problem_ids):
+        format_data = dict(participation.format_data)
+        for problem_id in problem_ids:
+            submissions = participation.submissions.filter(problem_id=problem_id)
+            points = submissions.aggregate(points=Max('points'))['points']
+            if points is None:
+                format_data.pop(str(problem_id), None)
+                continue
+            time = submissions.filter(points=points).aggregate(time=Min('submission__date'))['time']
+            format_data[str(problem_id)] = self.get_problem_format_data(participation, points, time)
+
+        self.update_totals(participation, format_data)
+        participation.save()
+        return True
+
+    def get_problem_format_data(self, participation, points, time):
+        dt = (time - participation.start).total_seconds() if self.config['cumtime'] else 0
+        return {'points': points, 'time': dt}
+
+    def update_totals(self, participation, format_data):
         cumtime = 0
         score = 0
-        format_data = {}
-
-        queryset = (participation.submissions.values('problem_id')
-                                             .filter(points=Subquery(
-                                                 participation.submissions.filter(problem_id=OuterRef('problem_id'))
-                                                                          .order_by('-points').values('points')[:1]))
-                                             .annotate(time=Min('submission__date'))
-                                             .values_list('problem_id', 'time', 'points'))
-
-        for problem_id, time, points in queryset:
-            if self.config['cumtime']:
-                dt = (time - participation.start).total_seconds()
-                if points:
-                    cumtime += dt
-            else:
-                dt = 0
-
-            format_data[str(problem_id)] = {'points': points, 'time': dt}
-            score += points
+
+        for _problem_id, data in sorted(format_data.items(), key=lambda item: int(item[0])):
+            if data['points']:
+                cumtime += data['time']
+            score += data['points']
 
         participation.cumtime = max(cumtime, 0)
         participation.score = round(score, self.contest.points_precision)
         participation.tiebreaker = 0
         participation.format_data = format_data
-        participation.save()
 
     def display_user_problem(self, participation, contest_problem):
         format_data = (participation.format_data or {}).get(str(contest_problem.id))
@@ -0,0 +1,32 @@
+from collections import defaultdict
+
+# Results of submissions that are not counted as incorrect. An IE can have a submission result of `None`.
+UNPENALIZED_RESULTS = (None, 'IE', 'CE')
+
+
+def get_best_submissions(submissions):
+    """
+    Finds the best score on every problem of every participation among some contest submissions, when it was first
+    reached, and how many incorrect submissions came before it, all from a single query.
+
+    :param submissions: A queryset of ContestSubmission objects.
+    :return: A dictionary mapping (participation ID, ContestProblem ID) to (points, time, penalty). If the best score
+             is 0, the penalty counts every incorrect submission to the problem.
+    """
+    grouped = defaultdict(list)
+    for participation, problem, points, date, result in submissions.values_list(
+        'participation_id', 'problem_id', 'points', 'submission__date', 'submission__result',
+    ).iterator():
+        grouped[participation, problem].append((points, date, result))
+
+    best = {}
+    for key, results in grouped.items():
+        points = max(points for points, _, _ in results)
+        time = min(date for score, date, _ in results if score == points)
+        counted = [date for _, date, result in results if result not in UNPENALIZED_RESULTS]
+        if points:
+            penalty = sum(1 for date in counted if date <= time) - 1
+        else:
+            penalty = len(counted)
+        best[key] = (points, time, penalty)
+    return best
@@ -0,0 +1,63 @@
+from django.test import TestCase
+
+from judge.contest_format.tests.util import FORMATS, create_format_contest, create_graded_submission
+from judge.models.tests.util import create_contest_participation, create_contest_problem, create_problem, \
+    create_user
+
+# (problem, points, minutes after the start, result), in the order the submissions are graded.
+SUBMISSIONS = [
+    ('a', 0, 10, 'WA'),
+    ('a', 40, 20, 'WA'),
+    ('b', 0, 25, 'CE'),
+    ('a', 100, 30, 'AC'),
+    ('b', 50, 40, 'AC'),
+    ('a', 100, 50, 'AC'),
+    ('b', 20, 35, 'WA'),
+    ('c', 0, 60, 'TLE'),
+]
+
+
+class IncrementalUpdateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.user = create_user(username='incremental').profile
+        self.problems = {code: create_problem(code='incremental_%s' % code) for code in 'abc'}
+
+    def results(self, participation):
+        participation.refresh_from_db()
+        return {
+            'score': participation.score,
+            'cumtime': participation.cumtime,
+            'tiebreaker': participation.tiebreaker,
+            'format_data': participation.format_data,
+            'problem_first_solved': participation.problem_first_solved,
+        }
+
+    def test_incremental_matches_full_recompute(self):
+        for format_name, format_config in FORMATS:
+            with self.subTest(format=format_name, config=format_config):
+                contest = create_format_contest(format_name, format_config)
+                contest_problems = {
+                    code: create_contest_problem(contest=contest, problem=problem, points=50 if code == 'b' else 100,
+                                                 partial=True, order=index)
+                    for index, (code, problem) in enumerate(self.problems.items())
+                }
+                participation = create_contest_participation(contest=contest, user=self.user)
+                participation.recompute_results()
+
+                for code, points, minutes, result in SUBMISSIONS:
+                    create_graded_submission(participation, contest_problems[code], points, minutes, result)
+                    participation.update_problem_results([contest_problems[code].id])
+                    incremental = self.results(participation)
+                    participation.recompute_results()
+                    self.assertEqual(incremental, self.results(participation))
+
+    def test_falls_back_without_format_data(self):
+        contest = create_format_contest('icpc')
+        contest_problem = create_contest_problem(contest=contest, problem=self.problems['a'])
+        participation = create_contest_participation(contest=contest, user=self.user)
+        create_graded_submission(participation, contest_problem, 100, 10, 'AC')
+
+        participation.format_data = None
+        participation.update_problem_results([contest_problem.id])
+        self.assertEqual(self.results(participation)['score'], 100)
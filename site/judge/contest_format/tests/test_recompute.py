@@ -0,0 +1,107 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from judge.caching import contest_ranking_version
+from judge.contest_format.tests.util import FORMATS, create_format_contest, create_graded_submission
+from judge.models import SubmissionTestCase
+from judge.models.tests.util import create_contest_participation, create_contest_problem, create_problem, \
+    create_user
+
+# (user, problem, points, minutes after the start, result)
+SUBMISSIONS = [
+    (0, 0, 0, 10, 'WA'),
+    (0, 0, 100, 20, 'AC'),
+    (0, 1, 0, 15, 'CE'),
+    (0, 1, 0, 25, 'WA'),
+    (0, 1, 0, 30, None),
+    (1, 0, 100, 5, 'AC'),
+    (1, 0, 100, 8, 'AC'),
+    (1, 1, 30, 40, 'WA'),
+    (1, 1, 30, 35, 'WA'),
+    (1, 2, 0, 50, 'IE'),
+    (2, 2, 0, 60, 'TLE'),
+]
+
+
+class ContestRecomputeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.users = [create_user(username='recompute%d' % i).profile for i in range(3)]
+        self.problems = [create_problem(code='recompute%d' % i) for i in range(3)]
+
+    def create_contest(self, format_name, format_config):
+        contest = create_format_contest(format_name, format_config)
+        contest_problems = [create_contest_problem(contest=contest, problem=problem, points=100, partial=True,
+                                                   order=index) for index, problem in enumerate(self.problems)]
+        participations = [create_contest_participation(contest=contest, user=user) for user in self.users]
+
+        for user, problem, points, minutes, result in SUBMISSIONS:
+            submission = create_graded_submission(participations[user], contest_problems[problem], points, minutes,
+                                                  result)
+            # Split the points over two batches of two cases, with an unbatched case that is always failed.
+            for case, batch, case_points in [(1, None, 0), (2, 1, min(points, 50)), (3, 1, min(points, 60)),
+                                             (4, 2, max(points - 50, 0)), (5, 2, None)]:
+                SubmissionTestCase.objects.create(submission=submission, case=case, batch=batch, status='AC',
+                                                  points=case_points, total=50)
+        return contest, participations
+
+    def results(self, contest):
+        return {
+            participation['id']: participation
+            for participation in contest.users.values('id', 'score', 'cumtime', 'tiebreaker', 'format_data')
+        }
+
+    def test_contest_matches_participations(self):
+        for format_name, format_config in FORMATS:
+            with self.subTest(format=format_name, config=format_config):
+                contest, participations = self.create_contest(format_name, format_config)
+                for participation in participations:
+                    participation.recompute_results()
+                expected = self.results(contest)
+
+                contest.users.update(score=0, cumtime=0, tiebreaker=0, format_data=None)
+                contest.recompute_results()
+                self.assertEqual(self.results(contest), expected)
+
+    def test_ranking_bumped_on_commit(self):
+        contest, participations = self.create_contest('icpc', {'penalty': 20})
+        version = contest_ranking_version(contest.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            contest.recompute_results()
+            self.assertEqual(contest_ranking_version(contest.id), version)
+        self.assertNotEqual(contest_ranking_version(contest.id), version)
+
+    def test_penalties(self):
+        contest, participations = self.create_contest('icpc', {'penalty': 20})
+        contest.recompute_results()
+        format_data = {participation.id: participation.format_data for participation in contest.users.all()}
+        problems = [str(problem.id) for problem in contest.contest_problems.order_by('order')]
+
+        # The CE and the ungraded submission are not counted.
+        self.assertEqual(format_data[participations[0].id][problems[0]]['penalty'], 1)
+        self.assertEqual(format_data[participations[0].id][problems[1]]['penalty'], 1)
+        self.assertEqual(format_data[participations[1].id][problems[0]]['penalty'], 0)
+        # The earliest of the best submissions counts.
+        self.assertEqual(format_data[participations[1].id][problems[1]]['penalty'], 0)
+        self.assertEqual(format_data[participations[1].id][problems[1]]['time'], 35 * 60)
+        self.assertEqual(format_data[participations[1].id][problems[2]]['penalty'], 0)
+        self.assertEqual(format_data[participations[2].id][problems[2]]['penalty'], 1)
+
+    def test_contest_query_count(self):
+        for format_name, format_config in FORMATS:
+            with self.subTest(format=format_name, config=format_config):
+                contest, participations = self.create_contest(format_name, format_config)
+                with CaptureQueriesContext(connection) as queries:
+                    contest.recompute_results()
+                # The number of queries doesn't depend on the number of participations.
+                self.assertLessEqual(len(queries), 6)
+
+    def test_query_count(self):
+        contest, participations = self.create_contest('icpc', {'penalty': 20})
+        participation = participations[1]
+        participation.contest = contest
+        with CaptureQueriesContext(connection) as queries:
+            contest.format.update_participation(participation)
+        # One query for the submissions, one to save the results.
+        self.assertEqual(len(queries), 2)
@@ -0,0 +1,33 @@
+from django.utils import timezone
+
+from judge.models import ContestSubmission, Language, Submission
+from judge.models.tests.util import create_numbered_contest
+
+# (format name, format config) pairs covering every contest format and the options that change how it scores.
+FORMATS = [
+    ('default', None),
+    ('icpc', {'penalty': 20}),
+    ('icpc', {'penalty': 0}),
+    ('atcoder', {'penalty': 5}),
+    ('ioi', {'cumtime': True}),
+    ('ioi16', {'cumtime': True}),
+    ('ecoo', None),
+    ('ecoo', {'cumtime': True, 'first_ac_bonus': 10, 'time_bonus': 0}),
+]
+
+
+def create_format_contest(format_name, format_config=None):
+    return create_numbered_contest(format_name, format_name=format_name, format_config=format_config)
+
+
+def create_graded_submission(participation, contest_problem, points, minutes, result):
+    submission = Submission.objects.create(user=participation.user, problem=contest_problem.problem,
+                                           language=Language.get_python3())
+    # Mark the submission as graded without going through the post_save signals.
+    Submission.objects.filter(id=submission.id).update(
+        date=participation.start + timezone.timedelta(minutes=minutes), status='D', result=result,
+        case_points=points, case_total=100,
+    )
+    ContestSubmission.objects.create(submission=submission, problem=contest_problem, participation=participation,
+                                     points=points)
+    return submission
@@ -1,18 +1,27 @@
+import hashlib
 import json
 import logging
+import os
 import socket
 import struct
+import threading
 import zlib
+from itertools import count
 
 from django.conf import settings
 from django.utils import timezone
 
 from judge import event_poster as event
+from judge.caching import release_submission
 from judge.judge_priority import BATCH_REJUDGE_PRIORITY, CONTEST_SUBMISSION_PRIORITY, DEFAULT_PRIORITY, REJUDGE_PRIORITY
+from judge.utils.iterator import chunk
 
 logger = logging.getLogger('judge.judgeapi')
 size_pack = struct.Struct('!I')
 
+BRIDGE_RESPONSE_TIMEOUT = 30
+BATCH_SUBMISSION_REQUEST_SIZE = 100
+
 
 def _post_update_submission(submission, done=False):
     if submission.problem.is_public:
@@ -23,9 +32,144 @@ def _post_update_submission(submission, done=False):
                                    'status': submission.status, 'language': submission.language.key})
 
 
+def _bridge_address():
+    return settings.BRIDGED_DJANGO_CONNECT or settings.BRIDGED_DJANGO_ADDRESS[0]
+
+
+def _encode_packet(packet):
+    output = zlib.compress(json.dumps(packet, separators=(',', ':')).encode('utf-8'))
+    return size_pack.pack(len(output)) + output
+
+
+class BridgeConnection:
+    """
+    A long-lived connection to the bridge shared by every thread of the process.
+
+    Each request carries a `request-id` that the bridge echoes back, so requests from many threads can be pipelined
+    over the same socket. Responses are read by a background thread and handed to the waiting requester.
+    """
+
+    def __init__(self, address):
+        self.sock = socket.create_connection(address)
+        self.closed = False
+        self._ids = count(1)
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_responses, daemon=True)
+        self._reader.start()
+
+    def _read_exactly(self, reader, size):
+        data = reader.read(size)
+        if len(data) < size:
+            raise ConnectionError('Bridge closed the connection')
+        return data
+
+    def _read_responses(self):
+        reader = self.sock.makefile('rb', -1)
+        try:
+            while True:
+                length = size_pack.unpack(self._read_exactly(reader, size_pack.size))[0]
+                response = json.loads(zlib.decompress(self._read_exactly(reader, length)).decode('utf-8'))
+                with self._lock:
+                    waiter = self._pending.pop(response.pop('request-id', None), None)
+                if waiter is not None:
+                    waiter[1] = response
+                    waiter[0].set()
+        except Exception as e:
+            self.close(e)
+
+    def close(self, error=None):
+        with self._lock:
+            self.closed = True
+            pending, self._pending = self._pending, {}
+        for waiter in pending.values():
+            waiter[2] = error or ConnectionError('Bridge connection closed')
+            waiter[0].set()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def request(self, packet, reply=True, timeout=BRIDGE_RESPONSE_TIMEOUT):
+        id = next(self._ids)
+        # Each waiter is [event, response, error].
+        waiter = [threading.Event(), None, None]
+        with self._lock:
+            if self.closed:
+                raise ConnectionError('Bridge connection closed')
+            if reply:
+                self._pending[id] = waiter
+
+        try:
+            with self._write_lock:
+                self.sock.sendall(_encode_packet(dict(packet, **{'request-id': id})))
+        except OSError as e:
+            self.close(e)
+            raise
+
+        if not reply:
+            return
+        if not waiter[0].wait(timeout):
+            with self._lock:
+                self._pending.pop(id, None)
+            raise ValueError('Judge did not respond')
+        if waiter[2] is not None:
+            raise waiter[2]
+        return waiter[1]
+
+
+class BridgeConnectionPool:
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._connections = []
+        self._next = count()
+        self._pid = None
+
+    def _get(self):
+        with self._lock:
+            # Sockets must not be shared with forked worker processes.
+            if self._pid != os.getpid():
+                self._connections = [None] * self.size
+                self._pid = os.getpid()
+            index = next(self._next) % self.size
+            connection = self._connections[index]
+            if connection is None or connection.closed:
+                connection = self._connections[index] = BridgeConnection(_bridge_address())
+            return connection
+
+    def request(self, packet, reply=True):
+        try:
+            return self._get().request(packet, reply)
+        except (ConnectionError, OSError):
+            # The bridge may have restarted since the connection was opened; all requests are idempotent.
+            logger.info('Bridge connection lost, reconnecting', exc_info=True)
+            return self._get().request(packet, reply)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    size = getattr(settings, 'BRIDGED_DJANGO_POOL_SIZE', 0)
+    if not size:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BridgeConnectionPool(size)
+    return _pool
+
+
 def judge_request(packet, reply=True):
-    sock = socket.create_connection(settings.BRIDGED_DJANGO_CONNECT or
-                                    settings.BRIDGED_DJANGO_ADDRESS[0])
+    pool = _get_pool()
+    if pool is not None:
+        return pool.request(packet, reply)
+
+    sock = socket.create_connection(_bridge_address())
 
     output = json.dumps(packet, separators=(',', ':'))
     output = zlib.compress(output.encode('utf-8'))
@@ -50,20 +194,25 @@ def judge_request(packet, reply=True):
         return result
 
 
-def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=None):
-    from .models import ContestSubmission, Submission, SubmissionTestCase
+def _prepare_submission(submission, rejudge, batch_rejudge, judge_id):
+    from .models import ContestSubmission, LanguageLimit, Submission, SubmissionTestCase
 
     updates = {'time': None, 'memory': None, 'points': None, 'result': None, 'case_points': 0, 'case_total': 0,
                'error': None, 'rejudged_date': timezone.now() if rejudge or batch_rejudge else None, 'status': 'QU'}
     try:
-        # This is set proactively; it might get unset in judgecallback's on_grading_begin if the problem doesn't
-        # actually have pretests stored on the judge.
-        updates['is_pretested'] = all(ContestSubmission.objects.filter(submission=submission)
-                                      .values_list('problem__contest__run_pretests_only', 'problem__is_pretested')[0])
+        run_pretests_only, is_pretested, part_virtual, part_id = (
+            ContestSubmission.objects.filter(submission=submission)
+                             .values_list('problem__contest__run_pretests_only', 'problem__is_pretested',
+                                          'participation__virtual', 'participation_id')[0])
     except IndexError:
         priority = DEFAULT_PRIORITY
+        pretests_only = submission.is_pretested
+        part_virtual = part_id = None
     else:
         priority = CONTEST_SUBMISSION_PRIORITY
+        # This is set proactively; it might get unset in judgecallback's on_grading_begin if the problem doesn't
+        # actually have pretests stored on the judge.
+        pretests_only = updates['is_pretested'] = run_pretests_only and is_pretested
 
     # This should prevent double rejudge issues by permitting only the judging of
     # QU (which is the initial state) and D (which is the final state).
@@ -74,20 +223,53 @@ def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=No
     # It is worth noting that this mechanism does not prevent a new rejudge from being scheduled
     # while already queued, but that does not lead to data corruption.
     if not Submission.objects.filter(id=submission.id).exclude(status__in=('P', 'G')).update(**updates):
-        return False
+        return None
 
     SubmissionTestCase.objects.filter(submission_id=submission.id).delete()
 
+    # Everything the bridge needs to hand the submission to a judge is sent along with the request, so that the
+    # bridge does not have to query for it while dispatching.
+    problem = submission.problem
+    time_limit, memory_limit = problem.time_limit, problem.memory_limit
+    try:
+        time_limit, memory_limit = (LanguageLimit.objects.filter(problem_id=problem.id,
+                                                                 language_id=submission.language_id)
+                                    .values_list('time_limit', 'memory_limit').get())
+    except LanguageLimit.DoesNotExist:
+        pass
+
+    attempt_no = Submission.objects.filter(problem_id=problem.id, contest__participation__id=part_id,
+                                           user_id=submission.user_id, date__lt=submission.date) \
+                                   .exclude(status__in=('CE', 'IE')).count() + 1
+
+    return {
+        'submission-id': submission.id,
+        'problem-id': problem.code,
+        'language': submission.language.key,
+        'source': submission.source.source,
+        'judge-id': judge_id,
+        'priority': BATCH_REJUDGE_PRIORITY if batch_rejudge else (REJUDGE_PRIORITY if rejudge else priority),
+        'time-limit': time_limit,
+        'memory-limit': memory_limit,
+        'short-circuit': problem.short_circuit,
+        'meta': {
+            'pretests-only': pretests_only,
+            'in-contest': part_virtual,
+            'attempt-no': attempt_no,
+            'user': submission.user_id,
+        },
+    }
+
+
+def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=None):
+    from .models import Submission
+
+    request = _prepare_submission(submission, rejudge, batch_rejudge, judge_id)
+    if request is None:
+        return False
+
     try:
-        response = judge_request({
-            'name': 'submission-request',
-            'submission-id': submission.id,
-            'problem-id': submission.problem.code,
-            'language': submission.language.key,
-            'source': submission.source.source,
-            'judge-id': judge_id,
-            'priority': BATCH_REJUDGE_PRIORITY if batch_rejudge else (REJUDGE_PRIORITY if rejudge else priority),
-        })
+        response = judge_request(dict(request, name='submission-request'))
     except BaseException:
         logger.exception('Failed to send request to judge')
         Submission.objects.filter(id=submission.id).update(status='IE', result='IE')
@@ -100,6 +282,49 @@ def judge_submission(submission, rejudge=False, batch_rejudge=False, judge_id=No
     return success
 
 
+def judge_submissions(submissions, rejudge=False, batch_rejudge=False, judge_id=None):
+    """
+    Queue many submissions for judging, sending them to the bridge in batches of `BATCH_SUBMISSION_REQUEST_SIZE`
+    with one round trip per batch. Returns the number of submissions the bridge accepted.
+    """
+    from .models import Submission
+
+    accepted = 0
+    for group in chunk(submissions, BATCH_SUBMISSION_REQUEST_SIZE):
+        requests = {}
+        sources = {}
+        for submission in group:
+            request = _prepare_submission(submission, rejudge, batch_rejudge, judge_id)
+            if request is not None:
+                # Identical sources, e.g. when rejudging a problem, are only sent once per batch.
+                source = request.pop('source')
+                request['source-hash'] = key = hashlib.sha1(source.encode('utf-8')).hexdigest()
+                sources[key] = source
+                requests[submission.id] = (submission, request)
+        if not requests:
+            continue
+
+        try:
+            response = judge_request({
+                'name': 'submission-request-many',
+                'submissions': [request for _, request in requests.values()],
+                'sources': sources,
+            })
+        except BaseException:
+            logger.exception('Failed to send request to judge')
+            Submission.objects.filter(id__in=list(requests)).update(status='IE', result='IE')
+            continue
+
+        received = set(response.get('submission-ids', ())) if response['name'] == 'submissions-received' else set()
+        rejected = [id for id in requests if id not in received]
+        if rejected:
+            Submission.objects.filter(id__in=rejected).update(status='IE', result='IE')
+        for submission, _ in requests.values():
+            _post_update_submission(submission)
+        accepted += len(received)
+    return accepted
+
+
 def disconnect_judge(judge, force=False):
     judge_request({'name': 'disconnect-judge', 'judge-id': judge.name, 'force': force}, reply=False)
 
@@ -108,8 +333,16 @@ def update_disable_judge(judge):
     judge_request({'name': 'disable-judge', 'judge-id': judge.name, 'is-disabled': judge.is_disabled})
 
 
+def get_queue_stats():
+    return judge_request({'name': 'queue-stats'})
+
+
+def get_bridge_stats():
+    return judge_request({'name': 'bridge-stats'})
+
+
 def abort_submission(submission):
-    from .models import Submission
+    from .models import Submission, UserProblemPoints
     # We only want to try to abort a submission if it's still grading, otherwise this can lead to fully graded
     # submissions marked as aborted.
     if submission.status == 'D':
@@ -119,5 +352,9 @@ def abort_submission(submission):
     # and returns a bad-request, the submission is not falsely shown as "Aborted" when it will still be judged.
     if not response.get('judge-aborted', True):
         Submission.objects.filter(id=submission.id).update(status='AB', result='AB', points=0)
+        UserProblemPoints.update(submission.user_id, submission.problem_id)
+        # The bridge removed it from the queue, so no judge will report it finished, see ProblemSubmit.form_valid.
+        if submission.rejudged_date is None:
+            release_submission(submission.user_id)
         event.post('sub_%s' % Submission.get_id_secret(submission.id), {'type': 'aborted-submission'})
         _post_update_submission(submission, done=True)
@@ -0,0 +1,86 @@
+import logging
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from judge.bridge.judge_list import JudgeList
+from judge.bridge.simulation import FakeJudge, percentile
+from judge.bridge.submission_queue import SubmissionData
+from judge.judge_priority import BATCH_REJUDGE_PRIORITY, DEFAULT_PRIORITY, REJUDGE_PRIORITY
+
+
+class Command(BaseCommand):
+    help = 'simulates dispatching a large queue of submissions through the bridge judge list, with fake judges'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--judges', type=int, default=50, help='judges connected to the bridge')
+        parser.add_argument('--submissions', type=int, default=20000, help='submissions queued')
+        parser.add_argument('--problems', type=int, default=200, help='problems submitted to')
+        parser.add_argument('--languages', type=int, default=6, help='languages submitted in')
+        parser.add_argument('--coverage', type=float, default=0.8, help='fraction of problems each judge supports')
+        parser.add_argument('--pinned', type=float, default=0.01, help='fraction of submissions pinned to a judge')
+        parser.add_argument('--query-latency', type=float, default=0,
+                            help='milliseconds taken to fetch submission data for a dispatch that lacks it')
+        parser.add_argument('--fetch-at-dispatch', action='store_true',
+                            help='queue submissions without data, so that it is fetched while the judge list is '
+                                 'locked')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        logging.disable(logging.CRITICAL)
+        random.seed(options['seed'])
+
+        problems = ['problem%d' % i for i in range(options['problems'])]
+        languages = ['LANG%d' % i for i in range(options['languages'])]
+
+        judges = JudgeList()
+        fleet = []
+        for i in range(options['judges']):
+            # Every judge misses some problems so that a freed judge has to skip over ineligible work.
+            supported = {problem: 0 for problem in problems if random.random() < options['coverage']}
+            fleet.append(FakeJudge('judge%d' % i, supported, {language: [] for language in languages},
+                                   options['query_latency'] / 1000))
+
+        # Occupy every judge so that everything submitted afterwards gets queued.
+        for index, judge in enumerate(fleet):
+            judges.judges.add(judge)
+            judge._working = -index - 1
+            judges.submission_map[judge._working] = judge
+
+        priorities = [DEFAULT_PRIORITY, REJUDGE_PRIORITY, BATCH_REJUDGE_PRIORITY]
+        data = SubmissionData(time=1, memory=262144, short_circuit=False, pretests_only=False, contest_no=None,
+                              attempt_no=1, user_id=1)
+        submissions = options['submissions']
+        start = time.perf_counter()
+        for id in range(1, submissions + 1):
+            judge_id = random.choice(fleet).name if random.random() < options['pinned'] else None
+            judges.judge(id, random.choice(problems), random.choice(languages), 'print(%d)' % id, judge_id,
+                         random.choices(priorities, weights=(1, 4, 15))[0],
+                         None if options['fetch_at_dispatch'] else data)
+        enqueue_time = time.perf_counter() - start
+        self.stdout.write('Queued %d submissions in %.3fs (%.2fus each)' % (
+            len(judges.queue), enqueue_time, enqueue_time / submissions * 1e6))
+        stats = judges.queue_stats()
+        self.stdout.write('Queued sources: %d distinct, %d bytes, %d bytes stored' % (
+            stats['sources'], stats['source-bytes'], stats['stored-bytes']))
+
+        latencies = []
+        start = time.perf_counter()
+        busy = [judge for judge in fleet if judge.working]
+        while busy:
+            # A judge that finds nothing it is allowed to grade stays idle, just like in the real bridge.
+            judge = busy.pop(random.randrange(len(busy)))
+            begin = time.perf_counter()
+            judges.on_judge_free(judge, judge._working)
+            latencies.append(time.perf_counter() - begin)
+            if judge.working:
+                busy.append(judge)
+        total = time.perf_counter() - start
+
+        self.stdout.write('Processed %d judge-free events in %.3fs, %d submissions left in queue' % (
+            len(latencies), total, len(judges.queue)))
+        # Each event holds the judge list lock for its whole duration.
+        self.stdout.write('Lock held per event: mean %.2fus, p50 %.2fus, p99 %.2fus, max %.2fus' % (
+            sum(latencies) / len(latencies) * 1e6, percentile(latencies, 0.5) * 1e6,
+            percentile(latencies, 0.99) * 1e6, max(latencies) * 1e6))
@@ -0,0 +1,78 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from judge.models import Problem, ProblemGroup, ProblemSearchGram
+
+SYLLABLES = '가각간갈감강개거건결경계고공과관구국군그금기길나날남내노누다단달대도동두라러로리마만매명모무문미' \
+            '바반방배번범변보부분비사산상서선성세소수순시신실아안약양어언업여연열영오요우운원위유은을의이인일' \
+            '자작장재전정제조종주중지진차찾처체초최출치크타탐트파판편포표하학한할합해행형호화확회후'
+WORDS = ['array', 'graph', 'tree', 'string', 'query', 'sum', 'input', 'output', 'dp', 'sort']
+
+
+class Command(BaseCommand):
+    help = 'compares searching problems in Korean with the n-gram index against LIKE on every term, on synthetic ' \
+           'problems that are rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problems', type=int, default=2000, help='problems to search')
+        parser.add_argument('--length', type=int, default=300, help='words in the description of each problem')
+        parser.add_argument('--queries', type=int, default=50, help='queries to time with each method')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(3000)]
+
+        with transaction.atomic():
+            problems = self.create_problems(rng, vocabulary, options['problems'], options['length'])
+            start = time.perf_counter()
+            ProblemSearchGram.rebuild(problems)
+            indexing = time.perf_counter() - start
+
+            queries = [' '.join(self.term(rng, vocabulary) for _ in range(rng.randint(1, 2)))
+                       for _ in range(options['queries'])]
+            like, index, missed, extra = 0, 0, 0, 0
+            for query in queries:
+                start = time.perf_counter()
+                expected = set(self.like(problems, query).values_list('id', flat=True))
+                like += time.perf_counter() - start
+
+                start = time.perf_counter()
+                found = set(ProblemSearchGram.search(problems, query).values_list('id', flat=True))
+                index += time.perf_counter() - start
+
+                missed += len(expected - found)
+                extra += len(found - expected)
+
+            self.stdout.write('%d problems indexed in %.2fs with %d n-grams' % (
+                len(problems), indexing, ProblemSearchGram.objects.filter(problem__in=problems).count(),
+            ))
+            self.stdout.write('%d queries: LIKE %.2fms, index %.2fms per query (%.1fx), %d results missed, '
+                              '%d extra' % (len(queries), like / len(queries) * 1000, index / len(queries) * 1000,
+                                            like / index, missed, extra))
+            transaction.set_rollback(True)
+
+    def term(self, rng, vocabulary):
+        # A word, or the end of one, since Korean words are often followed by particles.
+        word = rng.choice(vocabulary + WORDS)
+        return word[rng.randint(0, max(len(word) - 2, 0)):]
+
+    def like(self, queryset, query):
+        for term in query.split():
+            queryset = queryset.filter(Q(code__icontains=term) | Q(name__icontains=term) |
+                                       Q(description__icontains=term))
+        return queryset
+
+    def create_problems(self, rng, vocabulary, count, length):
+        group = ProblemGroup.objects.get_or_create(name='benchmark', defaults={'full_name': 'benchmark'})[0]
+        Problem.objects.bulk_create([
+            Problem(code='benchmarksearch%d' % i, name=' '.join(rng.sample(vocabulary, 2)), group=group,
+                    description=' '.join(rng.choice(vocabulary + WORDS) for _ in range(length)),
+                    time_limit=1, memory_limit=65536, points=1)
+            for i in range(count)
+        ], batch_size=500)
+        return Problem.objects.filter(code__startswith='benchmarksearch')
@@ -0,0 +1,74 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from judge.models import Language, Problem, ProblemGroup, Profile, Submission, UserProblemPoints
+
+
+class Command(BaseCommand):
+    help = 'compares the cost per verdict of recounting the statistics of a problem with adjusting its counts, ' \
+           'on a synthetic problem that is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--submissions', type=int, default=50000, help='submissions to the problem')
+        parser.add_argument('--users', type=int, default=2000, help='users submitting to the problem')
+        parser.add_argument('--verdicts', type=int, default=200, help='verdicts to time with each method')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            problem = self.create_problem(rng, options['submissions'], options['users'])
+            submissions = list(Submission.objects.filter(problem=problem).values_list('id', 'user_id'))
+            verdicts = [(rng.choice(submissions), rng.choice([('AC', 10), ('WA', 0)]))
+                        for _ in range(options['verdicts'])]
+
+            problem._updating_stats_only = True
+            recount = self.measure(verdicts, lambda user_id: problem.update_stats())
+            # Recounting leaves the counts of users behind their submissions, so start the counts from scratch.
+            UserProblemPoints.rebuild(problem_id=problem.id)
+            problem.update_stats()
+            counts = self.measure(verdicts, lambda user_id: UserProblemPoints.update(user_id, problem.id))
+
+            stored = Problem.objects.values_list('submission_count', 'ac_submission_count', 'user_count') \
+                                    .get(id=problem.id)
+            problem.update_stats()
+            self.stdout.write('%d submissions, %d verdicts: recount %.2fms, counts %.2fms per verdict (%.1fx), '
+                              'counts %s' % (len(submissions), len(verdicts), recount * 1000, counts * 1000,
+                                             recount / counts,
+                                             'match' if stored == (problem.submission_count,
+                                                                   problem.ac_submission_count,
+                                                                   problem.user_count) else 'DIFFER'))
+            transaction.set_rollback(True)
+
+    def create_problem(self, rng, submissions, users):
+        group = ProblemGroup.objects.get_or_create(name='benchmark', defaults={'full_name': 'benchmark'})[0]
+        problem = Problem.objects.create(code='benchmark_problem_stats', name='benchmark', description='',
+                                         time_limit=1, memory_limit=65536, points=10, group=group)
+        User.objects.bulk_create([User(username='benchmark_problem_stats%d' % i) for i in range(users)])
+        Profile.objects.bulk_create([
+            Profile(user=user) for user in User.objects.filter(username__startswith='benchmark_problem_stats')
+        ])
+        profiles = list(Profile.objects.filter(user__username__startswith='benchmark_problem_stats')
+                                       .values_list('id', flat=True))
+
+        language = Language.get_python3()
+        Submission.objects.bulk_create([
+            Submission(user_id=rng.choice(profiles), problem=problem, language=language, status='D',
+                       **dict(zip(('result', 'points'), rng.choice([('AC', 10), ('WA', 0), ('TLE', 0), ('AC', 5)]))))
+            for _ in range(submissions)
+        ], batch_size=1000)
+        UserProblemPoints.rebuild(problem_id=problem.id)
+        return problem
+
+    def measure(self, verdicts, update):
+        elapsed = 0
+        for (submission_id, user_id), (result, points) in verdicts:
+            Submission.objects.filter(id=submission_id).update(result=result, points=points)
+            start = time.perf_counter()
+            update(user_id)
+            elapsed += time.perf_counter() - start
+        return elapsed / len(verdicts)
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from judge.ratings import recalculate_ratings_numpy, recalculate_ratings_python
+from judge.utils.simulation import make_contest
+
+
+class Command(BaseCommand):
+    help = 'compares the pure Python and NumPy rating implementations on synthetic contests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('participants', nargs='*', type=int, default=[1000, 10000],
+                            help='participants in each contest to rate')
+        parser.add_argument('--python-limit', type=int, default=10000,
+                            help='largest contest to also rate with the pure Python implementation')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        for participants in options['participants']:
+            contest = make_contest(participants, options['seed'])
+            numpy_time, (numpy_rating, numpy_mean, _) = self.measure(recalculate_ratings_numpy, contest)
+            line = '%6d participants: numpy %8.3fs' % (participants, numpy_time)
+            if participants <= options['python_limit']:
+                python_time, (python_rating, python_mean, _) = self.measure(recalculate_ratings_python, contest)
+                line += ', python %8.3fs (%.1fx), max mean difference %.2e, ratings %s' % (
+                    python_time, python_time / numpy_time,
+                    max(abs(a - b) for a, b in zip(python_mean, numpy_mean)),
+                    'identical' if python_rating == numpy_rating else 'DIFFERENT')
+            self.stdout.write(line)
+
+    def measure(self, function, contest):
+        start = time.perf_counter()
+        result = function(*contest)
+        return time.perf_counter() - start, result
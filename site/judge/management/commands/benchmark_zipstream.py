@@ -0,0 +1,68 @@
+import io
+import random
+import time
+import tracemalloc
+import zipfile
+
+from django.core.management.base import BaseCommand
+
+from judge.utils.iterator import chunk
+from judge.utils.zipstream import stream_zip
+
+WORDS = ['int', 'main', 'for', 'while', 'return', 'if', 'else', 'print', 'input', 'range', 'vector', 'std', 'cin',
+         'cout', 'def', 'sum', 'len', 'answer', 'count', 'result', '=', '+', '(', ')', '{', '}', ';', '0', '1', 'i']
+
+
+class Command(BaseCommand):
+    help = 'compares the memory used to build a contest source archive in memory with streaming it, on synthetic ' \
+           'sources'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='users in the contest')
+        parser.add_argument('--problems', type=int, default=10, help='problems each user submitted to')
+        parser.add_argument('--size', type=int, default=4096, help='average source size in bytes')
+        parser.add_argument('--batch', type=int, default=200, help='submissions read from the database at once')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stdout.write('%d users x %d problems' % (options['users'], options['problems']))
+        self.measure('buffered', self.buffered)
+        self.measure('streaming', self.streaming)
+
+    def make_submissions(self):
+        rng = random.Random(self.options['seed'])
+        size = self.options['size']
+        for user in range(self.options['users']):
+            for problem in range(self.options['problems']):
+                words = rng.randint(size // 2, size * 2) // 4
+                yield 'user%d_User/Problem_%d.py' % (user, problem), \
+                    ' '.join(rng.choice(WORDS) for _ in range(words)) + '\n'
+
+    def buffered(self):
+        # The whole queryset is evaluated, the archive is built in memory and then copied into the response.
+        files = list(self.make_submissions())
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for name, source in files:
+                zip_file.writestr(name, source)
+        buffer.seek(0)
+        return len(buffer.read())
+
+    def read_in_batches(self):
+        for batch in chunk(self.make_submissions(), self.options['batch']):
+            yield from batch
+
+    def streaming(self):
+        # Sources are read in batches and every chunk is sent to the client before the next file is compressed.
+        return sum(len(data) for data in stream_zip(self.read_in_batches()))
+
+    def measure(self, name, build):
+        tracemalloc.start()
+        start = time.perf_counter()
+        size = build()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.stdout.write('%-10s %8.2f MB archive, %8.2f MB peak, %6.2fs' %
+                          (name, size / 2 ** 20, peak / 2 ** 20, elapsed))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from judge.models import Profile
+from judge.utils.problems import check_problem_status_cache
+
+
+class Command(BaseCommand):
+    help = 'checks the cached problems solved and attempted by users against their submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', help='only check these users')
+        parser.add_argument('--fix', action='store_true', help='remove the cached problems that are wrong')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.select_related('user', 'current_contest')
+        if options['users']:
+            profiles = profiles.filter(user__username__in=options['users'])
+
+        stale = 0
+        for profile in profiles.iterator():
+            for key in check_problem_status_cache(profile, fix=options['fix']):
+                self.stdout.write('%s: %s is stale' % (profile.user.username, key))
+                stale += 1
+        self.stdout.write('%d stale sets %s' % (stale, 'removed' if options['fix'] else 'found'))
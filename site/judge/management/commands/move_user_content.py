@@ -1,7 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from judge.models import Comment, CommentVote, ContestParticipation, Profile, Submission
+from judge.models import Comment, CommentVote, ContestParticipation, Profile, Submission, UserProblemPoints
 
 
 class Command(BaseCommand):
@@ -27,5 +27,6 @@ class Command(BaseCommand):
 
         with transaction.atomic():
             Submission.objects.filter(user=source).update(user=target)
+            UserProblemPoints.rebuild(user__in=[source, target])
             Comment.objects.filter(author=source).update(author=target)
             CommentVote.objects.filter(voter=source).update(voter=target)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from judge.models import Problem, ProblemSearchGram
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the n-gram index used to search problems in Korean and other CJK languages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('problems', nargs='*', help='only reindex these problems')
+
+    def handle(self, *args, **options):
+        problems = Problem.objects.all()
+        if options['problems']:
+            problems = problems.filter(code__in=options['problems'])
+        ProblemSearchGram.rebuild(problems)
+        self.stdout.write('%d problems indexed with %d n-grams' % (
+            problems.count(), ProblemSearchGram.objects.filter(problem__in=problems).count(),
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from judge.models import Profile, UserProblemPoints
+
+
+class Command(BaseCommand):
+    help = 'rebuilds the best points of every user on every problem from their submissions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('users', nargs='*', help='only rebuild the points of these users')
+        parser.add_argument('--no-calculate', action='store_false', dest='calculate',
+                            help='do not recalculate the points of the users afterwards')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.all()
+        if options['users']:
+            profiles = profiles.filter(user__username__in=options['users'])
+            UserProblemPoints.rebuild(user__in=profiles)
+        else:
+            UserProblemPoints.rebuild()
+
+        if options['calculate']:
+            for profile in profiles.iterator():
+                profile._updating_stats_only = True
+                profile.calculate_points()
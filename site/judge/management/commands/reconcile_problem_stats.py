@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, Q
+
+from judge.models import Problem, Submission, UserProblemPoints
+
+
+class Command(BaseCommand):
+    help = 'checks the submission counts of problems against their submissions, which are otherwise only adjusted ' \
+           'by the change of each graded or deleted submission'
+
+    def add_arguments(self, parser):
+        parser.add_argument('problems', nargs='*', help='only check these problems')
+        parser.add_argument('--fix', action='store_true', help='recalculate the problems whose counts are wrong')
+
+    def handle(self, *args, **options):
+        problems = Problem.objects.only('id', 'code', 'submission_count', 'ac_submission_count', 'user_count')
+        submissions = Submission.objects.filter(user__is_unlisted=False)
+        if options['problems']:
+            problems = problems.filter(code__in=options['problems'])
+            submissions = submissions.filter(problem__code__in=options['problems'])
+
+        accepted = Q(result='AC', points__gte=F('problem__points'))
+        actual = {
+            data['problem_id']: (data['submissions'], data['accepted'], data['users'])
+            for data in submissions.values('problem_id').annotate(
+                submissions=Count('id'), accepted=Count('id', filter=accepted),
+                users=Count('user_id', filter=accepted, distinct=True),
+            ).order_by()
+        }
+
+        wrong = 0
+        for problem in problems.iterator():
+            counts = (problem.submission_count, problem.ac_submission_count, problem.user_count)
+            expected = actual.get(problem.id, (0, 0, 0))
+            if counts == expected:
+                continue
+            self.stdout.write('%s: %d submissions, %d accepted, %d users, expected %d, %d, %d' %
+                              ((problem.code,) + counts + expected))
+            wrong += 1
+            if options['fix']:
+                UserProblemPoints.rebuild(problem_id=problem.id)
+                problem = Problem.objects.get(id=problem.id)
+                problem._updating_stats_only = True
+                problem.update_stats()
+        self.stdout.write('%d problems with wrong counts %s' % (wrong, 'fixed' if options['fix'] else 'found'))
@@ -0,0 +1,33 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from judge.bridge.dispatch_policy import DISPATCH_POLICIES
+from judge.bridge.dispatch_replay import Replay, judge_speeds, read_log
+from judge.bridge.simulation import percentile
+
+
+class Command(BaseCommand):
+    help = 'replays the submissions graded in a judge.json.bridge log through every dispatch policy, ' \
+           'to compare their queue waits'
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='log file written by the judge.json.bridge logger')
+        parser.add_argument('-p', '--policy', action='append', choices=sorted(DISPATCH_POLICIES),
+                            help='policy to replay, may be repeated (default: all)')
+
+    def handle(self, *args, **options):
+        with open(options['log']) as f:
+            submissions = read_log(f)
+        if not submissions:
+            self.stdout.write('No graded submissions found in %s' % options['log'])
+            return
+        speeds = judge_speeds(submissions)
+        self.stdout.write('Replaying %d submissions on %d judges' % (len(submissions), len(speeds)))
+
+        logging.disable(logging.CRITICAL)
+        for name in options['policy'] or sorted(DISPATCH_POLICIES):
+            waits = Replay(submissions, speeds, DISPATCH_POLICIES[name]).run()
+            self.stdout.write('%-14s queue wait: mean %.3fs, p50 %.3fs, p99 %.3fs, max %.3fs (%d dispatched)' % (
+                name, sum(waits) / len(waits), percentile(waits, 0.5), percentile(waits, 0.99), max(waits),
+                len(waits)))
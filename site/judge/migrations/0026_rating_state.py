@@ -0,0 +1,44 @@
+import jsonfield.fields
+from django.db import migrations, models
+
+RATING_HISTORY_LIMIT = 50
+
+
+def fill_rating_state(apps, schema_editor):
+    Rating = apps.get_model('judge', 'Rating')
+
+    updated = []
+    user_id, times_ranked, history = None, 0, []
+    for rating in Rating.objects.order_by('user_id', 'contest__end_time').only('id', 'user_id', 'performance') \
+            .iterator():
+        if rating.user_id != user_id:
+            user_id, times_ranked, history = rating.user_id, 0, []
+        times_ranked += 1
+        history = [rating.performance] + history[:RATING_HISTORY_LIMIT - 1]
+        rating.times_ranked, rating.performance_history = times_ranked, history
+        updated.append(rating)
+        if len(updated) >= 1000:
+            Rating.objects.bulk_update(updated, ['times_ranked', 'performance_history'])
+            updated = []
+    Rating.objects.bulk_update(updated, ['times_ranked', 'performance_history'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0025_merge_20260126_1755'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='times_ranked',
+            field=models.IntegerField(default=0, help_text='Number of rated contests up to and including this one.', verbose_name='times ranked'),
+        ),
+        migrations.AddField(
+            model_name='rating',
+            name='performance_history',
+            field=jsonfield.fields.JSONField(default=list, help_text='Performances in this contest and the ones before it, most recent first, used to rate the next contest.', verbose_name='performance history'),
+        ),
+        migrations.RunPython(fill_rating_state, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:23
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q
+import django.db.models.deletion
+
+
+def fill_user_problem_points(apps, schema_editor):
+    Submission = apps.get_model('judge', 'Submission')
+    UserProblemPoints = apps.get_model('judge', 'UserProblemPoints')
+
+    best = Submission.objects.values('user_id', 'problem_id').annotate(
+        best_points=Max('points'),
+        solved=Count('id', filter=Q(result='AC', case_points__gte=F('case_total'))),
+    ).filter(Q(best_points__isnull=False) | Q(solved__gt=0)).order_by()
+
+    batch = []
+    for data in best.iterator():
+        batch.append(UserProblemPoints(user_id=data['user_id'], problem_id=data['problem_id'],
+                                       points=data['best_points'] or 0, is_solved=data['solved'] > 0))
+        if len(batch) >= 1000:
+            UserProblemPoints.objects.bulk_create(batch)
+            batch = []
+    UserProblemPoints.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0026_rating_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProblemPoints',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.FloatField(default=0, verbose_name='best points')),
+                ('is_solved', models.BooleanField(default=False, verbose_name='solved')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_points', to='judge.problem', verbose_name='problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_points', to='judge.profile', verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'user problem points',
+                'verbose_name_plural': 'user problem points',
+                'unique_together': {('user', 'problem')},
+            },
+        ),
+        migrations.RunPython(fill_user_problem_points, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:37
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q, Sum
+
+
+def fill_stats_counts(apps, schema_editor):
+    Problem = apps.get_model('judge', 'Problem')
+    Submission = apps.get_model('judge', 'Submission')
+    UserProblemPoints = apps.get_model('judge', 'UserProblemPoints')
+
+    # Rows are now kept for as long as the user has any submission to the problem.
+    counts = Submission.objects.values('user_id', 'problem_id').annotate(
+        best_points=Max('points'),
+        solved=Count('id', filter=Q(result='AC', case_points__gte=F('case_total'))),
+        submissions=Count('id'),
+        accepted=Count('id', filter=Q(result='AC', points__gte=F('problem__points'))),
+    ).order_by()
+
+    UserProblemPoints.objects.all().delete()
+    batch = []
+    for data in counts.iterator():
+        batch.append(UserProblemPoints(user_id=data['user_id'], problem_id=data['problem_id'],
+                                       points=data['best_points'] or 0, is_solved=data['solved'] > 0,
+                                       submission_count=data['submissions'], ac_count=data['accepted']))
+        if len(batch) >= 1000:
+            UserProblemPoints.objects.bulk_create(batch)
+            batch = []
+    UserProblemPoints.objects.bulk_create(batch)
+
+    problems = UserProblemPoints.objects.filter(user__is_unlisted=False).values('problem_id').annotate(
+        submissions=Sum('submission_count'), accepted=Sum('ac_count'), users=Count('id', filter=Q(ac_count__gt=0)),
+    ).order_by()
+    for data in problems.iterator():
+        Problem.objects.filter(id=data['problem_id']).update(
+            submission_count=data['submissions'], ac_submission_count=data['accepted'], user_count=data['users'],
+            ac_rate=100.0 * data['accepted'] / data['submissions'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0027_userproblempoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='ac_submission_count',
+            field=models.IntegerField(default=0, help_text='The number of accepted submissions by listed users.', verbose_name='number of accepted submissions'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='submission_count',
+            field=models.IntegerField(default=0, help_text='The number of submissions by listed users.', verbose_name='number of submissions'),
+        ),
+        migrations.AddField(
+            model_name='userproblempoints',
+            name='ac_count',
+            field=models.IntegerField(default=0, help_text='Accepted submissions with full points, as counted in the problem statistics.', verbose_name='number of accepted submissions'),
+        ),
+        migrations.AddField(
+            model_name='userproblempoints',
+            name='submission_count',
+            field=models.IntegerField(default=0, verbose_name='number of submissions'),
+        ),
+        migrations.RunPython(fill_stats_counts, migrations.RunPython.noop),
+    ]
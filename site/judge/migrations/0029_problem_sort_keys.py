@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:45
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def fill_sort_keys(apps, schema_editor):
+    Problem = apps.get_model('judge', 'Problem')
+
+    types = {}
+    for problem_id, name in Problem.types.through.objects.values_list('problem_id', 'problemtype__full_name'):
+        types[problem_id] = min(types.get(problem_id, name), name)
+    authors = defaultdict(list)
+    author_names = Problem.authors.through.objects.values_list('problem_id', 'profile__user__first_name').order_by('id')
+    for problem_id, name in author_names:
+        authors[problem_id].append(name)
+
+    for problem_id in types.keys() | authors.keys():
+        Problem.objects.filter(id=problem_id).update(
+            type_sort_key=types.get(problem_id, '')[:100],
+            authors_sort_key=', '.join(authors[problem_id])[:150],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0028_problem_stats_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='authors_sort_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='The names of the authors, to sort the problem list.', max_length=150, verbose_name='author names'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='type_sort_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='The name of the first type, to sort the problem list.', max_length=100, verbose_name='first problem type'),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+    ]
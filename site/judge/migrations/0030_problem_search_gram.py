@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-18 21:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from judge.models.problem_search import get_problem_grams
+from judge.utils.iterator import chunk
+
+
+def build_search_index(apps, schema_editor):
+    Problem = apps.get_model('judge', 'Problem')
+    ProblemSearchGram = apps.get_model('judge', 'ProblemSearchGram')
+
+    texts = Problem.objects.values_list('id', 'code', 'name', 'description').iterator()
+    rows = (ProblemSearchGram(problem_id=problem_id, gram=gram, weight=weight)
+            for problem_id, code, name, description in texts
+            for gram, weight in get_problem_grams(code, name, description).items())
+    for batch in chunk(rows, 1000):
+        ProblemSearchGram.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('judge', '0029_problem_sort_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProblemSearchGram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3, verbose_name='n-gram')),
+                ('weight', models.IntegerField(help_text='The occurrences of the n-gram, weighted by where they are in the problem.', verbose_name='weight')),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_grams', to='judge.problem', verbose_name='problem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['gram', 'problem', 'weight'], name='judge_probl_gram_447f21_idx')],
+                'verbose_name': 'problem search n-gram',
+                'verbose_name_plural': 'problem search n-grams',
+            },
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
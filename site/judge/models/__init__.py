@@ -14,10 +14,12 @@ from judge.models.problem import LanguageLimit, License, Problem, ProblemClarifi
     TranslatedProblemQuerySet
 from judge.models.problem_data import CHECKERS, ProblemData, ProblemTestCase, problem_data_storage, \
     problem_directory_file
+from judge.models.problem_search import ProblemSearchGram
 # from judge.models.profile import Class, Organization, OrganizationRequest, Profile, WebAuthnCredential
 from judge.models.profile import Profile, WebAuthnCredential, Department, Subject
 from judge.models.runtime import Judge, Language, RuntimeVersion
-from judge.models.submission import SUBMISSION_RESULT, Submission, SubmissionSource, SubmissionTestCase
+from judge.models.submission import SUBMISSION_RESULT, Submission, SubmissionSource, SubmissionTestCase, \
+    UserProblemPoints
 from judge.models.ticket import Ticket, TicketMessage
 from judge.models.patch_note import PatchNote
 
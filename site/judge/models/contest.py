@@ -1,3 +1,4 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
 from django.db import models, transaction
@@ -15,6 +16,7 @@ JPLAG_LANG_JAVA = 'java'
 JPLAG_LANG_PYTHON = 'python3'
 
 from judge import contest_format
+from judge.caching import SUBMISSION_VISIBILITY_CACHE_TIMEOUT, submission_visibility_key
 from judge.models.problem import Problem
 # from judge.models.profile import Class, Organization, Profile
 from judge.models.profile import Profile, Subject
@@ -335,7 +337,7 @@ class Contest(models.Model):
 
     def update_user_count(self):
         self.user_count = self.users.filter(virtual=0).count()
-        self.save()
+        self.save(update_fields=['user_count'])
 
     update_user_count.alters_data = True
 
@@ -486,13 +488,86 @@ class Contest(models.Model):
             queryset = queryset.filter(q)
         return queryset.distinct()
 
+    @classmethod
+    def get_submission_visibility(cls, user):
+        """
+        Splits the contests a user took part in between those where they can see every submission, because
+        can_see_full_scoreboard() holds, and those where they can only see their own.
+
+        :return: A tuple of frozensets of contest IDs, the visible contests and the own-only contests.
+        """
+        key = submission_visibility_key(user.profile.id)
+        visibility = cache.get(key)
+        if visibility is None:
+            visibility, timeout = cls._get_submission_visibility(user.profile)
+            cache.set(key, visibility, timeout)
+        if user.has_perm('judge.see_private_contest') or user.has_perm('judge.edit_all_contest'):
+            return visibility[0] | visibility[1], frozenset()
+        return visibility
+
+    @classmethod
+    def _get_submission_visibility(cls, profile):
+        participations = list(ContestParticipation.objects.filter(user=profile, virtual=ContestParticipation.LIVE)
+                                                          .select_related('contest'))
+        contest_ids = [participation.contest_id for participation in participations]
+
+        def related(relation):
+            return set(relation.through.objects.filter(profile=profile, contest_id__in=contest_ids)
+                                               .values_list('contest_id', flat=True))
+
+        editors = related(cls.authors) | related(cls.curators)
+        testers = related(cls.testers)
+        spectators = related(cls.spectators)
+        viewers = related(cls.view_contest_scoreboard)
+
+        now = timezone.now()
+        visible, own = set(), set()
+        changes = []
+        for participation in participations:
+            contest = participation.contest
+            if (contest.show_scoreboard or contest.id in editors or contest.id in viewers or
+                    (contest.tester_see_scoreboard and contest.id in testers) or
+                    (contest.started and contest.id in spectators) or
+                    (contest.scoreboard_visibility == cls.SCOREBOARD_AFTER_PARTICIPATION and participation.ended)):
+                visible.add(contest.id)
+            else:
+                own.add(contest.id)
+                # The scoreboard may become visible once the contest or the participation starts or ends.
+                changes += [time for time in (contest.start_time, contest.end_time, participation.end_time)
+                            if time is not None and time > now]
+
+        timeout = SUBMISSION_VISIBILITY_CACHE_TIMEOUT
+        if changes:
+            timeout = min(timeout, int((min(changes) - now).total_seconds()) + 1)
+        return (frozenset(visible), frozenset(own)), timeout
+
+    def recompute_results(self, participations=None):
+        """
+        Recomputes the results of every participation, letting the contest format compute them together.
+
+        :param participations: A queryset of the participations of this contest to recompute, all of them by default.
+        """
+        with transaction.atomic():
+            participations = list(self.users.all() if participations is None else participations)
+            for participation in participations:
+                participation.contest = self
+                if participation.problem_first_solved is None:
+                    participation.problem_first_solved = {}
+            self.format.update_participations(participations)
+            for participation in participations:
+                participation.apply_disqualification()
+        return participations
+    recompute_results.alters_data = True
+
     def rate(self):
         with transaction.atomic():
             Rating.objects.filter(contest__end_time__range=(self.end_time, self._now)).delete()
+            states = {}
             for contest in Contest.objects.filter(
                 is_rated=True, end_time__range=(self.end_time, self._now),
             ).order_by('end_time'):
-                rate_contest(contest)
+                # Rating states are carried from one contest to the next instead of being read back.
+                rate_contest(contest, states)
 
     class Meta:
         permissions = (
@@ -538,14 +613,32 @@ class ContestParticipation(models.Model):
                 
             # 원래 방식대로 결과 계산 (점수, 최대 점수, 총 결과 데이터 등)
             self.contest.format.update_participation(self)
-            
-            if self.is_disqualified:
-                self.score = -9999
-                self.cumtime = 0
-                self.tiebreaker = 0
-                self.save(update_fields=['score', 'cumtime', 'tiebreaker'])
+            self.apply_disqualification()
     recompute_results.alters_data = True
 
+    def apply_disqualification(self):
+        if self.is_disqualified:
+            self.score = -9999
+            self.cumtime = 0
+            self.tiebreaker = 0
+            self.save(update_fields=['score', 'cumtime', 'tiebreaker'])
+    apply_disqualification.alters_data = True
+
+    def update_problem_results(self, problem_ids):
+        """
+        Updates results after submissions to the given contest problems were graded. Only those problems are
+        recomputed if the contest format supports it, otherwise this falls back to recompute_results.
+        """
+        with transaction.atomic():
+            if self.is_disqualified or self.format_data is None:
+                self.recompute_results()
+                return
+            if self.problem_first_solved is None:
+                self.problem_first_solved = {}
+            if not self.contest.format.update_participation_problems(self, problem_ids):
+                self.recompute_results()
+    update_problem_results.alters_data = True
+
     def set_disqualified(self, disqualified):
         self.is_disqualified = disqualified
         self.recompute_results()
@@ -632,6 +725,16 @@ class ContestProblem(models.Model):
                                           validators=[MinValueOrNoneValidator(1, _('Why include a problem you '
                                                                                    "can't submit to?"))])
 
+    @classmethod
+    def get_cached(cls, contest_id, problem_id):
+        """The problem in a contest, or None if it isn't in the contest, cached until the contest problem changes."""
+        key = 'contest_problem:%d:%d' % (contest_id, problem_id)
+        result = cache.get(key)
+        if result is None:
+            result = cls.objects.filter(contest_id=contest_id, problem_id=problem_id).first() or False
+            cache.set(key, result)
+        return result or None
+
     class Meta:
         unique_together = ('problem', 'contest')
         verbose_name = _('contest problem')
@@ -666,6 +769,11 @@ class Rating(models.Model):
     mean = models.FloatField(verbose_name=_('raw rating'))
     performance = models.FloatField(verbose_name=_('contest performance'))
     last_rated = models.DateTimeField(db_index=True, verbose_name=_('last rated'))
+    times_ranked = models.IntegerField(verbose_name=_('times ranked'), default=0,
+                                       help_text=_('Number of rated contests up to and including this one.'))
+    performance_history = JSONField(verbose_name=_('performance history'), default=list,
+                                    help_text=_('Performances in this contest and the ones before it, most recent '
+                                                'first, used to rate the next contest.'))
 
     class Meta:
         unique_together = ('user', 'contest')
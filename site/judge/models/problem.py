@@ -1,3 +1,4 @@
+from collections import defaultdict
 from enum import IntEnum
 from operator import attrgetter
 from cryptography.fernet import Fernet
@@ -9,7 +10,7 @@ from django.contrib.contenttypes.fields import GenericRelation
 from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator, RegexValidator
-from django.db import models
+from django.db import models, transaction
 from django.db.models import CASCADE, F, FilteredRelation, Q, SET_NULL
 from django.db.models.functions import Coalesce
 from django.urls import reverse
@@ -217,6 +218,16 @@ class Problem(models.Model):
     user_count = models.IntegerField(verbose_name=_('number of users'), default=0,
                                      help_text=_('The number of users who solved the problem.'))
     ac_rate = models.FloatField(verbose_name=_('solve rate'), default=0)
+    submission_count = models.IntegerField(verbose_name=_('number of submissions'), default=0,
+                                           help_text=_('The number of submissions by listed users.'))
+    ac_submission_count = models.IntegerField(verbose_name=_('number of accepted submissions'), default=0,
+                                              help_text=_('The number of accepted submissions by listed users.'))
+    type_sort_key = models.CharField(verbose_name=_('first problem type'), max_length=100, blank=True, db_index=True,
+                                     editable=False,
+                                     help_text=_('The name of the first type, to sort the problem list.'))
+    authors_sort_key = models.CharField(verbose_name=_('author names'), max_length=150, blank=True, db_index=True,
+                                        editable=False,
+                                        help_text=_('The names of the authors, to sort the problem list.'))
     is_full_markup = models.BooleanField(verbose_name=_('allow full markdown access'), default=False)
     submission_source_visibility_mode = models.CharField(verbose_name='제품 소스', max_length=1,
                                                          default=SubmissionSourceAccess.FOLLOW,
@@ -453,15 +464,58 @@ class Problem(models.Model):
         all_queryset = self.submission_set.filter(user__is_unlisted=False)
         ac_queryset = all_queryset.filter(points__gte=self.points, result='AC')
         self.user_count = ac_queryset.values('user').distinct().count()
-        submissions = all_queryset.count()
-        if submissions:
-            self.ac_rate = 100.0 * ac_queryset.count() / submissions
+        self.submission_count = all_queryset.count()
+        self.ac_submission_count = ac_queryset.count()
+        if self.submission_count:
+            self.ac_rate = 100.0 * self.ac_submission_count / self.submission_count
         else:
             self.ac_rate = 0
         self.save()
 
     update_stats.alters_data = True
 
+    @classmethod
+    def add_stats(cls, problem_id, submissions=0, ac_submissions=0, users=0):
+        """
+        Adjusts the statistics of a problem by a change in its counts, without going over all of its submissions.
+        update_stats recalculates them in full.
+        """
+        if not (submissions or ac_submissions or users):
+            return
+        with transaction.atomic():
+            problems = cls.objects.filter(id=problem_id)
+            problems.update(submission_count=F('submission_count') + submissions,
+                            ac_submission_count=F('ac_submission_count') + ac_submissions,
+                            user_count=F('user_count') + users)
+            for submission_count, ac_submission_count in problems.values_list('submission_count',
+                                                                              'ac_submission_count'):
+                problems.update(ac_rate=100.0 * ac_submission_count / submission_count if submission_count else 0)
+
+    @classmethod
+    def update_sort_keys(cls, problem_ids):
+        """
+        Recalculate the names the problem list sorts the problems by, after their types or authors changed.
+
+        :param problem_ids: The IDs of the problems to update, or a queryset of them.
+        """
+        problem_ids = set(problem_ids)
+        types = {}
+        type_names = cls.types.through.objects.filter(problem_id__in=problem_ids) \
+            .values_list('problem_id', 'problemtype__full_name')
+        for problem_id, name in type_names:
+            types[problem_id] = min(types.get(problem_id, name), name)
+        authors = defaultdict(list)
+        author_names = cls.authors.through.objects.filter(problem_id__in=problem_ids) \
+            .values_list('problem_id', 'profile__user__first_name').order_by('id')
+        for problem_id, name in author_names:
+            authors[problem_id].append(name)
+
+        for problem_id in problem_ids:
+            cls.objects.filter(id=problem_id).update(
+                type_sort_key=types.get(problem_id, '')[:100],
+                authors_sort_key=', '.join(authors[problem_id])[:150],
+            )
+
     def _get_limits(self, key):
         global_limit = getattr(self, key)
         limits = {limit['language_id']: (limit['language__name'], limit[key])
@@ -504,6 +558,18 @@ class Problem(models.Model):
         cache.set(key, result)
         return result
 
+    @property
+    def submission_restrictions(self):
+        # The IDs of the allowed languages and of the banned users, to check submissions without querying them.
+        key = 'problem_submit:%d' % self.id
+        result = cache.get(key)
+        if result is not None:
+            return result
+        result = (frozenset(self.allowed_languages.values_list('id', flat=True)),
+                  frozenset(self.banned_users.values_list('id', flat=True)))
+        cache.set(key, result)
+        return result
+
     @property
     def markdown_style(self):
         return 'problem-full' if self.is_full_markup else 'problem'
@@ -0,0 +1,130 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+
+from django.db import models, transaction
+from django.db.models import CASCADE, Case, FloatField, Value, When
+from django.utils.translation import gettext_lazy as _
+
+from judge.models.problem import Problem
+from judge.utils.iterator import chunk
+
+__all__ = ['ProblemSearchGram', 'get_problem_grams', 'has_cjk']
+
+# Hangul, kana and CJK ideographs. Their words aren't separated by spaces, so runs of them are indexed as bigrams.
+CJK_CHARACTERS = (r'\u1100-\u11ff\u2e80-\u2fdf\u3005\u3007\u3021-\u3029\u3038-\u303b\u3040-\u30ff\u3130-\u318f'
+                  r'\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7a3\uf900-\ufaff\U00020000-\U0002fa1f')
+CJK_GRAM_SIZE = 2
+# Other words are indexed as trigrams.
+GRAM_SIZE = 3
+# An occurrence in the code or the name of a problem counts as much as this many in its description.
+TITLE_WEIGHT = 10
+# Only a page of the best results is ranked, the rest of the matching problems come after them. Every ranked result
+# adds a branch to the expression the database sorts by.
+RANKED_RESULTS = 20
+
+_cjk_re = re.compile('[%s]' % CJK_CHARACTERS)
+_token_re = re.compile(r'[%s]+|[^\W%s]+' % (CJK_CHARACTERS, CJK_CHARACTERS))
+
+
+def has_cjk(text):
+    return _cjk_re.search(text) is not None
+
+
+def _tokens(text):
+    return _token_re.findall(unicodedata.normalize('NFKC', text).lower())
+
+
+def _gram_size(token):
+    return CJK_GRAM_SIZE if _cjk_re.match(token) else GRAM_SIZE
+
+
+def _token_grams(token):
+    # The suffixes shorter than a gram, at the end of the token, let shorter terms be found as prefixes of grams.
+    size = _gram_size(token)
+    return [token[i:i + size] for i in range(len(token))]
+
+
+def get_problem_grams(code, name, description):
+    """
+    Splits the text of a problem into the n-grams it is indexed by.
+
+    :return: A Counter of the n-grams, weighted by where they occur.
+    """
+    grams = Counter()
+    for text, weight in ((code, TITLE_WEIGHT), (name, TITLE_WEIGHT), (description or '', 1)):
+        for token in _tokens(text):
+            for gram in _token_grams(token):
+                grams[gram] += weight
+    return grams
+
+
+class ProblemSearchGram(models.Model):
+    problem = models.ForeignKey(Problem, verbose_name=_('problem'), related_name='search_grams', on_delete=CASCADE)
+    gram = models.CharField(verbose_name=_('n-gram'), max_length=3)
+    weight = models.IntegerField(verbose_name=_('weight'), help_text=_('The occurrences of the n-gram, weighted by '
+                                                                       'where they are in the problem.'))
+
+    @classmethod
+    def rebuild(cls, problems, batch_size=1000):
+        """
+        Reindex the code, name and description of some problems.
+
+        :param problems: A queryset of the problems to reindex.
+        """
+        with transaction.atomic():
+            cls.objects.filter(problem__in=problems).delete()
+            texts = problems.values_list('id', 'code', 'name', 'description').iterator()
+            rows = (cls(problem_id=problem_id, gram=gram, weight=weight)
+                    for problem_id, code, name, description in texts
+                    for gram, weight in get_problem_grams(code, name, description).items())
+            for batch in chunk(rows, batch_size):
+                cls.objects.bulk_create(batch)
+
+    @classmethod
+    def search(cls, queryset, query):
+        """
+        Filter problems to those that contain every term of a query in their code, name or description, ranked by how
+        often and where the rarer terms occur.
+
+        Terms at least a gram long must contain all of their grams, and shorter ones must start some gram. This finds
+        every problem that contains the terms, and rarely others that only contain the grams.
+        """
+        exact, prefixes = set(), set()
+        for token in _tokens(query):
+            size = _gram_size(token)
+            if len(token) >= size:
+                exact.update(token[i:i + size] for i in range(len(token) - size + 1))
+            else:
+                prefixes.add(token)
+        if not exact and not prefixes:
+            return queryset
+
+        weights = defaultdict(lambda: defaultdict(int))
+        for gram, problem_id, weight in cls.objects.filter(gram__in=exact).values_list('gram', 'problem_id', 'weight'):
+            if gram in exact:
+                weights[gram][problem_id] += weight
+        for prefix in prefixes:
+            for problem_id, weight in cls.objects.filter(gram__startswith=prefix).values_list('problem_id', 'weight'):
+                weights[prefix][problem_id] += weight
+
+        terms = exact | prefixes
+        matches = set.intersection(*(set(weights[term]) for term in terms))
+        if not matches:
+            return queryset.none()
+
+        total = Problem.objects.count()
+        scores = {problem_id: sum(weights[term][problem_id] * math.log(1 + total / len(weights[term]))
+                                  for term in terms) for problem_id in matches}
+        ranked = sorted(matches, key=scores.get, reverse=True)[:RANKED_RESULTS]
+        return queryset.filter(id__in=matches).annotate(relevance=Case(
+            *[When(id=problem_id, then=Value(scores[problem_id])) for problem_id in ranked],
+            default=Value(0.0), output_field=FloatField(),
+        )).order_by('-relevance')
+
+    class Meta:
+        # Searching only reads the index, without looking up the rows.
+        indexes = [models.Index(fields=['gram', 'problem', 'weight'])]
+        verbose_name = _('problem search n-gram')
+        verbose_name_plural = _('problem search n-grams')
@@ -12,7 +12,7 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.db import models
-from django.db.models import F, Max, Q, UniqueConstraint
+from django.db.models import F, Q, UniqueConstraint
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.encoding import force_bytes
@@ -252,20 +252,15 @@ class Profile(models.Model):
 
     def calculate_points(self, table=_pp_table):
         from judge.models import Problem
-        public_problems = Problem.get_public_problems()
-        data = (
-            public_problems.filter(submission__user=self, submission__points__isnull=False)
-                           .annotate(max_points=Max('submission__points')).order_by('-max_points')
-                           .values_list('max_points', flat=True).filter(max_points__gt=0)
+        best = list(
+            Problem.get_public_problems().filter(user_points__user=self)
+                                         .values_list('user_points__points', 'user_points__is_solved'),
         )
+        data = sorted((points for points, _ in best if points > 0), reverse=True)
         bonus_function = settings.DMOJ_PP_BONUS_FUNCTION
         points = sum(data)
         entries = min(len(data), len(table))
-        problems = (
-            public_problems.filter(submission__user=self, submission__result='AC',
-                                   submission__case_points__gte=F('submission__case_total'))
-            .values('id').distinct().count()
-        )
+        problems = sum(1 for _, solved in best if solved)
         pp = sum(map(mul, table[:entries], data[:entries])) + bonus_function(problems)
         if self.points != points or problems != self.problem_count or self.performance_points != pp:
             self.points = points
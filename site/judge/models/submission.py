@@ -3,20 +3,22 @@ import hmac
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q, Sum
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 from reversion import revisions
 
-from judge.judgeapi import abort_submission, judge_submission
+from judge.judgeapi import abort_submission, judge_submission, judge_submissions
 from judge.models.problem import Problem, SubmissionSourceAccess
 from judge.models.profile import Profile
 from judge.models.runtime import Language
+from judge.utils.iterator import chunk
 from judge.utils.unicode import utf8bytes
 
-__all__ = ['SUBMISSION_RESULT', 'Submission', 'SubmissionSource', 'SubmissionTestCase']
+__all__ = ['SUBMISSION_RESULT', 'Submission', 'SubmissionSource', 'SubmissionTestCase', 'UserProblemPoints']
 
 SUBMISSION_RESULT = (
     ('AC', _('Accepted')),
@@ -131,6 +133,18 @@ class Submission(models.Model):
 
     judge.alters_data = True
 
+    @classmethod
+    def judge_many(cls, submissions, rejudge=False, force_judge=False, rejudge_user=None, **kwargs):
+        submissions = [submission for submission in submissions if force_judge or not submission.is_locked]
+        if rejudge:
+            for submission in submissions:
+                with revisions.create_revision(manage_manually=True):
+                    if rejudge_user:
+                        revisions.set_user(rejudge_user)
+                    revisions.set_comment('Rejudged')
+                    revisions.add_to_revision(submission)
+        return judge_submissions(submissions, rejudge=rejudge, **kwargs)
+
     def abort(self):
         abort_submission(self)
 
@@ -168,7 +182,7 @@ class Submission(models.Model):
 
         return False
 
-    def update_contest(self):
+    def update_contest(self, recompute=True):
         try:
             contest = self.contest
         except AttributeError:
@@ -246,8 +260,13 @@ class Submission(models.Model):
         #     ''', [total_score, participation.id])
             
         #     logger.debug(f'총점 업데이트 완료: {participation.id} -> {total_score}')
-        participation.recompute_results()
-        logger.debug(f'참가자 결과 재계산 완료: {participation.id}')
+        if recompute:
+            # A rejudge can change results in ways a newly graded submission cannot, so recompute those in full.
+            if self.rejudged_date is None:
+                participation.update_problem_results([contest_problem.id])
+            else:
+                participation.recompute_results()
+            logger.debug(f'참가자 결과 재계산 완료: {participation.id}')
         
         # 로그 핸들러 제거
         try:
@@ -349,3 +368,87 @@ class SubmissionTestCase(models.Model):
         unique_together = ('submission', 'case')
         verbose_name = _('submission test case')
         verbose_name_plural = _('submission test cases')
+
+
+class UserProblemPoints(models.Model):
+    user = models.ForeignKey(Profile, verbose_name=_('user'), related_name='problem_points', on_delete=models.CASCADE)
+    problem = models.ForeignKey(Problem, verbose_name=_('problem'), related_name='user_points',
+                                on_delete=models.CASCADE)
+    points = models.FloatField(verbose_name=_('best points'), default=0)
+    is_solved = models.BooleanField(verbose_name=_('solved'), default=False)
+    submission_count = models.IntegerField(verbose_name=_('number of submissions'), default=0)
+    ac_count = models.IntegerField(verbose_name=_('number of accepted submissions'), default=0,
+                                   help_text=_('Accepted submissions with full points, as counted in the problem '
+                                               'statistics.'))
+
+    @classmethod
+    def _best(cls):
+        return {
+            'best_points': Max('points'),
+            'solved': Count('id', filter=Q(result='AC', case_points__gte=F('case_total'))),
+            'submissions': Count('id'),
+            'accepted': Count('id', filter=Q(result='AC', points__gte=F('problem__points'))),
+        }
+
+    @classmethod
+    def _problem_counts(cls, **filters):
+        """The submissions, accepted submissions and solving users of listed users, per problem."""
+        return {
+            data['problem_id']: (data['submissions'], data['accepted'], data['users'])
+            for data in cls.objects.filter(user__is_unlisted=False, **filters).values('problem_id').annotate(
+                submissions=Sum('submission_count'), accepted=Sum('ac_count'),
+                users=Count('id', filter=Q(ac_count__gt=0)),
+            ).order_by()
+        }
+
+    @classmethod
+    def update(cls, user_id, problem_id):
+        """
+        Recalculate the best points of a user on a problem, after the points of one of their submissions changed.
+        The statistics of the problem are adjusted by the change in the user's counts.
+        """
+        with transaction.atomic():
+            old = cls.objects.select_for_update().filter(user_id=user_id, problem_id=problem_id) \
+                     .values_list('submission_count', 'ac_count').first() or (0, 0)
+            data = Submission.objects.filter(user_id=user_id, problem_id=problem_id).aggregate(**cls._best())
+            if not data['submissions']:
+                cls.objects.filter(user_id=user_id, problem_id=problem_id).delete()
+            else:
+                cls.objects.update_or_create(user_id=user_id, problem_id=problem_id, defaults={
+                    'points': data['best_points'] or 0, 'is_solved': data['solved'] > 0,
+                    'submission_count': data['submissions'], 'ac_count': data['accepted'],
+                })
+
+            if (data['submissions'], data['accepted']) != old and \
+                    Profile.objects.filter(id=user_id, is_unlisted=False).exists():
+                Problem.add_stats(problem_id, data['submissions'] - old[0], data['accepted'] - old[1],
+                                  (data['accepted'] > 0) - (old[1] > 0))
+
+    @classmethod
+    def rebuild(cls, batch_size=1000, **filters):
+        """
+        Recalculate the best points of every user on every problem, or the ones matching `filters`. The statistics of
+        the affected problems are adjusted by the change in their counts.
+        """
+        with transaction.atomic():
+            old = cls._problem_counts(**filters)
+            cls.objects.filter(**filters).delete()
+            best = Submission.objects.filter(**filters).values('user_id', 'problem_id').annotate(**cls._best()) \
+                .order_by()
+            for batch in chunk(best.iterator(), batch_size):
+                cls.objects.bulk_create([
+                    cls(user_id=data['user_id'], problem_id=data['problem_id'], points=data['best_points'] or 0,
+                        is_solved=data['solved'] > 0, submission_count=data['submissions'],
+                        ac_count=data['accepted'])
+                    for data in batch
+                ])
+
+            new = cls._problem_counts(**filters)
+            for problem_id in old.keys() | new.keys():
+                Problem.add_stats(problem_id, *(after - before for after, before in
+                                                zip(new.get(problem_id, (0, 0, 0)), old.get(problem_id, (0, 0, 0)))))
+
+    class Meta:
+        unique_together = ('user', 'problem')
+        verbose_name = _('user problem points')
+        verbose_name_plural = _('user problem points')
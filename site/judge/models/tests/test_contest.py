@@ -1,10 +1,12 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import SimpleTestCase, TestCase
 from django.utils import timezone
 
 from judge.models import Contest, ContestParticipation, ContestTag
 from judge.models.contest import MinValueOrNoneValidator
-from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, create_user
+from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
+    create_numbered_contest, create_user
 
 
 class ContestTestCase(CommonDataMixin, TestCase):
@@ -1024,6 +1026,63 @@ class ContestTagTestCase(TestCase):
         self.assertEqual(self.dark_tag.text_color, '#fff')
 
 
+class ContestSubmissionVisibilityTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.user = create_user(username='visibility').profile.user
+        now = timezone.now()
+        self.contests = {}
+        for name, visibility, start, end in (
+            ('visible', Contest.SCOREBOARD_VISIBLE, -2, 2),
+            ('hidden', Contest.SCOREBOARD_HIDDEN, -2, 2),
+            ('after_contest', Contest.SCOREBOARD_AFTER_CONTEST, -2, 2),
+            ('after_contest_ended', Contest.SCOREBOARD_AFTER_CONTEST, -2, -1),
+            ('after_participation', Contest.SCOREBOARD_AFTER_PARTICIPATION, -2, -1),
+        ):
+            contest = create_numbered_contest(name, scoreboard_visibility=visibility,
+                                              start_time=now + timezone.timedelta(days=start),
+                                              end_time=now + timezone.timedelta(days=end))
+            create_contest_participation(contest=contest, user=self.user.profile)
+            self.contests[name] = contest
+        create_contest_participation(contest=self.contests['hidden'], user='visibility_other')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertVisibility(self, visible):
+        visible = {self.contests[name].id for name in visible}
+        own = {contest.id for contest in self.contests.values()} - visible
+        self.assertEqual(Contest.get_submission_visibility(self.user), (visible, own))
+        for contest in self.contests.values():
+            contest = Contest.objects.get(id=contest.id)
+            self.assertEqual(contest.can_see_full_scoreboard(self.user), contest.id in visible)
+
+    def test_visibility(self):
+        self.assertVisibility({'visible', 'after_contest_ended', 'after_participation'})
+        with self.assertNumQueries(0):
+            Contest.get_submission_visibility(self.user)
+
+    def test_invalidated(self):
+        self.assertVisibility({'visible', 'after_contest_ended', 'after_participation'})
+        self.contests['hidden'].view_contest_scoreboard.add(self.user.profile)
+        self.assertVisibility({'visible', 'hidden', 'after_contest_ended', 'after_participation'})
+
+        contest = self.contests['after_contest']
+        contest.scoreboard_visibility = Contest.SCOREBOARD_VISIBLE
+        contest.save()
+        self.assertVisibility({'visible', 'hidden', 'after_contest', 'after_contest_ended', 'after_participation'})
+
+        contest.update_user_count()
+        with self.assertNumQueries(0):
+            Contest.get_submission_visibility(self.user)
+
+        contest = create_numbered_contest('new')
+        self.contests['new'] = contest
+        create_contest_participation(contest=contest, user=self.user.profile)
+        self.assertVisibility({'visible', 'hidden', 'after_contest', 'after_contest_ended', 'after_participation',
+                               'new'})
+
+
 class MinValueOrNoneValidatorTestCase(SimpleTestCase):
     def test_both_integers(self):
         self.assertIsNone(MinValueOrNoneValidator(-1)(100))
@@ -0,0 +1,62 @@
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from judge.models import Problem, ProblemSearchGram
+from judge.models.problem_search import get_problem_grams, has_cjk
+from judge.models.tests.util import create_problem
+
+
+class ProblemGramsTestCase(SimpleTestCase):
+    def test_has_cjk(self):
+        self.assertTrue(has_cjk('배열 정렬'))
+        self.assertTrue(has_cjk('sort 漢字'))
+        self.assertFalse(has_cjk('sort an array'))
+
+    def test_grams(self):
+        self.assertEqual(get_problem_grams('', '', '정렬하기'), {'정렬': 1, '렬하': 1, '하기': 1, '기': 1})
+        self.assertEqual(get_problem_grams('', '', 'Sort배열'), {'sor': 1, 'ort': 1, 'rt': 1, 't': 1, '배열': 1, '열': 1})
+        self.assertEqual(get_problem_grams('ab', 'AB', ''), {'ab': 20, 'b': 20})
+
+
+class ProblemSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.problems = {
+            'sortarray': create_problem(code='sortarray', name='배열 정렬하기',
+                                        description='정수 배열이 주어질 때, 오름차순으로 정렬하시오.'),
+            'graphpath': create_problem(code='graphpath', name='최단 경로',
+                                        description='그래프에서 두 정점 사이의 최단 경로를 구하시오. 배열은 없습니다.'),
+            'stringsort': create_problem(code='stringsort', name='문자열 정렬',
+                                         description='Sort the strings. 문자열을 정렬하시오.'),
+        }
+
+    def search(self, query):
+        return list(ProblemSearchGram.search(Problem.objects.all(), query).values_list('code', flat=True))
+
+    def like(self, query):
+        queryset = Problem.objects.all()
+        for term in query.split():
+            queryset = queryset.filter(Q(code__icontains=term) | Q(name__icontains=term) |
+                                       Q(description__icontains=term))
+        return set(queryset.values_list('code', flat=True))
+
+    def test_matches_like(self):
+        for query in ['정렬', '배열', '렬하', '정렬하시오', '배열 정렬', '최단', '문자열 sort', 'STRING', '열', 's',
+                      '없는단어', '경로 sort']:
+            with self.subTest(query=query):
+                self.assertEqual(set(self.search(query)), self.like(query))
+
+    def test_ranking(self):
+        # The name counts more than the description.
+        self.assertEqual(self.search('배열')[0], 'sortarray')
+        self.assertEqual(self.search('문자열')[0], 'stringsort')
+
+    def test_updated(self):
+        problem = self.problems['graphpath']
+        problem.description = '트리에서 두 정점 사이의 거리를 구하시오.'
+        problem.save()
+        self.assertEqual(self.search('트리'), ['graphpath'])
+        self.assertEqual(self.search('그래프'), [])
+
+        problem.delete()
+        self.assertEqual(self.search('트리'), [])
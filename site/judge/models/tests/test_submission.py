@@ -1,7 +1,8 @@
+from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 
-from judge.models import ContestSubmission, Language, Submission, SubmissionSource
+from judge.models import ContestSubmission, Language, Submission, SubmissionSource, UserProblemPoints
 from judge.models.tests.util import CommonDataMixin, create_contest, create_contest_participation, \
     create_contest_problem, create_problem, create_user
 
@@ -188,3 +189,130 @@ class SubmissionTestCase(CommonDataMixin, TestCase):
             },
         }
         self._test_object_methods_with_users(self.ie_submission, data)
+
+
+class UserProblemPointsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='best_points').profile
+        self.problems = [create_problem(code='best_points%d' % i, is_public=True, points=10) for i in range(3)]
+        self.private_problem = create_problem(code='best_points_private', is_public=False, points=10)
+
+    def submit(self, problem, points, result='WA', case_points=0, case_total=10):
+        submission = Submission.objects.create(user=self.profile, problem=problem, language=Language.get_python3())
+        # Mark the submission as graded without going through the post_save signals.
+        Submission.objects.filter(id=submission.id).update(status='D', result=result, points=points,
+                                                           case_points=case_points, case_total=case_total)
+        UserProblemPoints.update(self.profile.id, problem.id)
+        return submission
+
+    def best_points(self):
+        return {
+            (data['problem_id'], data['points'], data['is_solved'])
+            for data in UserProblemPoints.objects.filter(user=self.profile)
+                                                 .values('problem_id', 'points', 'is_solved')
+        }
+
+    def test_update_matches_rebuild(self):
+        self.submit(self.problems[0], 5)
+        self.submit(self.problems[0], 10, 'AC', 10)
+        self.submit(self.problems[0], 3)
+        self.submit(self.problems[1], 0, 'CE')
+        self.submit(self.problems[2], None)
+        self.submit(self.private_problem, 10, 'AC', 10)
+
+        best = self.best_points()
+        self.assertEqual(best, {
+            (self.problems[0].id, 10, True),
+            (self.problems[1].id, 0, False),
+            (self.problems[2].id, 0, False),
+            (self.private_problem.id, 10, True),
+        })
+        UserProblemPoints.rebuild(user=self.profile)
+        self.assertEqual(self.best_points(), best)
+
+    def test_lowered_points(self):
+        submission = self.submit(self.problems[0], 10, 'AC', 10)
+        Submission.objects.filter(id=submission.id).update(status='AB', result='AB', points=0)
+        UserProblemPoints.update(self.profile.id, self.problems[0].id)
+        self.assertEqual(self.best_points(), {(self.problems[0].id, 0, False)})
+
+        Submission.objects.filter(id=submission.id).update(points=None, result=None)
+        UserProblemPoints.update(self.profile.id, self.problems[0].id)
+        self.assertEqual(self.best_points(), {(self.problems[0].id, 0, False)})
+
+        Submission.objects.filter(id=submission.id).delete()
+        self.assertEqual(self.best_points(), set())
+
+    def test_calculate_points(self):
+        self.submit(self.problems[0], 10, 'AC', 10)
+        self.submit(self.problems[1], 4)
+        self.submit(self.private_problem, 10, 'AC', 10)
+
+        self.profile.calculate_points()
+        self.assertEqual(self.profile.points, 14)
+        self.assertEqual(self.profile.problem_count, 1)
+        table = self.profile._pp_table
+        self.assertAlmostEqual(self.profile.performance_points,
+                               10 * table[0] + 4 * table[1] + settings.DMOJ_PP_BONUS_FUNCTION(1))
+
+
+class ProblemStatsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profiles = [create_user(username='problem_stats%d' % i).profile for i in range(3)]
+        self.unlisted = create_user(username='problem_stats_unlisted').profile
+        self.unlisted.is_unlisted = True
+        self.unlisted.save()
+        self.problem = create_problem(code='problem_stats', points=10)
+
+    def submit(self, profile, result, points):
+        submission = Submission.objects.create(user=profile, problem=self.problem, language=Language.get_python3())
+        self.grade(submission, result, points)
+        return submission
+
+    def grade(self, submission, result, points):
+        # Mark the submission as graded without going through the post_save signals.
+        Submission.objects.filter(id=submission.id).update(status='D', result=result, points=points)
+        UserProblemPoints.update(submission.user_id, self.problem.id)
+
+    def assertStatsCorrect(self):
+        self.problem.refresh_from_db()
+        counts = (self.problem.submission_count, self.problem.ac_submission_count, self.problem.user_count,
+                  self.problem.ac_rate)
+        self.problem.update_stats()
+        self.assertEqual(counts, (self.problem.submission_count, self.problem.ac_submission_count,
+                                  self.problem.user_count, self.problem.ac_rate))
+        return counts
+
+    def test_counts(self):
+        self.submit(self.profiles[0], 'WA', 0)
+        solved = self.submit(self.profiles[0], 'AC', 10)
+        self.submit(self.profiles[0], 'AC', 10)
+        self.submit(self.profiles[1], 'AC', 5)
+        self.submit(self.profiles[2], 'AC', 10)
+        self.submit(self.unlisted, 'AC', 10)
+        self.assertEqual(self.assertStatsCorrect(), (5, 3, 2, 60))
+
+        # A rejudge that fails the only accepted submission of a user.
+        only = self.submit(self.profiles[1], 'AC', 10)
+        self.grade(only, 'WA', 0)
+        self.assertEqual(self.assertStatsCorrect(), (6, 3, 2, 50))
+
+        solved.delete()
+        self.assertEqual(self.assertStatsCorrect(), (5, 2, 2, 40))
+        Submission.objects.filter(user=self.profiles[2]).delete()
+        self.assertEqual(self.assertStatsCorrect(), (4, 1, 1, 25))
+
+    def test_rebuild(self):
+        self.submit(self.profiles[0], 'AC', 10)
+        self.submit(self.profiles[1], 'WA', 0)
+        # A submission that was never counted, such as one graded before the counts were kept.
+        uncounted = Submission.objects.create(user=self.profiles[2], problem=self.problem,
+                                              language=Language.get_python3())
+        Submission.objects.filter(id=uncounted.id).update(status='D', result='AC', points=10)
+
+        UserProblemPoints.rebuild(problem_id=self.problem.id)
+        self.assertEqual(self.assertStatsCorrect(), (3, 2, 2, 100 * 2 / 3))
+        UserProblemPoints.rebuild(user=self.profiles[0])
+        self.assertEqual(self.assertStatsCorrect(), (3, 2, 2, 100 * 2 / 3))
@@ -215,6 +215,21 @@ class CreateContest(CreateModel):
 create_contest = CreateContest()
 
 
+def create_numbered_contest(name, **kwargs):
+    # Contest.save() replaces the key with the id, so create_contest(), which looks contests up by key, creates a
+    # new contest every time it is called. This makes a contest keyed by its id, overriding the defaults with kwargs.
+    now = timezone.now()
+    defaults = {
+        'description': '',
+        'start_time': now - timezone.timedelta(days=1),
+        'end_time': now + timezone.timedelta(days=1),
+    }
+    defaults.update(kwargs)
+    contest = Contest(name=name, **defaults)
+    contest.save()
+    return contest
+
+
 class CreateContestParticipation(CreateModel):
     model = ContestParticipation
     required_fields = ('contest', 'user')
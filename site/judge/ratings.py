@@ -8,6 +8,10 @@ from django.db.models.functions import Coalesce
 from django.utils import timezone
 from django.utils.translation import gettext_lazy
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 BETA2 = 328.33 ** 2
 RATING_INIT = 1200      # Newcomer's rating when applying the rating floor/ceiling
@@ -19,6 +23,8 @@ VAR_PER_CONTEST = 1219.047619 * (BETA2 / 212**2)
 VAR_LIM = (sqrt(VAR_PER_CONTEST**2 + 4 * BETA2 * VAR_PER_CONTEST) - VAR_PER_CONTEST) / 2
 SD_LIM = sqrt(VAR_LIM)
 TANH_C = sqrt(3) / pi
+# Number of past performances kept with every rating. The weight of older performances in the mean is below 1e-7.
+RATING_HISTORY_LIMIT = 50
 
 
 def tie_ranker(iterable, key=attrgetter('points')):
@@ -77,7 +83,7 @@ def get_var(times_ranked, cache=[VAR_INIT]):
     return cache[times_ranked]
 
 
-def recalculate_ratings(ranking, old_mean, times_ranked, historical_p):
+def recalculate_ratings_python(ranking, old_mean, times_ranked, historical_p):
     n = len(ranking)
     new_p = [0.] * n
     new_mean = [0.] * n
@@ -140,20 +146,180 @@ def recalculate_ratings(ranking, old_mean, times_ranked, historical_p):
     return new_rating, new_mean, new_p
 
 
-def rate_contest(contest):
+# Number of tanh terms evaluated at once by the NumPy implementation, to bound its memory use.
+NUMPY_BLOCK_SIZE = 1 << 20
+
+
+def _eval_tanhs_numpy(mu, sd, wt, x):
+    """Evaluates eval_tanhs at every point of x, for the terms given as arrays, or as one array per point of x."""
+    mu, sd, wt = np.atleast_2d(mu), np.atleast_2d(sd), np.atleast_2d(wt)
+    result = np.empty(len(x))
+    step = max(1, NUMPY_BLOCK_SIZE // mu.shape[1])
+    for start in range(0, len(x), step):
+        rows = slice(start, start + step) if mu.shape[0] > 1 else slice(None)
+        block = x[start:start + step, None]
+        result[start:start + step] = ((wt[rows] / sd[rows]) * np.tanh((block - mu[rows]) / (2 * sd[rows]))).sum(axis=1)
+    return result
+
+
+def _solve_numpy(mu, sd, wt, y_tg, lin_factor, lower, upper):
+    """
+    Runs solve for every target in y_tg at once, with per-target bounds and linear factors. The terms are shared by
+    every target if given as 1-dimensional arrays, otherwise row i holds the terms of target i.
+    """
+    per_target = np.ndim(mu) > 1
+    L, R = lower.astype(float), upper.astype(float)
+    Ly, Ry = np.full(len(y_tg), np.nan), np.full(len(y_tg), np.nan)
+    result = np.full(len(y_tg), np.nan)
+
+    def evaluate(index, x):
+        terms = (mu[index], sd[index], wt[index]) if per_target else (mu, sd, wt)
+        return lin_factor[index] * x + _eval_tanhs_numpy(*terms, x)
+
+    active = np.flatnonzero(R - L > 2)
+    while len(active):
+        x = (L[active] + R[active]) / 2
+        y = evaluate(active, x)
+        above, below = y > y_tg[active], y < y_tg[active]
+        R[active[above]], Ry[active[above]] = x[above], y[above]
+        L[active[below]], Ly[active[below]] = x[below], y[below]
+        exact = ~(above | below)
+        result[active[exact]] = x[exact]
+        active = active[~exact]
+        active = active[R[active] - L[active] > 2]
+
+    # Use linear interpolation to be slightly more accurate.
+    pending = np.flatnonzero(np.isnan(result))
+    missing = pending[np.isnan(Ly[pending])]
+    Ly[missing] = evaluate(missing, L[missing])
+    at_lower = pending[y_tg[pending] <= Ly[pending]]
+    result[at_lower] = L[at_lower]
+
+    pending = np.flatnonzero(np.isnan(result))
+    missing = pending[np.isnan(Ry[pending])]
+    Ry[missing] = evaluate(missing, R[missing])
+    at_upper = pending[y_tg[pending] >= Ry[pending]]
+    result[at_upper] = R[at_upper]
+
+    pending = np.flatnonzero(np.isnan(result))
+    ratio = (y_tg[pending] - Ly[pending]) / (Ry[pending] - Ly[pending])
+    result[pending] = L[pending] * (1 - ratio) + R[pending] * ratio
+    return result
+
+
+def recalculate_ratings_numpy(ranking, old_mean, times_ranked, historical_p):
+    """
+    Computes the same ratings as recalculate_ratings_python, solving for every participant of a step at once.
+
+    Performances are solved one level of the divide and conquer at a time, with the same bounds as the pure Python
+    implementation, and the sums of win and loss weights come from prefix sums over the sorted ranking.
+    """
+    n = len(ranking)
+    ranking = np.asarray(ranking, dtype=float)
+    old_mean = np.asarray(old_mean, dtype=float)
+    times = np.asarray(times_ranked, dtype=int)
+    var = np.array([get_var(t) for t in range(int(times.max(initial=0)) + 2)])
+
+    if n < 2:
+        new_p = old_mean.copy()
+        new_mean = old_mean.copy()
+    else:
+        # Calculate performance.
+        delta = TANH_C * np.sqrt(var[times] + VAR_PER_CONTEST + BETA2)
+        order = np.argsort(ranking, kind='stable')
+        sorted_ranking = ranking[order]
+        prefix = np.concatenate(([0.], np.cumsum(1. / delta[order])))
+        beaten_by = prefix[np.searchsorted(sorted_ranking, ranking, side='left')]
+        beats = prefix[-1] - prefix[np.searchsorted(sorted_ranking, ranking, side='right')]
+        y_tg = beats - beaten_by
+        ones, zeros = np.ones(n), np.zeros(n)
+
+        def solve_performance(index, lower, upper):
+            new_p[index] = _solve_numpy(old_mean, delta, ones, y_tg[index], zeros[index], lower, upper)
+
+        new_p = np.empty(n)
+        ends = np.array([0, n - 1])
+        solve_performance(ends, np.full(2, VALID_RANGE[0]), np.full(2, VALID_RANGE[1]))
+        # Fill all indices between i and j, using the fact that new_p is non-increasing, one level at a time.
+        i, j = np.array([0]), np.array([n - 1])
+        while True:
+            split = j - i > 1
+            i, j = i[split], j[split]
+            if not len(i):
+                break
+            k = (i + j) // 2
+            solve_performance(k, new_p[j], new_p[i])
+            i, j = np.concatenate((i, k)), np.concatenate((k, j))
+
+        # Calculate mean.
+        history = max(map(len, historical_p)) + 1
+        h = np.zeros((n, history))
+        present = np.zeros((n, history), dtype=bool)
+        h[:, 0] = new_p
+        present[:, 0] = True
+        for row, past in enumerate(historical_p):
+            h[row, 1:len(past) + 1] = past
+            present[row, 1:len(past) + 1] = True
+
+        steps = np.arange(history)
+        h_var = var[np.clip(times[:, None] + 1 - steps, 0, None)]
+        k = np.where(steps > 0, h_var / (h_var + VAR_PER_CONTEST), 1.)
+        w = np.where(present, np.cumprod(k ** 2, axis=1), 0.)
+        sd = np.full((n, history), sqrt(BETA2) * TANH_C)
+        w0 = 1. / var[times + 1] - (w / BETA2).sum(axis=1)
+
+        past = np.s_[:, 1:]
+        p0 = ((w[past] / sd[past]) * np.tanh((old_mean[:, None] - h[past]) / (2 * sd[past]))).sum(axis=1)
+        p0 = p0 / w0 + old_mean
+        new_mean = _solve_numpy(h, sd, w, w0 * p0, w0, np.full(n, VALID_RANGE[0]), np.full(n, VALID_RANGE[1]))
+
+    # Display a slightly lower rating to incentivize participation.
+    # As times_ranked increases, new_rating converges to new_mean.
+    new_rating = [max(1, round(m - (sqrt(get_var(t + 1)) - SD_LIM))) for m, t in zip(new_mean.tolist(), times_ranked)]
+
+    return new_rating, new_mean.tolist(), new_p.tolist()
+
+
+def recalculate_ratings(ranking, old_mean, times_ranked, historical_p):
+    if np is not None:
+        return recalculate_ratings_numpy(ranking, old_mean, times_ranked, historical_p)
+    return recalculate_ratings_python(ranking, old_mean, times_ranked, historical_p)
+
+
+def get_rating_states(users, states):
+    """
+    Fill `states` with the (times ranked, performance history) of every user in `users` that is not in it yet, from
+    the latest Rating of each user.
+    """
+    from judge.models import Rating
+
+    rating_ids = [user['last_rating_id'] for user in users
+                  if user['user_id'] not in states and user['last_rating_id'] is not None]
+    for rating in Rating.objects.filter(id__in=rating_ids).values('user_id', 'times_ranked', 'performance_history'):
+        states[rating['user_id']] = (rating['times_ranked'], rating['performance_history'])
+    return states
+
+
+def rate_contest(contest, states=None):
+    """
+    Rate `contest`, which must end after every contest that is already rated.
+
+    `states` maps user ids to their (times ranked, performance history) after the last contest they were rated in.
+    Users missing from it are read from their latest Rating, and it is updated with the new ratings, so that it can
+    be passed on to the next contest when rating several contests in a row.
+    """
+    from judge.caching import bump_contest_ranking
     from judge.models import Rating, Profile
 
-    rating_subquery = Rating.objects.filter(user=OuterRef('user'))
-    rating_sorted = rating_subquery.order_by('-contest__end_time')
+    rating_sorted = Rating.objects.filter(user=OuterRef('user')).order_by('-contest__end_time')
     users = contest.users.order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker') \
         .annotate(submissions=Count('submission'),
                   last_rating=Coalesce(Subquery(rating_sorted.values('rating')[:1]), RATING_INIT),
                   last_mean=Coalesce(Subquery(rating_sorted.values('mean')[:1]), MEAN_INIT),
-                  times=Coalesce(Subquery(rating_subquery.order_by().values('user_id')
-                                          .annotate(count=Count('id')).values('count')), 0)) \
+                  last_rating_id=Subquery(rating_sorted.values('id')[:1])) \
         .exclude(user_id__in=contest.rate_exclude.all()) \
         .filter(virtual=0).values('id', 'user_id', 'score', 'cumtime', 'tiebreaker',
-                                  'last_rating', 'last_mean', 'times')
+                                  'last_rating', 'last_mean', 'last_rating_id')
     if not contest.rate_all:
         users = users.filter(submissions__gt=0)
     if contest.rating_floor is not None:
@@ -162,32 +328,31 @@ def rate_contest(contest):
         users = users.exclude(last_rating__gt=contest.rating_ceiling)
 
     users = list(users)
+    states = get_rating_states(users, {} if states is None else states)
     participation_ids = list(map(itemgetter('id'), users))
     user_ids = list(map(itemgetter('user_id'), users))
     ranking = list(tie_ranker(users, key=itemgetter('score', 'cumtime', 'tiebreaker')))
     old_mean = list(map(itemgetter('last_mean'), users))
-    times_ranked = list(map(itemgetter('times'), users))
-    historical_p = [[] for _ in users]
-
-    user_id_to_idx = {uid: i for i, uid in enumerate(user_ids)}
-    for h in Rating.objects.filter(user_id__in=user_ids) \
-            .order_by('-contest__end_time') \
-            .values('user_id', 'performance'):
-        idx = user_id_to_idx[h['user_id']]
-        historical_p[idx].append(h['performance'])
+    times_ranked = [states.get(user_id, (0, []))[0] for user_id in user_ids]
+    historical_p = [states.get(user_id, (0, []))[1] for user_id in user_ids]
 
     rating, mean, performance = recalculate_ratings(ranking, old_mean, times_ranked, historical_p)
 
     now = timezone.now()
-    ratings = [Rating(user_id=i, contest=contest, rating=r, mean=m, performance=perf,
-                      last_rated=now, participation_id=pid, rank=z)
-               for i, pid, r, m, perf, z in zip(user_ids, participation_ids, rating, mean, performance, ranking)]
+    ratings = []
+    for i, pid, r, m, perf, z, t, h in zip(user_ids, participation_ids, rating, mean, performance, ranking,
+                                           times_ranked, historical_p):
+        state = (t + 1, [perf] + h[:RATING_HISTORY_LIMIT - 1])
+        ratings.append(Rating(user_id=i, contest=contest, rating=r, mean=m, performance=perf, last_rated=now,
+                              participation_id=pid, rank=z, times_ranked=state[0], performance_history=state[1]))
+        states[i] = state
     with transaction.atomic():
         Rating.objects.bulk_create(ratings)
 
         Profile.objects.filter(contest_history__contest=contest, contest_history__virtual=0).update(
             rating=Subquery(Rating.objects.filter(user=OuterRef('id'))
                             .order_by('-contest__end_time').values('rating')[:1]))
+    bump_contest_ranking(contest.id)
 
 
 RATING_LEVELS = [
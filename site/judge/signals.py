@@ -8,14 +8,16 @@ from django.core.cache.utils import make_template_fragment_key
 from django.contrib.auth.models import User
 from django.db import connections, transaction
 from django.apps import apps
-from django.db.models.signals import post_delete, post_save, pre_save, pre_delete
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save, pre_delete
 from django.dispatch import receiver
 
-from .caching import finished_submission
+from .caching import bump_contest_ranking, bump_submission_visibility, invalidate_problem_status, \
+    invalidate_submission, invalidate_submission_visibility, submitted, submitted_to_contest
 # from .models import BlogPost, Comment, Contest, ContestSubmission, EFFECTIVE_MATH_ENGINES, Judge, Language, License, \
 #     MiscConfig, Organization, Problem, Profile, Submission, WebAuthnCredential
-from .models import BlogPost, Comment, Contest, ContestSubmission, EFFECTIVE_MATH_ENGINES, Judge, Language, License, \
-    MiscConfig, Problem, Profile, Submission, WebAuthnCredential
+from .models import BlogPost, Comment, Contest, ContestParticipation, ContestProblem, ContestSubmission, \
+    EFFECTIVE_MATH_ENGINES, Judge, Language, License, MiscConfig, Problem, ProblemSearchGram, ProblemType, Profile, \
+    Submission, UserProblemPoints, WebAuthnCredential
 from .models.LatestSubmission import LatestSubmission
 from .models.submission import SubmissionSource
     
@@ -91,7 +93,7 @@ def problem_update(sender, instance, **kwargs):
     cache.delete_many([
         make_template_fragment_key('submission_problem', (instance.id,)),
         make_template_fragment_key('problem_feed', (instance.id,)),
-        'problem_tls:%s' % instance.id, 'problem_mls:%s' % instance.id,
+        'problem_tls:%s' % instance.id, 'problem_mls:%s' % instance.id, 'problem_submit:%d' % instance.id,
     ])
     cache.delete_many([make_template_fragment_key('problem_html', (instance.id, engine, lang))
                        for lang, _ in settings.LANGUAGES for engine in EFFECTIVE_MATH_ENGINES])
@@ -102,6 +104,68 @@ def problem_update(sender, instance, **kwargs):
     for lang, _ in settings.LANGUAGES:
         unlink_if_exists(get_pdf_path('%s.%s.pdf' % (instance.code, lang)))
 
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or {'code', 'name', 'description'} & set(update_fields):
+        ProblemSearchGram.rebuild(Problem.objects.filter(id=instance.id))
+
+
+def _changed_problem_ids(sender, instance, action, reverse, pk_set):
+    """The problems whose relation changed, once the change is done, or None before it."""
+    if not reverse:
+        return [instance.id] if action in ('post_add', 'post_remove', 'post_clear') else None
+
+    # The instance is on the other side of the relation, and the changed problems are in pk_set, except when clearing.
+    if action == 'pre_clear':
+        problems = sender.objects.filter(**{'%s_id' % instance._meta.model_name: instance.id})
+        instance._cleared_problem_ids = list(problems.values_list('problem_id', flat=True))
+    elif action == 'post_clear':
+        return getattr(instance, '_cleared_problem_ids', ())
+    elif action in ('post_add', 'post_remove'):
+        return pk_set
+    return None
+
+
+@receiver(m2m_changed, sender=Problem.types.through)
+@receiver(m2m_changed, sender=Problem.authors.through)
+def problem_sort_keys_update(sender, instance, action, reverse, pk_set, **kwargs):
+    problem_ids = _changed_problem_ids(sender, instance, action, reverse, pk_set)
+    if problem_ids is not None:
+        Problem.update_sort_keys(problem_ids)
+
+
+@receiver(m2m_changed, sender=Problem.allowed_languages.through)
+@receiver(m2m_changed, sender=Problem.banned_users.through)
+def problem_submission_restrictions_update(sender, instance, action, reverse, pk_set, **kwargs):
+    problem_ids = _changed_problem_ids(sender, instance, action, reverse, pk_set)
+    if problem_ids is not None:
+        cache.delete_many(['problem_submit:%d' % problem_id for problem_id in problem_ids])
+
+
+@receiver(post_save, sender=ProblemType)
+def problem_type_update(sender, instance, **kwargs):
+    Problem.update_sort_keys(Problem.types.through.objects.filter(problemtype=instance)
+                             .values_list('problem_id', flat=True))
+
+
+@receiver(pre_delete, sender=ProblemType)
+def problem_type_pre_delete(sender, instance, **kwargs):
+    instance._problem_ids = list(Problem.types.through.objects.filter(problemtype=instance)
+                                 .values_list('problem_id', flat=True))
+
+
+@receiver(post_delete, sender=ProblemType)
+def problem_type_delete(sender, instance, **kwargs):
+    Problem.update_sort_keys(instance._problem_ids)
+
+
+@receiver(post_save, sender=User)
+def user_name_update(sender, instance, update_fields=None, **kwargs):
+    # Logging in saves only the last login, which doesn't change the names of the authors of any problem.
+    if update_fields is not None and 'first_name' not in update_fields:
+        return
+    Problem.update_sort_keys(Problem.authors.through.objects.filter(profile__user=instance)
+                             .values_list('problem_id', flat=True))
+
 
 @receiver(post_save, sender=Profile)
 def profile_update(sender, instance, **kwargs):
@@ -132,6 +196,43 @@ def contest_update(sender, instance, **kwargs):
     cache.delete_many(['generated-meta-contest:%d' % instance.id] +
                       [make_template_fragment_key('contest_html', (instance.id, engine))
                        for engine in EFFECTIVE_MATH_ENGINES])
+    bump_contest_ranking(instance.id)
+    # Viewing a contest saves its user count, which doesn't change who can see its scoreboard.
+    if set(kwargs.get('update_fields') or ()) != {'user_count'}:
+        bump_submission_visibility()
+
+
+@receiver(post_delete, sender=Contest)
+@receiver(m2m_changed, sender=Contest.authors.through)
+@receiver(m2m_changed, sender=Contest.curators.through)
+@receiver(m2m_changed, sender=Contest.testers.through)
+@receiver(m2m_changed, sender=Contest.spectators.through)
+@receiver(m2m_changed, sender=Contest.view_contest_scoreboard.through)
+def contest_visibility_update(sender, **kwargs):
+    if not kwargs.get('action', 'post_').startswith('pre_'):
+        bump_submission_visibility()
+
+
+@receiver(post_save, sender=ContestParticipation)
+@receiver(post_delete, sender=ContestParticipation)
+@receiver(post_save, sender=ContestProblem)
+@receiver(post_delete, sender=ContestProblem)
+def contest_ranking_update(sender, instance, **kwargs):
+    # A ranking built before the change is committed would otherwise be cached under the new version.
+    contest_id = instance.contest_id
+    transaction.on_commit(lambda: bump_contest_ranking(contest_id))
+
+
+@receiver(post_save, sender=ContestProblem)
+@receiver(post_delete, sender=ContestProblem)
+def contest_problem_update(sender, instance, **kwargs):
+    cache.delete('contest_problem:%d:%d' % (instance.contest_id, instance.problem_id))
+
+
+@receiver(post_save, sender=ContestParticipation)
+@receiver(post_delete, sender=ContestParticipation)
+def contest_participation_update(sender, instance, **kwargs):
+    invalidate_submission_visibility(instance.user_id)
 
 
 @receiver(post_save, sender=License)
@@ -166,19 +267,26 @@ def post_update(sender, instance, **kwargs):
                        for engine in EFFECTIVE_MATH_ENGINES])
 
 
+@receiver(post_save, sender=Submission)
+def submission_create(sender, instance, created, **kwargs):
+    if created:
+        submitted(instance)
+
+
 @receiver(post_delete, sender=Submission)
 def submission_delete(sender, instance, **kwargs):
-    finished_submission(instance)
+    invalidate_submission(instance)
+    # This also takes the submission out of the problem's statistics.
+    UserProblemPoints.update(instance.user_id, instance.problem_id)
     instance.user._updating_stats_only = True
     instance.user.calculate_points()
-    instance.problem._updating_stats_only = True
-    instance.problem.update_stats()
 
 
 @receiver(post_delete, sender=ContestSubmission)
 def contest_submission_delete(sender, instance, **kwargs):
     participation = instance.participation
     participation.recompute_results()
+    invalidate_problem_status(['contest_complete:%d' % participation.id, 'contest_attempted:%d' % participation.id])
     Submission.objects.filter(id=instance.submission_id).update(contest_object=None)
 
 
@@ -220,7 +328,9 @@ def misc_config_delete(sender, instance, **kwargs):
 
 
 @receiver(post_save, sender=ContestSubmission)
-def contest_submission_update(sender, instance, **kwargs):
+def contest_submission_update(sender, instance, created, **kwargs):
+    if created:
+        submitted_to_contest(instance)
     # 제출에 해당하는 경진 과제/대회 ID를 업데이트하는 작업만 수행
     # 점수 재계산은 이미 Submission.update_contest에서 이루어지므로 여기서는 수행하지 않음
     Submission.objects.filter(id=instance.submission_id).update(contest_object_id=instance.participation.contest_id)
@@ -13,15 +13,10 @@ __all__ = ('rescore_contest', 'run_jplag')
 @shared_task(bind=True)
 def rescore_contest(self, contest_key):
     contest = Contest.objects.get(key=contest_key)
-    participations = contest.users
-
-    rescored = 0
-    with Progress(self, participations.count(), stage=_('Recalculating contest scores')) as p:
-        for participation in participations.iterator():
-            participation.recompute_results()
-            rescored += 1
-            if rescored % 10 == 0:
-                p.done = rescored
+
+    with Progress(self, contest.users.count(), stage=_('Recalculating contest scores')) as p:
+        rescored = len(contest.recompute_results())
+        p.done = rescored
     return rescored
 
 
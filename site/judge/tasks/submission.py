@@ -1,11 +1,13 @@
 from celery import shared_task
 from django.contrib.auth.models import User
-from django.core.cache import cache
 from django.utils import timezone
 from django.utils.translation import gettext as _
 
-from judge.models import Problem, Profile, Submission
+from judge.caching import invalidate_submission
+from judge.judgeapi import BATCH_SUBMISSION_REQUEST_SIZE
+from judge.models import Problem, Profile, Submission, UserProblemPoints
 from judge.utils.celery import Progress
+from judge.utils.iterator import chunk
 
 __all__ = ('apply_submission_filter', 'rejudge_problem_filter', 'rescore_problem')
 
@@ -31,11 +33,11 @@ def rejudge_problem_filter(self, problem_id, id_range=None, languages=None, resu
 
     rejudged = 0
     with Progress(self, queryset.count()) as p:
-        for submission in queryset.iterator():
-            submission.judge(rejudge=True, batch_rejudge=True, rejudge_user=user)
-            rejudged += 1
-            if rejudged % 10 == 0:
-                p.done = rejudged
+        queryset = queryset.select_related('problem', 'language', 'source')
+        for submissions in chunk(queryset.iterator(), BATCH_SUBMISSION_REQUEST_SIZE):
+            Submission.judge_many(submissions, rejudge=True, batch_rejudge=True, rejudge_user=user)
+            rejudged += len(submissions)
+            p.done = rejudged
     return rejudged
 
 
@@ -53,18 +55,18 @@ def rescore_problem(self, problem_id):
                 submission.points = 0
             submission.save(update_fields=['points'])
             submission.update_contest()
+            invalidate_submission(submission)
             rescored += 1
             if rescored % 10 == 0:
                 p.done = rescored
 
+    UserProblemPoints.rebuild(problem_id=problem_id)
     with Progress(self, submissions.values('user_id').distinct().count(), stage=_('Recalculating user points')) as p:
         users = 0
         profiles = Profile.objects.filter(id__in=submissions.values_list('user_id', flat=True).distinct())
         for profile in profiles.iterator():
             profile._updating_stats_only = True
             profile.calculate_points()
-            cache.delete('user_complete:%d' % profile.id)
-            cache.delete('user_attempted:%d' % profile.id)
             users += 1
             if users % 10 == 0:
                 p.done = users
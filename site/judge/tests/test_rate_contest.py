@@ -0,0 +1,69 @@
+import random
+
+from django.test import TestCase
+from django.utils import timezone
+
+from judge.models import Contest, Rating
+from judge.models.tests.util import create_contest_participation, create_numbered_contest, create_user
+from judge.ratings import rate_contest
+
+
+class RateContestTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        rng = random.Random(0)
+        users = [create_user(username='rated%d' % i).profile for i in range(8)]
+        now = timezone.now()
+        self.contests = []
+        for i in range(5):
+            contest = create_numbered_contest('rated%d' % i, is_rated=True, rate_all=True,
+                                              start_time=now - timezone.timedelta(days=20 - i),
+                                              end_time=now - timezone.timedelta(days=19 - i))
+            for user in rng.sample(users, 5):
+                create_contest_participation(contest=contest, user=user, score=rng.randint(0, 3) * 100)
+            self.contests.append(contest)
+
+    def ratings(self):
+        return {
+            (rating['user_id'], rating['contest_id']): rating
+            for rating in Rating.objects.values('user_id', 'contest_id', 'rank', 'rating', 'mean', 'performance',
+                                                'times_ranked', 'performance_history')
+        }
+
+    def rate_one_by_one(self):
+        Rating.objects.all().delete()
+        for contest in self.contests:
+            rate_contest(contest)
+        return self.ratings()
+
+    def test_state_matches_history(self):
+        self.rate_one_by_one()
+        for user_id in Rating.objects.values_list('user_id', flat=True).distinct():
+            history = []
+            for rating in Rating.objects.filter(user_id=user_id).order_by('contest__end_time'):
+                history.insert(0, rating.performance)
+                self.assertEqual(rating.times_ranked, len(history))
+                self.assertEqual(rating.performance_history, history)
+
+    def test_carried_state_matches_stored_state(self):
+        expected = self.rate_one_by_one()
+        self.contests[0].rate()
+        self.assertEqual(self.ratings(), expected)
+        self.contests[2].rate()
+        self.assertEqual(self.ratings(), expected)
+
+    def test_history_is_truncated(self):
+        contest = self.contests[0]
+        participation = contest.users.first()
+        Rating.objects.create(user=participation.user, contest=self.contests[1],
+                              participation=self.contests[1].users.first(), rank=1, rating=1500, mean=1500.,
+                              performance=1500., last_rated=timezone.now(), times_ranked=100,
+                              performance_history=[1500.] * 50)
+        # Rate the earlier contest as if it came last, so that its state is read from the rating above.
+        Contest.objects.filter(id=contest.id).update(end_time=timezone.now())
+        contest.refresh_from_db()
+        rate_contest(contest)
+        rating = Rating.objects.get(user=participation.user, contest=contest)
+        self.assertEqual(rating.times_ranked, 101)
+        self.assertEqual(len(rating.performance_history), 50)
+        self.assertEqual(rating.performance_history[0], rating.performance)
@@ -0,0 +1,28 @@
+import unittest
+
+from judge.ratings import np, recalculate_ratings_numpy, recalculate_ratings_python
+from judge.utils.simulation import make_contest
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed')
+class RecalculateRatingsTestCase(unittest.TestCase):
+    def assertSameRatings(self, contest):
+        python_rating, python_mean, python_p = recalculate_ratings_python(*contest)
+        numpy_rating, numpy_mean, numpy_p = recalculate_ratings_numpy(*contest)
+        self.assertEqual(numpy_rating, python_rating)
+        for expected, actual in zip(python_mean + python_p, numpy_mean + numpy_p):
+            self.assertAlmostEqual(expected, actual, delta=1e-6)
+
+    def test_small_contests(self):
+        for participants in range(6):
+            with self.subTest(participants=participants):
+                self.assertSameRatings(make_contest(participants, participants))
+
+    def test_all_tied(self):
+        self.assertSameRatings(([1.5] * 2, [1500., 1800.], [0, 3], [[], [1700., 1600., 2000.]]))
+        self.assertSameRatings(([50.5] * 100, [1500.] * 100, [0] * 100, [[]] * 100))
+
+    def test_large_contests(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                self.assertSameRatings(make_contest(500, seed))
@@ -7,10 +7,11 @@ from django.db.models.fields import FloatField
 from django.utils import timezone
 from django.utils.translation import gettext_noop
 
+from judge.caching import PROBLEM_STATUS_CACHE_TIMEOUT, invalidate_problem_status, problem_status_key
 from judge.models import Problem, Submission
-import logging
 
-__all__ = ['contest_completed_ids', 'get_result_data', 'user_completed_ids', 'user_editable_ids', 'user_tester_ids']
+__all__ = ['contest_attempted_ids', 'contest_completed_ids', 'get_result_data', 'user_attempted_ids',
+           'user_completed_ids', 'user_editable_ids', 'user_tester_ids']
 
 
 def user_tester_ids(profile):
@@ -20,45 +21,74 @@ def user_tester_ids(profile):
 def user_editable_ids(profile):
     return set(Problem.get_editable_problems(profile.user).values_list('id', flat=True))
 
-def contest_completed_ids(participation):
+
+def _cached_ids(key, get_ids):
+    key = problem_status_key(key)
+    result = cache.get(key)
+    if result is None:
+        result = get_ids()
+        cache.set(key, result, PROBLEM_STATUS_CACHE_TIMEOUT)
+    return result
+
+
+def _contest_completed_ids(participation):
     return set(participation.submissions.filter(submission__result='AC', points=F('problem__points'))
-                     .values_list('problem__problem__id', flat=True).distinct())
+                            .values_list('problem__problem__id', flat=True).distinct())
 
-def user_completed_ids(profile):
+
+def _user_completed_ids(profile):
     return set(Submission.objects.filter(user=profile, result='AC', points=F('problem__points'))
-                     .values_list('problem_id', flat=True).distinct())
+                         .values_list('problem_id', flat=True).distinct())
 
-def contest_attempted_ids(participation):
+
+def _contest_attempted_ids(participation):
     return set(participation.submissions.values_list('problem__problem_id', flat=True).distinct())
 
-def user_attempted_ids(profile):
+
+def _user_attempted_ids(profile):
     return set(profile.submission_set.values_list('problem_id', flat=True).distinct())
 
 
-# def user_completed_ids(profile):
-#     key = 'user_complete:%d' % profile.id
-#     result = cache.get(key)
-#     if result is None:
-#         result = set(Submission.objects.filter(user=profile, result='AC', points=F('problem__points'))
-#                      .values_list('problem_id', flat=True).distinct())
-#         cache.set(key, result, 86400)
-#     return result
-
-# def contest_attempted_ids(participation):
-#     key = 'contest_attempted:%s' % participation.id
-#     result = cache.get(key)
-#     if result is None:
-#         result = set(participation.submissions.values_list('problem__problem_id', flat=True).distinct())
-#         cache.set(key, result, 86400)
-#     return result
-
-# def user_attempted_ids(profile):
-#     key = 'user_attempted:%s' % profile.id
-#     result = cache.get(key)
-#     if result is None:
-#         result = set(profile.submission_set.values_list('problem_id', flat=True).distinct())
-#         cache.set(key, result, 86400)
-#     return result
+def contest_completed_ids(participation):
+    return _cached_ids('contest_complete:%d' % participation.id, lambda: _contest_completed_ids(participation))
+
+
+def user_completed_ids(profile):
+    return _cached_ids('user_complete:%d' % profile.id, lambda: _user_completed_ids(profile))
+
+
+def contest_attempted_ids(participation):
+    return _cached_ids('contest_attempted:%d' % participation.id, lambda: _contest_attempted_ids(participation))
+
+
+def user_attempted_ids(profile):
+    return _cached_ids('user_attempted:%d' % profile.id, lambda: _user_attempted_ids(profile))
+
+
+def check_problem_status_cache(profile, fix=False):
+    """
+    Compare the cached problems solved and attempted by a user, and in their current contest, against their
+    submissions. Returns the keys of the sets that differ, which are recomputed when next needed if `fix` is set.
+    """
+    checks = [
+        ('user_complete:%d' % profile.id, lambda: _user_completed_ids(profile)),
+        ('user_attempted:%d' % profile.id, lambda: _user_attempted_ids(profile)),
+    ]
+    participation = profile.current_contest
+    if participation is not None:
+        checks += [
+            ('contest_complete:%d' % participation.id, lambda: _contest_completed_ids(participation)),
+            ('contest_attempted:%d' % participation.id, lambda: _contest_attempted_ids(participation)),
+        ]
+
+    stale = []
+    for key, get_ids in checks:
+        cached = cache.get(problem_status_key(key))
+        if cached is not None and cached != get_ids():
+            stale.append(key)
+    if fix:
+        invalidate_problem_status(stale)
+    return stale
 
 
 def _get_result_data(results):
@@ -0,0 +1,21 @@
+import random
+
+from judge.ratings import MEAN_INIT, tie_ranker
+
+
+def make_contest(participants, seed):
+    """Builds a synthetic ranking to rate, where most participants have a rating history and scores are often tied."""
+    rng = random.Random(seed)
+    users = []
+    for _ in range(participants):
+        times = rng.choice([0, 0, 1, 2, 5, 10, 30])
+        users.append({
+            'score': rng.randrange(0, 1000, 50) + (rng.random() if rng.random() < 0.5 else 0),
+            'mean': rng.gauss(MEAN_INIT, 300) if times else MEAN_INIT,
+            'times': times,
+            'history': [rng.gauss(MEAN_INIT, 400) for _ in range(times)],
+        })
+    users.sort(key=lambda user: -user['score'])
+    ranking = list(tie_ranker(users, key=lambda user: user['score']))
+    return (ranking, [user['mean'] for user in users], [user['times'] for user in users],
+            [user['history'] for user in users])
@@ -0,0 +1,88 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from judge.caching import finished_submission, problem_status_key
+from judge.models import Language, Submission
+from judge.models.tests.util import create_problem, create_user
+from judge.utils.problems import check_problem_status_cache, user_attempted_ids, user_completed_ids
+
+
+class ProblemStatusCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.profile = create_user(username='problem_status').profile
+        self.problems = [create_problem(code='problem_status%d' % i, points=10) for i in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def submit(self, problem):
+        return Submission.objects.create(user=self.profile, problem=problem, language=Language.get_python3())
+
+    def grade(self, submission, result, points):
+        # Mark the submission as graded without going through the post_save signals.
+        Submission.objects.filter(id=submission.id).update(status='D', result=result, points=points)
+        submission.refresh_from_db()
+        finished_submission(submission)
+
+    def test_kept_until_changed(self):
+        self.grade(self.submit(self.problems[0]), 'AC', 10)
+        self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id})
+        self.assertEqual(user_attempted_ids(self.profile), {self.problems[0].id})
+
+        self.grade(self.submit(self.problems[0]), 'AC', 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id})
+            self.assertEqual(user_attempted_ids(self.profile), {self.problems[0].id})
+
+        wrong = self.submit(self.problems[1])
+        solved = self.submit(self.problems[2])
+        self.grade(wrong, 'WA', 0)
+        self.grade(solved, 'AC', 10)
+        self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id, self.problems[2].id})
+        self.assertEqual(user_attempted_ids(self.profile), {problem.id for problem in self.problems})
+        self.assertEqual(check_problem_status_cache(self.profile), [])
+
+    def test_added_in_place(self):
+        self.assertEqual(user_completed_ids(self.profile), set())
+        self.grade(self.submit(self.problems[0]), 'AC', 10)
+        with self.assertNumQueries(0):
+            self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id})
+
+    def test_concurrent_update_recomputes(self):
+        self.assertEqual(user_completed_ids(self.profile), set())
+        incr = cache.incr
+
+        def concurrent_incr(key):
+            # Another process takes a revision between reading the set and writing it back.
+            incr(key)
+            return incr(key)
+
+        with mock.patch.object(cache, 'incr', concurrent_incr):
+            self.grade(self.submit(self.problems[0]), 'AC', 10)
+        self.assertIsNone(cache.get(problem_status_key('user_complete:%d' % self.profile.id)))
+        self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id})
+
+    def test_rejudge_recomputes(self):
+        submission = self.submit(self.problems[0])
+        self.grade(submission, 'AC', 10)
+        self.assertEqual(user_completed_ids(self.profile), {self.problems[0].id})
+
+        Submission.objects.filter(id=submission.id).update(rejudged_date=submission.date)
+        submission.refresh_from_db()
+        self.grade(submission, 'WA', 0)
+        self.assertEqual(user_completed_ids(self.profile), set())
+
+    def test_check(self):
+        self.grade(self.submit(self.problems[0]), 'AC', 10)
+        user_completed_ids(self.profile)
+        user_attempted_ids(self.profile)
+        key = 'user_complete:%d' % self.profile.id
+        cache.set(problem_status_key(key), {self.problems[1].id})
+
+        self.assertEqual(check_problem_status_cache(self.profile), [key])
+        self.assertEqual(check_problem_status_cache(self.profile, fix=True), [key])
+        self.assertIsNone(cache.get(problem_status_key(key)))
+        self.assertEqual(check_problem_status_cache(self.profile), [])
@@ -0,0 +1,33 @@
+import io
+import unittest
+import zipfile
+
+from judge.utils.zipstream import stream_zip
+
+
+class StreamZipTestCase(unittest.TestCase):
+    def test_empty(self):
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(stream_zip([]))))
+        self.assertEqual(archive.namelist(), [])
+
+    def test_files(self):
+        files = [('user/a.py', 'print(1)\n'), ('user/b.cpp', 'int main() {}\n' * 1000), ('other/a.py', '')]
+        chunks = list(stream_zip(files))
+        self.assertTrue(all(chunks))
+        self.assertGreaterEqual(len(chunks), len(files))
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertIsNone(archive.testzip())
+        self.assertEqual([(name, archive.read(name).decode()) for name in archive.namelist()], files)
+
+    def test_lazy(self):
+        consumed = []
+
+        def files():
+            for i in range(3):
+                consumed.append(i)
+                yield 'file%d' % i, 'data'
+
+        stream = stream_zip(files())
+        next(stream)
+        self.assertEqual(consumed, [0])
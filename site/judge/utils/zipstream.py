@@ -0,0 +1,39 @@
+import io
+import zipfile
+
+
+class ZipStreamBuffer(io.RawIOBase):
+    """Unseekable file that keeps what is written to it until it is taken, for ZipFile to write into."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(files, compression=zipfile.ZIP_DEFLATED):
+    """
+    Generates a zip archive of the (name, data) pairs in `files` as a sequence of byte strings, holding at most one
+    file in memory at a time. Empty byte strings are never generated.
+    """
+    buffer = ZipStreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            chunk = buffer.take()
+            if chunk:
+                yield chunk
+    chunk = buffer.take()
+    if chunk:
+        yield chunk
@@ -7,6 +7,7 @@ from django.shortcuts import get_object_or_404
 
 from dmoj import settings
 from judge.models import Contest, ContestParticipation, ContestTag, Problem, Profile, Rating, Submission
+from judge.utils.problems import user_completed_ids
 
 
 def sane_time_repr(delta):
@@ -136,8 +137,8 @@ def api_v1_user_info(request, user):
     profile = get_object_or_404(Profile, user__username=user)
     # submissions = list(Submission.objects.filter(case_points=F('case_total'), user=profile, problem__is_public=True,
     #                                              problem__is_organization_private=False)
-    submissions = list(Submission.objects.filter(case_points=F('case_total'), user=profile, problem__is_public=True)
-                       .values('problem').distinct().values_list('problem__code', flat=True))
+    submissions = list(Problem.objects.filter(id__in=user_completed_ids(profile), is_public=True)
+                       .values_list('code', flat=True))
     resp = {
         'points': profile.points,
         'performance_points': profile.performance_points,
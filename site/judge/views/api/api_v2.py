@@ -18,6 +18,7 @@ from judge.models import (
     Submission,
 )
 from judge.utils.infinite_paginator import InfinitePaginationMixin
+from judge.utils.problems import user_completed_ids
 from judge.utils.raw_sql import join_sql_subquery, use_straight_join
 from judge.views.submission import group_test_cases
 
@@ -517,15 +518,13 @@ class APIUserDetail(APIDetailView):
 
     def get_object_data(self, profile):
         solved_problems = list(
-            Submission.objects
+            Problem.objects
             .filter(
-                result='AC',
-                user=profile,
-                problem__is_public=True,
-                # problem__is_organization_private=False,
+                id__in=user_completed_ids(profile),
+                is_public=True,
+                # is_organization_private=False,
             )
-            .values('problem').distinct()
-            .values_list('problem__code', flat=True),
+            .values_list('code', flat=True),
         )
 
         last_rating = profile.ratings.order_by('-contest__end_time').first()
@@ -1,4 +1,6 @@
+import glob
 import json
+import os
 from calendar import Calendar, SUNDAY
 from collections import defaultdict, namedtuple
 from datetime import date, datetime, time, timedelta
@@ -9,12 +11,13 @@ from operator import attrgetter, itemgetter
 from django import forms
 from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
+from django.core.cache import cache
 from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist, PermissionDenied
 from django.db import IntegrityError
 from django.db.models import BooleanField, Case, Count, F, FloatField, IntegerField, Max, Min, Q, Sum, Value, When
 from django.db.models.expressions import CombinedExpression
 from django.db.models.functions import Coalesce
-from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, HttpResponseForbidden, HttpResponseServerError
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, HttpResponseForbidden, HttpResponseServerError, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.template.defaultfilters import date as date_filter
 from django.urls import reverse
@@ -33,6 +36,7 @@ from icalendar import Calendar as ICalendar, Event
 from reversion import revisions
 
 from judge import event_poster as event
+from judge.caching import contest_ranking_version
 from judge.comments import CommentedDetailView
 from judge.forms import ContestCloneForm
 from judge.models import Contest, ContestJplag, ContestParticipation, ContestProblem, ContestTag, ContestSubmission, \
@@ -46,6 +50,7 @@ from judge.utils.ranker import ranker
 from judge.utils.stats import get_bar_chart, get_pie_chart
 from judge.utils.views import DiggPaginatorMixin, QueryStringSortMixin, SingleObjectFormView, TitleMixin, \
     generic_message
+from judge.utils.zipstream import stream_zip
 from judge.utils.problems import contest_attempted_ids, contest_completed_ids, hot_problems, user_attempted_ids, \
     user_completed_ids
 
@@ -59,8 +64,8 @@ __all__ = ['ContestList', 'ContestDetail', 'ContestRanking', 'ContestJoin', 'Con
 
 # JSON으로 대회 결과 출력
 from openpyxl import Workbook
-from io import BytesIO
 import re
+import tempfile
 
 import logging
 
@@ -134,6 +139,23 @@ def verify_contest_code(request, contest_key):
 
     return JsonResponse({'valid': True, 'redirect_url': reverse('contest_view', args=[contest.key])})
 
+
+def get_contest_export_ranking(request, contest):
+    """Returns the ranking shown to the user as (rank, ranking profile, problem results) rows, and the problems."""
+    if not contest.can_see_full_scoreboard(request.user):
+        queryset = contest.users.filter(user=request.profile, virtual=ContestParticipation.LIVE)
+        users, problems = get_contest_ranking_list(
+            request, contest,
+            ranking_list=partial(base_contest_ranking_list, queryset=queryset),
+            ranker=lambda users, key: ((_('???'), user) for user in users),
+        )
+    else:
+        users, problems = get_contest_ranking_list(request, contest)
+
+    return ((rank, user, contest.format.get_problem_results(user.participation, problems))
+            for rank, user in users), problems
+
+
 class ContestDetailJSON(View):
     def get(self, request, *args, **kwargs):
         contest_key = kwargs.get('contest')
@@ -163,18 +185,10 @@ class ContestDetailJSON(View):
         return JsonResponse(contest_data, safe=False)
 
     def get_ranking_info(self, request, contest):
-        if not contest.can_see_full_scoreboard(request.user):
-            queryset = contest.users.filter(user=request.profile, virtual=ContestParticipation.LIVE)
-            users, problems = get_contest_ranking_list(
-                request, contest,
-                ranking_list=partial(base_contest_ranking_list, queryset=queryset),
-                ranker=lambda users, key: ((_('???'), user) for user in users),
-            )
-        else:
-            users, problems = get_contest_ranking_list(request, contest)
+        users, problems = get_contest_export_ranking(request, contest)
 
         ranking_list = []
-        for rank, user in users:
+        for rank, user, results in users:
             ranking_list.append({
                 'rank': rank,
                 'username': user.username,
@@ -186,9 +200,10 @@ class ContestDetailJSON(View):
                         'name': problem.problem.name,
                         'order': problem.order,
                         'points': problem.points,
-                        'status': user.problem_cells[problems.index(problem)],
+                        'status': cell,
+                        'result': result and result._asdict(),
                     }
-                    for problem in problems
+                    for problem, cell, result in zip(problems, user.problem_cells, results)
                 ]
             })
 
@@ -197,117 +212,48 @@ class ContestDetailJSON(View):
 
 class ContestDetailExcelDownload(View):
     def get(self, request, *args, **kwargs):
+        contest_key = kwargs.get('contest')
+        contest, exists = _find_contest(request, contest_key, private_check=False)
+        if not exists:
+            raise Http404("Contest not found")
+
+        # 권한 검증 로직 추가
+        if not contest.can_see_full_scoreboard(request.user):
+            raise PermissionDenied("You don't have permission to download contest results.")
+
+        # 권한이 있는 사용자만 엑셀 다운로드 가능
+        if not (request.user.is_staff or contest.is_editable_by(request.user) or
+                request.user.has_perm('judge.see_private_contest')):
+            raise PermissionDenied("You don't have permission to download contest results.")
+
         try:
-            contest_key = kwargs.get('contest')
-            contest, exists = _find_contest(request, contest_key, private_check=False)
-            if not exists:
-                raise Http404("Contest not found")
-
-            # 권한 검증 로직 추가
-            if not contest.can_see_full_scoreboard(request.user):
-                raise PermissionDenied("You don't have permission to download contest results.")
-
-            # 권한이 있는 사용자만 엑셀 다운로드 가능
-            if not (request.user.is_staff or contest.is_editable_by(request.user) or 
-                    request.user.has_perm('judge.see_private_contest')):
-                raise PermissionDenied("You don't have permission to download contest results.")
-
-            contest_data = {
-                'name': contest.name,
-                'start_time': contest.start_time,
-                'end_time': contest.end_time,
-                'description': contest.description,
-                'authors': [author.username for author in contest.authors.all()],
-                'curators': [curator.username for curator in contest.curators.all()],
-                'testers': [tester.username for tester in contest.testers.all()],
-                'tags': [tag.name for tag in contest.tags.all()],
-                'problems': [{
-                    'name': problem.problem.name,
-                    'order': problem.order,
-                    'points': problem.points
-                } for problem in contest.contest_problems.select_related('problem')],
-            }
-
-            ranking_info = self.get_ranking_info(request, contest)
-            contest_data['ranking'] = ranking_info
-
-            # 엑셀 파일 생성
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Contest Details"
+            users, problems = get_contest_export_ranking(request, contest)
+
+            # 행을 바로 임시 파일에 기록하는 write-only 모드로 엑셀 파일 생성
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Contest Details")
 
             # 문제 이름을 열 헤더로 설정
-            headers = ["Rank", "Username", "First Name"] + [problem['name'] for problem in contest_data['problems']] + ["Total Points"]
-            ws.append(headers)
+            ws.append(["Rank", "Username", "First Name"] + [problem.problem.name for problem in problems] +
+                      ["Total Points"])
 
             # 데이터 작성
-            for user in contest_data['ranking']:
-                rank = user['rank']
-                username = user['username']
-                first_name = user['first_name']  # first_name 추가
-                problems_points = [0.0] * len(contest_data['problems'])
-                for problem in user['problems']:
-                    problem_index = next((index for (index, d) in enumerate(contest_data['problems']) if d["name"] == problem['name']), None)
-                    # status에서 점수를 추출
-                    point = self.extract_point_from_status(problem['status'])
-                    problems_points[problem_index] = point
-                total_points = user['points']
-                ws.append([rank, username, first_name] + problems_points + [total_points])
-
-            # 엑셀 파일을 BytesIO에 저장
-            output = BytesIO()
+            for rank, user, results in users:
+                problems_points = [result.points if result else 0.0 for result in results]
+                ws.append([rank, user.username, user.user.first_name] + problems_points + [user.points])
+
+            output = tempfile.TemporaryFile()
             wb.save(output)
             output.seek(0)
-
-            # 응답 설정
-            response = HttpResponse(output, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-            response['Content-Disposition'] = f'attachment; filename={contest.name}_details.xlsx'
-
-            return response
-        
         except Exception as e:
             return HttpResponseServerError(f"An error occurred: {str(e)}")
 
-    def extract_point_from_status(self, status):
-        # status에서 점수를 추출하는 정규식
-        match = re.search(r'>(\d+(?:\.\d+)?)<div', status)
-        if match:
-            return float(match.group(1))
-        return 0.0
-
-    def get_ranking_info(self, request, contest):
-        if not contest.can_see_full_scoreboard(request.user):
-            queryset = contest.users.filter(user=request.profile, virtual=ContestParticipation.LIVE)
-            users, problems = get_contest_ranking_list(
-                request, contest,
-                ranking_list=partial(base_contest_ranking_list, queryset=queryset),
-                ranker=lambda users, key: ((_('???'), user) for user in users),
-            )
-        else:
-            users, problems = get_contest_ranking_list(request, contest)
-
-        ranking_list = []
-        for rank, user in users:
-            ranking_list.append({
-                'rank': rank,
-                'username': user.username,
-                'first_name': user.user.first_name if hasattr(user, 'user') else '',  # first_name 추가
-                'points': user.points,
-                'cumtime': user.cumtime,
-                'tiebreaker': user.tiebreaker,
-                'problems': [
-                    {
-                        'name': problem.problem.name,
-                        'order': problem.order,
-                        'points': problem.points,
-                        'status': user.problem_cells[problems.index(problem)],
-                    }
-                    for problem in problems
-                ]
-            })
+        # 응답 설정
+        response = FileResponse(output,
+                                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        response['Content-Disposition'] = f'attachment; filename={contest.name}_details.xlsx'
+        return response
 
-        return ranking_list
-        
 
 def _find_contest(request, key, private_check=True):
     try:
@@ -1259,12 +1205,54 @@ def contest_ranking_list(contest, problems):
                                     .order_by('is_disqualified', '-score', 'cumtime', 'tiebreaker', 'user__user__username'))
 
 
+def get_contest_ranking_problems(contest):
+    return list(contest.contest_problems.select_related('problem').defer('problem__description').order_by('order'))
+
+
+def _build_contest_ranking_snapshot(contest):
+    problems = get_contest_ranking_problems(contest)
+    ranked_users = contest_ranking_list(contest, problems)
+    for user in ranked_users:
+        # Rendering the ranking accesses the contest of every participation.
+        user.participation.contest = contest
+    return problems, ranked_users
+
+
+def get_contest_ranking_snapshot(contest):
+    """
+    Returns the contest problems and the full ranking of live participants, with every cell already rendered.
+
+    The ranking is cached until a participation, contest problem or the contest itself changes, and rebuilt by a
+    single request: requests arriving during a rebuild are given the previous ranking if there is one.
+    """
+    version = contest_ranking_version(contest.id)
+    key = 'contest_ranking:%d' % contest.id
+    cached = cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    lock = 'contest_ranking_lock:%d:%s' % (contest.id, version)
+    locked = cache.add(lock, True, timeout=30)
+    if not locked and cached is not None:
+        return cached[1]
+    try:
+        snapshot = _build_contest_ranking_snapshot(contest)
+        cache.set(key, (version, snapshot), getattr(settings, 'DMOJ_CONTEST_RANKING_CACHE_TTL', 3600))
+    finally:
+        if locked:
+            cache.delete(lock)
+    return snapshot
+
+
 def get_contest_ranking_list(request, contest, participation=None, ranking_list=contest_ranking_list,
                              show_current_virtual=True, ranker=ranker):
-    problems = list(contest.contest_problems.select_related('problem').defer('problem__description').order_by('order'))
+    if ranking_list is contest_ranking_list:
+        problems, ranked_users = get_contest_ranking_snapshot(contest)
+    else:
+        problems = get_contest_ranking_problems(contest)
+        ranked_users = ranking_list(contest, problems)
 
     # 순위 번호를 연속적으로 부여 (같은 점수여도 각각 다른 번호)
-    ranked_users = ranking_list(contest, problems)
     users = ((i + 1, user) for i, user in enumerate(ranked_users))
 
     if show_current_virtual:
@@ -1476,51 +1464,94 @@ class ContestTagDetail(TitleMixin, ContestTagDetailAjax):
     
     
 from judge.models.LatestSubmission import LatestSubmission
-import zipfile
-import io
 from django.utils.encoding import iri_to_uri
 
-class ContestDetailCodeDownload(View):
-    def get(self, request, *args, **kwargs):
-        try:
-            contest_key = kwargs.get('contest')  # URL에서 contest key 받기
-            contest, exists = _find_contest(request, contest_key, private_check=False)
 
-            if not exists:
-                raise Http404("Contest not found")
+def contest_source_files(contest, batch_size=200):
+    """Yields the name and source of every latest submission in the contest, reading them in batches."""
+    submissions = (
+        LatestSubmission.objects.filter(contest_object=contest)
+        .select_related('user__profile', 'problem', 'language')
+        .only('source', 'user__username', 'user__first_name', 'user__profile__id', 'problem__code', 'problem__name',
+              'language__extension')
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        batch = list(submissions.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        for sub in batch:
+            try:
+                sub.user.profile
+                first_name = f"{sub.user.username}_{sub.user.first_name}"
+                first_name = re.sub(r'[^a-zA-Z0-9가-힣_]', '_', first_name or 'unknown')
+            except Profile.DoesNotExist:
+                first_name = 'no_profile'
 
-            submissions = LatestSubmission.objects.filter(contest_object=contest).select_related('user', 'problem', 'user__profile')
+            problem_name = re.sub(r'[^a-zA-Z0-9가-힣_]', '_', sub.problem.name)
+            yield f'{first_name}/{problem_name}.{sub.language.extension}', sub.source or ""
+        last_id = batch[-1].id
 
-            buffer = io.BytesIO()
-            with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for sub in submissions:
-                    try:
-                        profile = sub.user.profile
-                        first_name = f"{profile.username}_{profile.first_name()}"
-                        first_name = re.sub(r'[^a-zA-Z0-9가-힣_]', '_', first_name or 'unknown')
-                    except Profile.DoesNotExist:
-                        first_name = 'no_profile'
 
-                    problem_name = re.sub(r'[^a-zA-Z0-9가-힣_]', '_', sub.problem.name)
-                    file_extension=sub.language.extension
-                    filename = f'{first_name}/{problem_name}.{file_extension}'
+def _cache_while_streaming(chunks, path):
+    """Writes the chunks to `path` as they are streamed, keeping the file only if every chunk was sent."""
+    fd, temp = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    completed = False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        os.replace(temp, path)
+        completed = True
+    finally:
+        if not completed:
+            os.unlink(temp)
 
-                    source = sub.source or ""
-                    zip_file.writestr(filename, source)
 
-            buffer.seek(0)
-            response = HttpResponse(buffer.read(), content_type='application/zip')
-            safe_name = re.sub(r'[^\w가-힣]', '_', contest.name or '').strip('_')
+class ContestDetailCodeDownload(View):
+    def get(self, request, *args, **kwargs):
+        contest_key = kwargs.get('contest')  # URL에서 contest key 받기
+        contest, exists = _find_contest(request, contest_key, private_check=False)
 
-            if not safe_name:
-                safe_name = 'contest'
+        if not exists:
+            raise Http404("Contest not found")
+
+        # 결과 다운로드와 같은 권한이 있는 사용자만 코드 다운로드 가능
+        if not (request.user.is_staff or contest.is_editable_by(request.user) or
+                request.user.has_perm('judge.see_private_contest')):
+            raise PermissionDenied("You don't have permission to download contest codes.")
+
+        cache_root = getattr(settings, 'DMOJ_CONTEST_CODE_CACHE', '')
+        if cache_root:
+            # 제출이 바뀌지 않았다면 이전에 만든 압축 파일을 그대로 보냄
+            state = LatestSubmission.objects.filter(contest_object=contest).aggregate(
+                count=Count('id'), last=Max('id'), updated=Max('updated_at'))
+            fingerprint = '%s-%s-%s' % (state['count'], state['last'] or 0,
+                                        int(state['updated'].timestamp() * 1000000) if state['updated'] else 0)
+            path = os.path.join(cache_root, 'contest-%d-%s.zip' % (contest.id, fingerprint))
+            if os.path.exists(path):
+                response = FileResponse(open(path, 'rb'), content_type='application/zip')
+            else:
+                for old in glob.glob(os.path.join(cache_root, 'contest-%d-*.zip' % contest.id)):
+                    try:
+                        os.unlink(old)
+                    except FileNotFoundError:
+                        pass
+                response = StreamingHttpResponse(_cache_while_streaming(stream_zip(contest_source_files(contest)),
+                                                                        path), content_type='application/zip')
+        else:
+            response = StreamingHttpResponse(stream_zip(contest_source_files(contest)),
+                                             content_type='application/zip')
 
-            quoted_filename = iri_to_uri(f'{safe_name}_codes.zip')
+        safe_name = re.sub(r'[^\w가-힣]', '_', contest.name or '').strip('_')
 
-            response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quoted_filename}"
-            
-            return response
+        if not safe_name:
+            safe_name = 'contest'
 
-        except Exception as e:
-            return HttpResponseServerError(f"An error occurred: {str(e)}")
+        quoted_filename = iri_to_uri(f'{safe_name}_codes.zip')
+
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quoted_filename}"
+        return response
         
@@ -1,7 +1,6 @@
 import json
 import logging
 import os
-import re
 import shutil
 import hashlib
 import base64
@@ -15,7 +14,8 @@ from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
 from django.db import transaction
-from django.db.models import BooleanField, Case, CharField, Count, F, FilteredRelation, Prefetch, Q, When
+from django.db.models import BooleanField, Case, CharField, Count, F, FilteredRelation, IntegerField, Prefetch, Q, \
+    Value, When
 from django.db.models.functions import Coalesce
 from django.db.utils import ProgrammingError
 from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
@@ -32,10 +32,12 @@ from django.views.generic.detail import SingleObjectMixin
 from django.views.decorators.http import require_POST
 from reversion import revisions
 
+from judge.caching import release_submission, reserve_submission
 from judge.comments import CommentedDetailView
 from judge.forms import ProblemCloneForm, ProblemPointsVoteForm, ProblemSubmitForm
-from judge.models import ContestSubmission, Judge, Language, Problem, ProblemGroup, ProblemPointsVote, \
-    ProblemTranslation, ProblemType, RuntimeVersion, Solution, Submission, SubmissionSource,LatestSubmission,ProblemClarification
+from judge.models import ContestProblem, ContestSubmission, Judge, Language, Problem, ProblemGroup, ProblemPointsVote, \
+    ProblemSearchGram, ProblemTranslation, ProblemType, RuntimeVersion, Solution, Submission, SubmissionSource,LatestSubmission,ProblemClarification
+from judge.models.problem_search import has_cjk
 from judge.pdf_problems import DefaultPdfMaker, HAS_PDF
 from judge.utils.diggpaginator import DiggPaginator
 from judge.utils.opengraph import generate_opengraph
@@ -47,10 +49,6 @@ from judge.utils.views import QueryStringSortMixin, SingleObjectFormView, TitleM
 
 import logging
 
-recjk = re.compile(r'[\u2E80-\u2E99\u2E9B-\u2EF3\u2F00-\u2FD5\u3005\u3007\u3021-\u3029\u3038-\u303A\u303B\u3400-\u4DB5'
-                   r'\u4E00-\u9FC3\uF900-\uFA2D\uFA30-\uFA6A\uFA70-\uFAD9\U00020000-\U0002A6D6\U0002F800-\U0002FA1D]')
-
-
 def get_contest_problem(problem, profile):
     try:
         return problem.contests.get(contest_id=profile.current_contest.contest_id)
@@ -561,31 +559,23 @@ class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView
                 queryset = queryset.order_by(self.order.replace('editorial', 'has_public_editorial'), 'id')
             elif sort_key == 'solved':
                 if self.request.user.is_authenticated:
-                    profile = self.request.profile
-                    solved = user_completed_ids(profile)
-                    attempted = user_attempted_ids(profile)
-
-                    def _solved_sort_order(problem):
-                        if problem.id in solved:
-                            return 1
-                        if problem.id in attempted:
-                            return 0
-                        return -1
-
-                    queryset = list(queryset)
-                    queryset.sort(key=_solved_sort_order, reverse=self.order.startswith('-'))
+                    # Solved problems, then attempted ones, then the rest, from the points of the user on each.
+                    queryset = queryset.annotate(
+                        user_status=FilteredRelation('user_points', condition=Q(user_points__user=self.profile)),
+                    ).annotate(solved_order=Case(
+                        When(user_status__ac_count__gt=0, then=Value(1)),
+                        When(user_status__id__isnull=False, then=Value(0)),
+                        default=Value(-1),
+                        output_field=IntegerField(),
+                    )).order_by(self.order.replace('solved', 'solved_order'), 'id')
             elif sort_key == 'type':
                 if self.show_types:
-                    queryset = list(queryset)
-                    queryset.sort(key=lambda problem: problem.types_list[0] if problem.types_list else '',
-                                  reverse=self.order.startswith('-'))
+                    queryset = queryset.order_by(self.order.replace('type', 'type_sort_key'), 'id')
             elif sort_key == 'id':
                 queryset = queryset.order_by(self.order, 'id')
             elif sort_key == 'authors':
-                queryset = list(queryset)
-                queryset = list(queryset)
-                queryset.sort(key=lambda problem: ', '.join([author.user.first_name for author in problem.authors.all()]), reverse=self.order.startswith('-'))
-            
+                queryset = queryset.order_by(self.order.replace('authors', 'authors_sort_key'), 'id')
+
             paginator.object_list = queryset
         return paginator
 
@@ -619,12 +609,9 @@ class ProblemList(QueryStringSortMixin, TitleMixin, SolvedProblemMixin, ListView
 
     @staticmethod
     def apply_full_text(queryset, query):
-        if recjk.search(query):
-            # MariaDB can't tokenize CJK properly, fallback to LIKE '%term%' for each term.
-            for term in query.split():
-                queryset = queryset.filter(Q(code__icontains=term) | Q(name__icontains=term) |
-                                           Q(description__icontains=term))
-            return queryset
+        if has_cjk(query):
+            # MariaDB can't tokenize CJK properly, search the n-gram index instead.
+            return ProblemSearchGram.search(queryset, query)
         return queryset.search(query, queryset.BOOLEAN).extra(order_by=['-relevance'])
 
     def get_normal_queryset(self):
@@ -856,7 +843,7 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
     def contest_problem(self):
         if self.request.profile.current_contest is None:
             return None
-        return get_contest_problem(self.object, self.request.profile)
+        return ContestProblem.get_cached(self.request.profile.current_contest.contest_id, self.object.id)
 
     @cached_property
     def remaining_submission_count(self):
@@ -930,15 +917,10 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
         return reverse('submission_status', args=(self.new_submission.id,))
 
     def form_valid(self, form):
-        if (
-            not self.request.user.has_perm('judge.spam_submission') and
-            Submission.objects.filter(user=self.request.profile, rejudged_date__isnull=True)
-                              .exclude(status__in=['D', 'IE', 'CE', 'AB']).count() >= settings.DMOJ_SUBMISSION_LIMIT
-        ):
-            return HttpResponse(format_html('<h1>{0}</h1>', _('You submitted too many submissions.')), status=429)
-        if not self.object.allowed_languages.filter(id=form.cleaned_data['language'].id).exists():
+        allowed_languages, banned_users = self.object.submission_restrictions
+        if form.cleaned_data['language'].id not in allowed_languages:
             raise PermissionDenied()
-        if not self.request.user.is_superuser and self.object.banned_users.filter(id=self.request.profile.id).exists():
+        if not self.request.user.is_superuser and self.request.profile.id in banned_users:
             return generic_message(self.request, _('Banned from submitting'),
                                    _('You have been declared persona non grata for this problem. '
                                      'You are permanently barred from submitting to this problem.'))
@@ -947,29 +929,40 @@ class ProblemSubmit(LoginRequiredMixin, ProblemMixin, TitleMixin, SingleObjectFo
             return generic_message(self.request, _('Too many submissions'),
                                    _('You have exceeded the submission limit for this problem.'))
 
-        with transaction.atomic():
-            self.new_submission = form.save(commit=False)
-
-            contest_problem = self.contest_problem
-            if contest_problem is not None:
-                # Use the contest object from current_contest.contest because we already use it
-                # in profile.update_contest().
-                self.new_submission.contest_object = self.request.profile.current_contest.contest
-                if self.request.profile.current_contest.live:
-                    self.new_submission.locked_after = self.new_submission.contest_object.locked_after
-                self.new_submission.save()
-                ContestSubmission(
-                    submission=self.new_submission,
-                    problem=contest_problem,
-                    participation=self.request.profile.current_contest,
-                ).save()
-            else:
-                self.new_submission.save()
+        # The submissions in flight are counted in the cache, and only counted in the database when there are too many.
+        limit = None if self.request.user.has_perm('judge.spam_submission') else settings.DMOJ_SUBMISSION_LIMIT
+        if not reserve_submission(self.request.profile.id, limit, lambda: (
+            Submission.objects.filter(user=self.request.profile, rejudged_date__isnull=True)
+                              .exclude(status__in=['D', 'IE', 'CE', 'AB']).count()
+        )):
+            return HttpResponse(format_html('<h1>{0}</h1>', _('You submitted too many submissions.')), status=429)
+
+        try:
+            with transaction.atomic():
+                self.new_submission = form.save(commit=False)
+
+                contest_problem = self.contest_problem
+                if contest_problem is not None:
+                    # Use the contest object from current_contest.contest because we already use it
+                    # in profile.update_contest().
+                    self.new_submission.contest_object = self.request.profile.current_contest.contest
+                    if self.request.profile.current_contest.live:
+                        self.new_submission.locked_after = self.new_submission.contest_object.locked_after
+                    self.new_submission.save()
+                    ContestSubmission(
+                        submission=self.new_submission,
+                        problem=contest_problem,
+                        participation=self.request.profile.current_contest,
+                    ).save()
+                else:
+                    self.new_submission.save()
+
+                source = SubmissionSource(submission=self.new_submission, source=form.cleaned_data['source'])
+                source.save()
+        except Exception:
+            release_submission(self.request.profile.id)
+            raise
 
-            source = SubmissionSource(submission=self.new_submission, source=form.cleaned_data['source'])
-            source.save()
-        
-            
         # Save a query.
         self.new_submission.source = source
         self.new_submission.judge(force_judge=True, judge_id=form.cleaned_data['judge'])
@@ -1032,6 +1025,8 @@ class ProblemClone(ProblemMixin, PermissionRequiredMixin, TitleMixin, SingleObje
         problem.is_public = False
         problem.ac_rate = 0
         problem.user_count = 0
+        problem.submission_count = 0
+        problem.ac_submission_count = 0
         problem.code = form.cleaned_data['code']
         with revisions.create_revision(atomic=True):
             problem.save()
@@ -21,7 +21,7 @@ from django.views.generic import DetailView, ListView
 
 from judge import event_poster as event
 from judge.highlight_code import highlight_code
-from judge.models import Contest, Language, Problem, ProblemTranslation, Profile, Submission, ContestParticipation
+from judge.models import Contest, Language, Problem, ProblemTranslation, Profile, Submission
 from judge.models.problem import SubmissionSourceAccess
 from judge.utils.infinite_paginator import InfinitePaginationMixin
 from judge.utils.problems import get_result_data, user_completed_ids, user_editable_ids, user_tester_ids
@@ -283,24 +283,9 @@ class SubmissionsListBase(DiggPaginatorMixin, TitleMixin, ListView):
                                                               language=self.request.LANGUAGE_CODE), to_attr='_trans'))
 
         if self.in_contest:
-            # 자신이 참가했던 모든 대회 리스트
-            all_contests = ContestParticipation.objects.filter(
-                user=self.request.profile,
-                virtual=ContestParticipation.LIVE  # 실제 참가한 대회만
-            ).select_related('contest').values_list('contest', flat=True)
-
-            # 본인의 제출 기록 필터
-            user_submissions_filter = Q(user=self.request.profile)
-
-            # 참가했던 모든 대회 순회
-            for contest_id in all_contests:
-                contest = Contest.objects.get(id=contest_id)
-                # 점수판을 볼 수 있는 경우: 해당 대회의 모든 제출 기록 추가
-                if contest.can_see_full_scoreboard(self.request.user):
-                    queryset = queryset | Submission.objects.filter(contest_object=contest)
-                # 점수판을 볼 수 없는 경우: 해당 대회의 본인 제출 기록만 추가
-                else:
-                    queryset = queryset | Submission.objects.filter(contest_object=contest, user=self.request.profile)
+            # 본인의 제출 기록과, 참가했던 대회 중 점수판을 볼 수 있는 대회의 모든 제출 기록
+            visible_contests = Contest.get_submission_visibility(self.request.user)[0]
+            queryset = queryset.filter(Q(user=self.request.profile) | Q(contest_object_id__in=visible_contests))
         else:
             queryset = queryset.select_related('contest_object').defer('contest_object__description')
 
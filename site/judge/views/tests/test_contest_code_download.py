@@ -0,0 +1,68 @@
+import io
+import os
+import tempfile
+import zipfile
+
+from django.core.exceptions import PermissionDenied
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from judge.models import Language
+from judge.models.LatestSubmission import LatestSubmission
+from judge.models.tests.util import create_numbered_contest, create_problem, create_user
+from judge.views.contests import ContestDetailCodeDownload, contest_source_files
+
+
+class ContestCodeDownloadTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.admin = create_user(username='code_admin', is_staff=True, is_superuser=True)
+        self.normal = create_user(username='code_normal')
+        self.contest = create_numbered_contest('code download')
+        language = Language.get_python3()
+        language.extension = 'py'
+        language.save()
+        problems = [create_problem(code='code_%s' % code, name='Problem %s' % code) for code in 'ab']
+        for i in range(3):
+            user = create_user(username='code_%d' % i, first_name='User %d' % i)
+            for problem in problems:
+                LatestSubmission.objects.create(user=user, problem=problem, contest_object=self.contest,
+                                                language=language, source='print(%d)' % i)
+
+    def download(self, user):
+        self.client.force_login(user)
+        return self.client.get(reverse('contest_detail_code_download', args=[self.contest.key]), secure=True)
+
+    def read(self, response):
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        return {name: archive.read(name).decode() for name in archive.namelist()}
+
+    def test_download(self):
+        response = self.download(self.admin)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=UTF-8''code_download_codes.zip")
+        files = self.read(response)
+        self.assertEqual(len(files), 6)
+        self.assertEqual(files['code_1_User_1/Problem_b.py'], 'print(1)')
+
+    def test_reads_in_batches(self):
+        with self.assertNumQueries(4):
+            self.assertEqual(len(list(contest_source_files(self.contest, batch_size=2))), 6)
+
+    def test_requires_permission(self):
+        request = RequestFactory().get('/')
+        request.user = self.normal
+        with self.assertRaises(PermissionDenied):
+            ContestDetailCodeDownload.as_view()(request, contest=self.contest.key)
+
+    def test_cached_archive(self):
+        with tempfile.TemporaryDirectory() as cache_root, self.settings(DMOJ_CONTEST_CODE_CACHE=cache_root):
+            first = self.read(self.download(self.admin))
+            self.assertEqual(len(os.listdir(cache_root)), 1)
+            self.assertEqual(self.read(self.download(self.admin)), first)
+
+            LatestSubmission.objects.filter(user__username='code_0').update(source='changed', updated_at=timezone.now())
+            changed = self.read(self.download(self.admin))
+            self.assertEqual(changed['code_0_User_0/Problem_a.py'], 'changed')
+            self.assertEqual(len(os.listdir(cache_root)), 1)
@@ -0,0 +1,76 @@
+from io import BytesIO
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from openpyxl import load_workbook
+
+from judge.contest_format.base import ProblemResult
+from judge.models.tests.util import create_contest_participation, create_contest_problem, create_numbered_contest, \
+    create_problem, create_user
+
+
+class ContestExportTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.admin = create_user(username='export_admin', is_staff=True, is_superuser=True)
+        self.contest = create_numbered_contest('export', format_name='icpc', format_config={'penalty': 20})
+        self.problems = [
+            create_contest_problem(contest=self.contest, problem=create_problem(code='export_%d' % i, name='P%d' % i),
+                                   points=100, order=i)
+            for i in range(2)
+        ]
+
+        first = self.problems[0].id
+        leader = create_contest_participation(contest=self.contest, user=create_user(username='export_a').profile)
+        leader.format_data = {str(first): {'time': 600, 'points': 100, 'penalty': 2}}
+        leader.score = 100
+        leader.save()
+        other = create_contest_participation(contest=self.contest, user=create_user(username='export_b').profile)
+        other.format_data = {str(first): {'time': 900, 'points': 0, 'penalty': 3}}
+        other.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def test_problem_results(self):
+        participation = self.contest.users.get(user__user__username='export_a')
+        self.assertEqual(self.contest.format.get_problem_results(participation, self.problems),
+                         [ProblemResult(points=100, time=600, attempts=3), None])
+
+    def test_penalty_disabled(self):
+        participation = self.contest.users.get(user__user__username='export_a')
+        contest_format = self.contest.format_class(self.contest, {'penalty': 0})
+        # Without penalties, the attempts aren't counted.
+        self.assertEqual(contest_format.get_problem_results(participation, self.problems),
+                         [ProblemResult(points=100, time=600, attempts=None), None])
+
+    def test_stale_format_data(self):
+        participation = self.contest.users.get(user__user__username='export_b')
+        # The results of the default format, from before the format was changed, have no penalty.
+        participation.format_data = {str(self.problems[0].id): {'time': 900, 'points': 0}}
+        participation.save()
+        self.assertEqual(self.contest.format.get_problem_results(participation, self.problems), [None, None])
+
+        response = self.client.get(reverse('contest_detail_json', args=[self.contest.key]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([problem['result'] for problem in response.json()['ranking'][1]['problems']], [None, None])
+
+    def test_json(self):
+        response = self.client.get(reverse('contest_detail_json', args=[self.contest.key]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        ranking = response.json()['ranking']
+        self.assertEqual([user['username'] for user in ranking], ['export_a', 'export_b'])
+        self.assertEqual([problem['result'] for problem in ranking[1]['problems']],
+                         [{'points': 0, 'time': 900, 'attempts': 3}, None])
+
+    def test_excel(self):
+        response = self.client.get(reverse('contest_detail_excel_download', args=[self.contest.key]), secure=True)
+        self.assertEqual(response.status_code, 200)
+        sheet = load_workbook(BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([list(row) for row in sheet.iter_rows(values_only=True)], [
+            ['Rank', 'Username', 'First Name', 'P0', 'P1', 'Total Points'],
+            [1, 'export_a', None, 100, 0, 100],
+            [2, 'export_b', None, 0, 0, 0],
+        ])
@@ -0,0 +1,60 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from judge.caching import contest_ranking_version
+from judge.models.tests.util import create_contest_participation, create_contest_problem, create_numbered_contest, \
+    create_problem, create_user
+from judge.views.contests import get_contest_ranking_snapshot
+
+
+class ContestRankingSnapshotTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.contest = create_numbered_contest('ranking')
+        create_contest_problem(contest=self.contest, problem=create_problem(code='ranking'))
+        self.participations = [
+            create_contest_participation(contest=self.contest, user=create_user(username='ranking_%d' % i).profile)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def ranking(self):
+        problems, users = get_contest_ranking_snapshot(self.contest)
+        return [(user.username, user.points) for user in users]
+
+    def test_cached_until_participation_changes(self):
+        self.ranking()
+        with self.assertNumQueries(0):
+            self.ranking()
+
+        participation = self.participations[2]
+        participation.score = 100
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.save()
+            # The ranking isn't rebuilt before the change is committed, or the old rows would be cached as current.
+            with self.assertNumQueries(0):
+                self.assertNotIn(('ranking_2', 100), self.ranking())
+        self.assertEqual(self.ranking()[0], ('ranking_2', 100))
+
+    def test_cached_rows_render_without_queries(self):
+        get_contest_ranking_snapshot(self.contest)
+        problems, users = get_contest_ranking_snapshot(self.contest)
+        with self.assertNumQueries(0):
+            for user in users:
+                user.participation.start
+                user.participation.ended
+                user.problem_cells
+
+    def test_concurrent_rebuild_serves_previous_ranking(self):
+        self.ranking()
+        participation = self.participations[1]
+        participation.score = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.save()
+
+        # Another request is already rebuilding the new version.
+        cache.add('contest_ranking_lock:%d:%s' % (self.contest.id, contest_ranking_version(self.contest.id)), True)
+        with self.assertNumQueries(0):
+            self.assertNotIn(('ranking_1', 50), self.ranking())
@@ -0,0 +1,76 @@
+from django.test import RequestFactory, TestCase
+from django.utils import timezone
+
+from judge.models import Language, Problem, ProblemType, Submission, UserProblemPoints
+from judge.models.tests.util import create_problem, create_user
+from judge.views.problem import ProblemList
+
+
+class ProblemListSortTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.user = create_user(username='sort_user')
+        self.authors = [create_user(username='sort_author%d' % i, first_name=name).profile
+                        for i, name in enumerate(['b', 'a'])]
+        self.types = [ProblemType.objects.create(name='sort%d' % i, full_name=name)
+                      for i, name in enumerate(['y', 'x', 'z'])]
+        self.problems = [create_problem(code='sort%d' % i, is_public=True) for i in range(4)]
+        self.problems[0].types.set([self.types[2], self.types[0]])
+        self.problems[1].types.set([self.types[1]])
+        self.problems[2].types.set([self.types[2]])
+        self.problems[0].authors.set([self.authors[0]])
+        self.problems[2].authors.add(self.authors[1])
+        self.problems[2].authors.add(self.authors[0])
+        self.problems[3].authors.set([self.authors[0]])
+
+        for problem, result in [(self.problems[1], 'AC'), (self.problems[2], 'WA')]:
+            submission = Submission.objects.create(user=self.user.profile, problem=problem,
+                                                   language=Language.get_python3())
+            # Mark the submission as graded without going through the post_save signals.
+            Submission.objects.filter(id=submission.id).update(status='D', result=result, points=problem.points,
+                                                               case_points=1, case_total=1, date=timezone.now())
+            UserProblemPoints.update(self.user.profile.id, problem.id)
+
+    def sort_keys(self, problem):
+        return Problem.objects.values_list('type_sort_key', 'authors_sort_key').get(id=problem.id)
+
+    def order(self, order):
+        # Rendering the list needs static resources, so only go as far as the page of problems.
+        request = RequestFactory().get('/problems/', {'order': order, 'show_types': '1'})
+        request.user = self.user
+        request.profile = self.user.profile
+        request.LANGUAGE_CODE = 'en'
+        view = ProblemList()
+        view.setup(request)
+        view.setup_problem_list(request)
+        view.order = order
+        view.groupId = None
+        paginator = view.get_paginator(view.get_queryset(), view.paginate_by)
+        return [problem.code for problem in paginator.page(1).object_list]
+
+    def test_sort_keys(self):
+        self.assertEqual(self.sort_keys(self.problems[0]), ('y', 'b'))
+        self.assertEqual(self.sort_keys(self.problems[1]), ('x', ''))
+        self.assertEqual(self.sort_keys(self.problems[2]), ('z', 'a, b'))
+        self.assertEqual(self.sort_keys(self.problems[3]), ('', 'b'))
+
+        self.types[0].problem_set.clear()
+        self.assertEqual(self.sort_keys(self.problems[0]), ('z', 'b'))
+        self.types[2].full_name = 'w'
+        self.types[2].save()
+        self.assertEqual(self.sort_keys(self.problems[0]), ('w', 'b'))
+        self.assertEqual(self.sort_keys(self.problems[2]), ('w', 'a, b'))
+
+        user = self.authors[0].user
+        user.first_name = 'c'
+        user.save()
+        self.assertEqual(self.sort_keys(self.problems[2]), ('w', 'a, c'))
+        self.assertEqual(self.sort_keys(self.problems[3]), ('', 'c'))
+
+    def test_sort(self):
+        self.assertEqual(self.order('type'), ['sort3', 'sort1', 'sort0', 'sort2'])
+        self.assertEqual(self.order('-type'), ['sort2', 'sort0', 'sort1', 'sort3'])
+        self.assertEqual(self.order('authors'), ['sort1', 'sort2', 'sort0', 'sort3'])
+        self.assertEqual(self.order('-authors'), ['sort0', 'sort3', 'sort2', 'sort1'])
+        self.assertEqual(self.order('solved'), ['sort0', 'sort3', 'sort2', 'sort1'])
+        self.assertEqual(self.order('-solved'), ['sort1', 'sort2', 'sort0', 'sort3'])
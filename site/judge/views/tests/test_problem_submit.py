@@ -0,0 +1,107 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from judge.caching import release_submission, reserve_submission
+from judge.judgeapi import abort_submission
+from judge.models import ContestProblem, Language, Problem, Submission
+from judge.models.tests.util import create_numbered_contest, create_problem, create_user
+
+
+class SubmissionLimitTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.counted = 0
+
+    def count(self):
+        self.counted += 1
+        return self.in_database
+
+    def test_counted_in_cache(self):
+        self.in_database = 1
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.assertEqual(self.counted, 1)
+        self.in_database = 3
+        self.assertFalse(reserve_submission(1, 3, self.count))
+        self.assertEqual(self.counted, 2)
+
+        release_submission(1)
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.assertEqual(self.counted, 2)
+        self.assertTrue(reserve_submission(1, None, self.count))
+
+    def test_recounted_before_rejecting(self):
+        self.in_database = 0
+        for _ in range(3):
+            self.assertTrue(reserve_submission(1, 3, self.count))
+        # The submissions finished without being released, so the database has the right count.
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.assertEqual(self.counted, 2)
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.assertEqual(self.counted, 2)
+
+    def test_release_without_reserve(self):
+        release_submission(1)
+        self.in_database = 2
+        self.assertTrue(reserve_submission(1, 3, self.count))
+        self.in_database = 3
+        self.assertFalse(reserve_submission(1, 3, self.count))
+
+    def test_released_when_aborted_in_queue(self):
+        profile = create_user(username='abort_queued').profile
+        submission = Submission.objects.create(user=profile, problem=create_problem(code='abort_queued'),
+                                               language=Language.get_python3())
+        self.in_database = 0
+        self.assertTrue(reserve_submission(profile.id, 1, self.count))
+        with mock.patch('judge.judgeapi.judge_request', return_value={'judge-aborted': False}):
+            abort_submission(submission)
+        self.assertEqual(Submission.objects.get(id=submission.id).status, 'AB')
+
+        # Without the release, the cached count would be over the limit and have to be checked in the database.
+        self.assertTrue(reserve_submission(profile.id, 1, self.count))
+        self.assertEqual(self.counted, 1)
+
+
+class SubmissionRestrictionsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(self):
+        self.users = [create_user(username='restricted%d' % i).profile for i in range(2)]
+        self.problem = create_problem(code='restricted', allowed_languages=[Language.get_python3().key],
+                                      banned_users=[self.users[0].user.username])
+
+    def setUp(self):
+        cache.clear()
+
+    def restrictions(self):
+        self.problem.submission_restrictions
+        problem = Problem.objects.get(id=self.problem.id)
+        with self.assertNumQueries(0):
+            return problem.submission_restrictions
+
+    def test_problem_restrictions(self):
+        python3 = Language.get_python3()
+        self.assertEqual(self.restrictions(), ({python3.id}, {self.users[0].id}))
+
+        self.problem.banned_users.add(self.users[1])
+        self.assertEqual(self.restrictions(), ({python3.id}, {self.users[0].id, self.users[1].id}))
+        self.users[0].problem_set.clear()
+        self.assertEqual(self.restrictions(), ({python3.id}, {self.users[1].id}))
+        self.problem.allowed_languages.clear()
+        self.assertEqual(self.restrictions(), (set(), {self.users[1].id}))
+
+    def test_contest_problem(self):
+        contest = create_numbered_contest('restricted')
+        self.assertIsNone(ContestProblem.get_cached(contest.id, self.problem.id))
+
+        contest_problem = ContestProblem.objects.create(contest=contest, problem=self.problem, points=1, order=1)
+        self.assertEqual(ContestProblem.get_cached(contest.id, self.problem.id), contest_problem)
+        contest_problem.max_submissions = 3
+        contest_problem.save()
+        ContestProblem.get_cached(contest.id, self.problem.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(ContestProblem.get_cached(contest.id, self.problem.id).max_submissions, 3)
+
+        contest_problem.delete()
+        self.assertIsNone(ContestProblem.get_cached(contest.id, self.problem.id))
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 # 모든 활성 대회와 최근 종료된 대회의 점수를 재계산하는 스크립트
 
+import argparse
 import os
 import time
 from datetime import timedelta
@@ -23,61 +24,70 @@ if hasattr(settings_module, 'LOGGING'):
 import django
 django.setup()
 
+from concurrent.futures import ProcessPoolExecutor
+
+from django.db import connections
 from django.utils import timezone
-from judge.models import Contest, ContestParticipation
+from judge.models import Contest
 
-def rescore_contest(contest):
+def rescore_contest(contest_id):
     """
-    특정 대회의 모든 참가자 점수를 재계산합니다.
+    특정 대회의 모든 참가자 점수를 한 번에 재계산합니다.
+    대회 형식이 모든 참가자의 결과를 몇 번의 쿼리로 메모리에서 계산하고 bulk_update로 저장합니다.
     """
+    contest = Contest.objects.get(id=contest_id)
     print(f"\n===== 대회 '{contest.name}' (키: {contest.key}) 점수 재계산 시작 =====")
     start_time = time.time()
-    
-    participations = ContestParticipation.objects.filter(contest=contest)
-    total = participations.count()
-    print(f"총 {total}명의 참가자 점수를 재계산합니다.")
-    
+
+    old_scores = dict(contest.users.values_list('id', 'score'))
+    print(f"총 {len(old_scores)}명의 참가자 점수를 재계산합니다.")
+
+    # 결과 재계산
+    participations = contest.recompute_results(contest.users.select_related('user__user'))
+
     # 점수가 변경된 참가자 수 추적
     changed_count = 0
-    
-    for i, participation in enumerate(participations, 1):
-        old_score = participation.score
-        
-        # 결과 재계산
-        participation.recompute_results()
-        
-        # 점수가 변경되었는지 확인
+    for participation in participations:
+        old_score = old_scores.get(participation.id)
         if old_score != participation.score:
             print(f"참가자 {participation.user.username}: {old_score} -> {participation.score}")
             changed_count += 1
-        
-        if i % 10 == 0 or i == total:
-            print(f"진행 상황: {i}/{total} ({i/total*100:.1f}%)")
-    
+
     elapsed_time = time.time() - start_time
     print(f"대회 '{contest.name}' 점수 재계산 완료. 소요 시간: {elapsed_time:.2f}초")
-    print(f"변경된 참가자 수: {changed_count}/{total}")
+    print(f"변경된 참가자 수: {changed_count}/{len(participations)}")
     return changed_count
 
+def close_connections():
+    # 부모 프로세스에서 물려받은 DB 연결은 공유하면 안 되므로 닫고 새로 연결합니다.
+    connections.close_all()
+
 def main():
+    parser = argparse.ArgumentParser(description='최근 대회의 점수를 재계산합니다.')
+    parser.add_argument('--days', type=int, default=90, help='최근 며칠 안에 종료된 대회를 재계산할지 (기본값: 90)')
+    parser.add_argument('--processes', type=int, default=1, help='대회를 병렬로 재계산할 프로세스 수 (기본값: 1)')
+    args = parser.parse_args()
+
     print("=== 대회 점수 재계산 시작 ===")
     start_time = time.time()
-    
-    # 활성 대회와 최근 종료된 대회(2주 이내) 가져오기
+
+    # 활성 대회와 최근 종료된 대회 가져오기
     now = timezone.now()
-    recent_time = now - timedelta(days=90)
-    
-    contests = Contest.objects.filter(
+    recent_time = now - timedelta(days=args.days)
+
+    contest_ids = list(Contest.objects.filter(
         end_time__gte=recent_time
-    ).order_by('-end_time')
-    
-    print(f"총 {contests.count()}개의 대회를 재계산합니다.")
-    
-    total_changed = 0
-    for contest in contests:
-        changed = rescore_contest(contest)
-        total_changed += changed
-    
+    ).order_by('-end_time').values_list('id', flat=True))
+
+    print(f"총 {len(contest_ids)}개의 대회를 재계산합니다.")
+
+    if args.processes > 1:
+        close_connections()
+        with ProcessPoolExecutor(args.processes, initializer=close_connections) as executor:
+            total_changed = sum(executor.map(rescore_contest, contest_ids))
+    else:
+        total_changed = sum(map(rescore_contest, contest_ids))
+
     elapsed_time = time.time() - start_time
     print(f"\n=== 모든 대회 점수 재계산 완료. 총 소요 시간: {elapsed_time:.2f}초 ===")
     print(f"총 변경된 참가자 수: {total_changed}")